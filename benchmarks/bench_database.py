@@ -0,0 +1,274 @@
+# benchmarks/bench_database.py
+"""Microbenchmark: DatabaseManager hot paths on synthetic tables of growing size.
+
+Run from the project root:
+
+    python -m benchmarks.bench_database                     # 1k, 10k, 100k rows
+    python -m benchmarks.bench_database --sizes 1000,1000000
+    python -m benchmarks.bench_database --save              # append to the history file
+    python -m benchmarks.bench_database --history           # compare saved runs by commit
+
+Seeded databases (resumes, twice as many log rows, dedup keys) are cached
+in ``--data-dir`` and copied before each run, so writes of one run never
+leak into the next. Every case is timed with ``timeit``: the call count is
+grown until one batch takes ``--min-time``, the best of three batches is
+reported per call. ``export_to_excel`` is skipped above ``--export-max``
+rows (it writes the whole table through pandas/openpyxl).
+
+``--save`` appends one JSON line per run, tagged with the git commit, to
+``benchmarks/results/bench_database.jsonl``; ``--history`` prints each
+case across the saved commits so a DatabaseManager change can be judged
+by numbers.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import config
+from database import DatabaseManager
+from scoring import compute_score
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE = os.path.join(ROOT, "benchmarks", "results", "bench_database.jsonl")
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+SEED_VERSION = 2  # با تغییر داده‌های مصنوعی افزایش یابد تا کش بازسازی شود
+
+FIRST_NAMES = ["علی", "مریم", "رضا", "سارا", "محمد", "زهرا", "حسین", "نرگس", "امیر", "فاطمه", "مهدی", "لیلا"]
+LAST_NAMES = ["رضایی", "احمدی", "محمدی", "کریمی", "حسینی", "موسوی", "جعفری", "صادقی", "کاظمی", "نوری"]
+CITIES = ["تهران", "اصفهان", "شیراز", "تبریز", "مشهد", "کرج", "اهواز", "رشت"]
+LEVELS = config.KEYBOARD_SKILL_LEVEL[0]
+LOG_LEVELS = ["INFO", "INFO", "INFO", "ADMIN", "SUCCESS", "ERROR"]
+
+
+def synthetic_resume(rng: random.Random, user_id: int, now: datetime.datetime) -> dict:
+    skills = [{"name": name, "level": rng.choice(LEVELS)} for name in rng.sample(config.SKILLS_LIST, rng.randint(0, 3))]
+    registered = now - datetime.timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+    return {
+        "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {user_id % 997}",
+        "username": f"user{user_id}",
+        "study_status": rng.choice(config.KEYBOARD_STUDY_STATUS_TEXTS),
+        "degree": rng.choice(config.KEYBOARD_DEGREE_TEXTS),
+        "major": rng.choice(config.KEYBOARD_MAJOR_TEXTS),
+        "field_university": f"دانشگاه {rng.choice(CITIES)}",
+        "gpa": f"{rng.uniform(12, 20):.2f}",
+        "location": f"{rng.choice(CITIES)} خیابان {rng.randint(1, 99)}",
+        "phone_main": f"0912{user_id % 10_000_000:07d}",
+        "phone_emergency": f"0935{rng.randint(0, 9_999_999):07d}",
+        "english_level": rng.choice(LEVELS),
+        "skills": skills,
+        "work_history": rng.choice(["ندارم", f"دارم: شرکت {rng.randint(1, 500)}"]),
+        "job_position": rng.choice(config.KEYBOARD_JOB_POSITION_TEXTS),
+        "other_details": None,
+        "training_request": rng.choice(config.KEYBOARD_TRAINING_REQUEST_TEXTS),
+        "has_work_license": rng.choice(["بله", "خیر"]),
+        "work_license_city": rng.choice(CITIES),
+        "file_path": None,
+        "register_date": registered.strftime("%Y-%m-%d %H:%M:%S"),
+        "uploaded_files": [f"uploads/{user_id}/resume_{user_id}.pdf"] if rng.random() < 0.5 else [],
+    }
+
+
+def _row(codec, data: dict, user_id: int) -> tuple:
+    # همان شکل ذخیره‌سازی save_resume_data (کدها، timestamp، REAL)
+    values = [json.dumps(data[f], ensure_ascii=False) if isinstance(data[f], list) else codec.encode(f, data[f])
+              for f in config.RESUME_FIELDS]
+    return (user_id, *values, compute_score(data))
+
+
+def seed(path: str, size: int, seed: int = 1, batch: int = 10_000) -> None:
+    """Create ``path`` with ``size`` resumes, 2×size log rows and the dedup index."""
+    if os.path.exists(path):
+        os.remove(path)
+    db = DatabaseManager(path)
+    rng = random.Random(seed)
+    now = datetime.datetime.now()
+    columns = ", ".join(config.RESUME_FIELDS)
+    placeholders = ", ".join("?" for _ in range(len(config.RESUME_FIELDS) + 2))
+    insert = f"INSERT INTO resumes (user_id, {columns}, score) VALUES ({placeholders})"
+    user_ids = iter(range(1, size + 1))
+    while True:
+        chunk = list(itertools.islice(user_ids, batch))
+        if not chunk:
+            break
+        db.cursor.executemany(insert, [_row(db.codec, synthetic_resume(rng, uid, now), uid) for uid in chunk])
+        db.cursor.executemany(
+            "INSERT INTO logs (timestamp, level, message) VALUES (?, ?, ?)",
+            [((now - datetime.timedelta(seconds=rng.randint(0, 365 * 24 * 3600))).strftime("%Y-%m-%d %H:%M:%S"),
+              rng.choice(LOG_LEVELS), f"Resume data updated for User ID: {uid}")
+             for uid in chunk for _ in range(2)]
+        )
+        db.conn.commit()
+    db.rebuild_dedup_index()
+    db.close()
+
+
+def seeded_copy(data_dir: str, size: int, workdir: str, reseed: bool = False) -> str:
+    os.makedirs(data_dir, exist_ok=True)
+    cached = os.path.join(data_dir, f"resumes_{size}_v{SEED_VERSION}.sqlite3")
+    if reseed or not os.path.exists(cached):
+        start = time.perf_counter()
+        seed(cached + ".tmp", size)
+        os.replace(cached + ".tmp", cached)
+        print(f"  seeded {size:,} rows in {time.perf_counter() - start:.1f}s -> {cached}", file=sys.stderr)
+    target = os.path.join(workdir, f"bench_{size}.sqlite3")
+    shutil.copyfile(cached, target)
+    return target
+
+
+def cases(db: DatabaseManager, size: int, export_max: int) -> list:
+    """[(name, callable)]; every call uses a different random user so the page cache is not flattered."""
+    rng = random.Random(size)
+    users = lambda: rng.randint(1, size)
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    sample = db.get_resume_data(1)
+    deleted = itertools.cycle(range(size, 0, -1))
+
+    def save():
+        uid = users()
+        db.save_resume_data(uid, dict(sample, phone_main=f"0912{uid:07d}"))
+
+    result = [
+        ("save_resume_data", save),
+        ("get_resume_data", lambda: db.get_resume_data(users())),
+        ("search_resumes(term)", lambda: db.search_resumes(rng.choice(LAST_NAMES))),
+        ("search_resumes(term+filters)", lambda: db.search_resumes(
+            rng.choice(LAST_NAMES), filters={"degree": rng.choice(config.KEYBOARD_DEGREE_TEXTS),
+                                             "study_status": rng.choice(config.KEYBOARD_STUDY_STATUS_TEXTS)})),
+        ("search_resumes(filters)", lambda: db.search_resumes("", filters={"degree": "ارشد"})),
+        ("get_user_by_search_term", lambda: db.get_user_by_search_term(f"user{users()}")),
+        ("get_stats", lambda: db.get_stats(today)),
+        ("get_all_logs", db.get_all_logs),
+        ("update_user_field", lambda: db.update_user_field(users(), "gpa", f"{rng.uniform(12, 20):.2f}")),
+        ("soft_delete_user", lambda: db.soft_delete_user(next(deleted), 1)),
+    ]
+    if size <= export_max:
+        result.append(("export_to_excel", db.export_to_excel))
+    return result
+
+
+def measure(func, min_time: float, repeat: int = 3) -> float:
+    """Best seconds per call over ``repeat`` batches of at least ``min_time`` each."""
+    timer = timeit.Timer(func)
+    number, elapsed = 1, timer.timeit(1)
+    while elapsed < min_time:
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+        elapsed = timer.timeit(number)
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        best = min(best, timer.timeit(number) / number)
+    return best
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(sizes, data_dir: str, min_time: float, export_max: int, reseed: bool) -> dict:
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="bench_database_")
+    cwd = os.getcwd()
+    # لاگ متنی و فایل اکسل با مسیر نسبی نوشته می‌شوند
+    os.chdir(workdir)
+    try:
+        for size in sizes:
+            path = seeded_copy(data_dir, size, workdir, reseed)
+            db = DatabaseManager(path)
+            results[size] = {}
+            for name, func in cases(db, size, export_max):
+                results[size][name] = measure(func, min_time)
+            db.close()
+            os.remove(path)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_table(results: dict) -> None:
+    sizes = list(results)
+    names = list(dict.fromkeys(name for per_size in results.values() for name in per_size))
+    print(f"{'case':30}" + "".join(f"{size:>14,}" for size in sizes))
+    for name in names:
+        cells = "".join(f"{_format_seconds(results[s][name]) if name in results[s] else '-':>14}" for s in sizes)
+        print(f"{name:30}{cells}")
+
+
+def save(results: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entry = {
+        "commit": _git_commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "sqlite": sqlite3.sqlite_version,
+        "results": {str(size): per_size for size, per_size in results.items()},
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def print_history(path: str, last: int) -> None:
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()][-last:]
+    keys = list(dict.fromkeys(
+        (size, name) for entry in entries for size, per_size in entry["results"].items() for name in per_size
+    ))
+    print(f"{'case':40}" + "".join(f"{entry['commit'][:10]:>14}" for entry in entries))
+    for size, name in keys:
+        cells = ""
+        for entry in entries:
+            value = entry["results"].get(size, {}).get(name)
+            cells += f"{_format_seconds(value) if value is not None else '-':>14}"
+        print(f"{f'{name} @{int(size):,}':40}{cells}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_database", description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated table sizes, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per timed batch")
+    parser.add_argument("--export-max", type=int, default=10_000, help="largest table exported to Excel")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "bench_database"),
+                        help="where seeded databases are cached")
+    parser.add_argument("--reseed", action="store_true", help="rebuild the cached seeded databases")
+    parser.add_argument("--save", nargs="?", const=HISTORY_FILE, metavar="PATH",
+                        help=f"append the results to a JSON-lines history (default {os.path.relpath(HISTORY_FILE, ROOT)})")
+    parser.add_argument("--history", nargs="?", const=HISTORY_FILE, metavar="PATH",
+                        help="print saved runs side by side instead of benchmarking")
+    parser.add_argument("--last", type=int, default=6, help="number of saved runs shown by --history")
+    args = parser.parse_args(argv)
+
+    if args.history:
+        print_history(args.history, args.last)
+        return
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = run(sizes, args.data_dir, args.min_time, args.export_max, args.reseed)
+    print_table(results)
+    if args.save:
+        save(results, args.save)
+        print(f"saved to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_dispatch.py
+"""Microbenchmark: per-update dispatch cost as the number of handlers grows.
+
+Run from the project root:
+
+    python -m benchmarks.bench_dispatch
+
+Both dispatchers get the same handlers: half keyed by button text
+(``F.text == ...``), half by FSM state. The measured update taps the last
+registered text button, which is the worst case for aiogram's linear filter
+scan and an ordinary dict lookup for ``FastRouter``.
+"""
+import asyncio
+import time
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.filters import StateFilter
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Chat, Message, Update, User
+
+from fast_router import FastRouter
+
+HANDLER_COUNTS = (10, 50, 100, 200, 400)
+
+
+async def _noop(message: Message) -> None:
+    return None
+
+
+def _states(count: int):
+    return type("BenchStates", (StatesGroup,), {f"s{i}": State() for i in range(count)})
+
+
+def build_linear(count: int) -> Dispatcher:
+    dp, router, states = Dispatcher(), Router(), _states(count // 2)
+    for i in range(count // 2):
+        router.message(StateFilter(getattr(states, f"s{i}")))(_noop)
+        router.message(F.text == f"button {i}")(_noop)
+    dp.include_router(router)
+    return dp
+
+
+def build_fast(count: int) -> Dispatcher:
+    dp, router, states = Dispatcher(), FastRouter(), _states(count // 2)
+    for i in range(count // 2):
+        router.route_message(state=getattr(states, f"s{i}"))(_noop)
+        router.route_message(f"button {i}")(_noop)
+    dp.include_router(router)
+    return dp
+
+
+def _update(update_id: int, text: str) -> Update:
+    user = User(id=1, is_bot=False, first_name="bench")
+    message = Message(message_id=update_id, date=datetime.now(), chat=Chat(id=1, type="private"),
+                      from_user=user, text=text)
+    return Update(update_id=update_id, message=message)
+
+
+async def _measure(dp: Dispatcher, bot: Bot, text: str, number: int) -> float:
+    updates = [_update(i, text) for i in range(number)]
+    start = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - start) / number * 1e6
+
+
+async def run(number: int = 500) -> None:
+    bot = Bot(token="42:BENCHMARK")
+    print(f"{'handlers':>8} {'aiogram µs':>12} {'FastRouter µs':>14} {'speedup':>8}")
+    for count in HANDLER_COUNTS:
+        text = f"button {count // 2 - 1}"
+        linear = min([await _measure(build_linear(count), bot, text, number) for _ in range(3)])
+        fast = min([await _measure(build_fast(count), bot, text, number) for _ in range(3)])
+        print(f"{count:8} {linear:12.1f} {fast:14.1f} {linear / fast:7.1f}x")
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,62 @@
+# benchmarks/bench_keyboards.py
+"""Microbenchmark: per-update keyboard cost, rebuilt vs. served from the registry.
+
+Run from the project root:
+
+    python -m benchmarks.bench_keyboards
+
+"rebuild" is what every handler used to pay: construct the pydantic markup
+from the config lists and serialize it for the request. "registry" is the
+memoized instance plus its pre-serialized JSON.
+"""
+import timeit
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+
+import keyboards
+
+# کیبوردهای پرتکرار در هر آپدیت (نام تابع، آرگومان‌ها)
+CASES = [
+    ("get_main_keyboard", (False,)),
+    ("get_skill_keyboard", ()),
+    ("get_skill_level_keyboard", ("AutoCAD",)),
+    ("get_major_keyboard", ()),
+    ("get_degree_keyboard", ()),
+    ("get_edit_fields_keyboard", ()),
+    ("get_user_fields_keyboard", ()),
+    ("get_admin_main_keyboard", (False,)),
+    ("_user_actions_keyboard", (True,)),
+    ("create_reply_keyboard", (keyboards.config.KEYBOARD_JOB_POSITION_TEXTS,)),
+]
+
+
+def main(number: int = 2000) -> None:
+    bot = Bot(token="42:BENCHMARK")
+    session = AiohttpSession()
+    keyboards.registry.build_all()
+
+    print(f"{'keyboard':32} {'rebuild µs':>12} {'registry µs':>12} {'speedup':>8}")
+    total_old = total_new = 0.0
+    for name, args in CASES:
+        getter = getattr(keyboards, name)
+        builder = getter.__wrapped__
+
+        def rebuild():
+            markup = builder(*args)
+            session.prepare_value(markup.model_dump(warnings=False), bot=bot, files={})
+
+        def cached():
+            keyboards.registry.serialized(getter(*args))
+
+        old = min(timeit.repeat(rebuild, number=number, repeat=3)) / number * 1e6
+        new = min(timeit.repeat(cached, number=number, repeat=3)) / number * 1e6
+        total_old += old
+        total_new += new
+        print(f"{name:32} {old:12.2f} {new:12.2f} {old / new:7.1f}x")
+
+    print(f"{'average per update':32} {total_old / len(CASES):12.2f} {total_new / len(CASES):12.2f} {total_old / total_new:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_startup.py
+"""Startup benchmark: cold-process time to import the bot, and where it goes.
+
+Run from the project root:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --top 25
+
+Each run starts a fresh interpreter that imports ``main`` (which builds the
+bot, dispatcher and ``DatabaseManager``) in a scratch directory, the same
+work a supervisor restart pays before polling begins. The first run opens
+an empty database (schema creation), the others reopen it (schema already
+current). One extra run under ``python -X importtime`` lists the slowest
+imports by cumulative time, and ``DatabaseManager()`` is timed on its own.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_MAIN = f"import sys; sys.path.insert(0, {ROOT!r}); import main"
+OPEN_DB = (
+    f"import sys, time; sys.path.insert(0, {ROOT!r}); from database import DatabaseManager; "
+    "start = time.perf_counter(); DatabaseManager(); print(time.perf_counter() - start)"
+)
+
+
+def _env() -> dict:
+    # سرور متریک‌ها و پروفایل شروع در import اجرا نمی‌شوند، اما برای اطمینان خاموش می‌شوند
+    return dict(os.environ, METRICS_PORT="0", PROFILE_ON_START="0")
+
+
+def time_process(code: str, cwd: str, *flags) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *flags, "-c", code], cwd=cwd, env=_env(), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def import_times(cwd: str) -> list:
+    """[(cumulative µs, self µs, depth, module)] from ``-X importtime``."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_MAIN], cwd=cwd, env=_env(),
+                            check=True, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    return rows
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_startup", description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts to time")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        first = time_process(IMPORT_MAIN, workdir)
+        warm = [time_process(IMPORT_MAIN, workdir) for _ in range(args.runs)]
+        baseline = min(time_process("pass", workdir) for _ in range(3))
+        out = subprocess.run([sys.executable, "-c", OPEN_DB], cwd=workdir, env=_env(), check=True,
+                             capture_output=True, text=True).stdout
+        open_db = float(out.strip().splitlines()[-1])
+        rows = import_times(workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'interpreter only':36} {baseline * 1000:9.1f} ms")
+    print(f"{'import main, new database':36} {first * 1000:9.1f} ms")
+    print(f"{'import main, existing database':36} {statistics.median(warm) * 1000:9.1f} ms "
+          f"(median of {args.runs}, min {min(warm) * 1000:.1f})")
+    print(f"{'DatabaseManager() on existing db':36} {open_db * 1000:9.1f} ms")
+    total = sum(self_us for _, self_us, _, _ in rows)
+    print(f"\nslowest imports (cumulative ms; all imports {total / 1000:.1f} ms):")
+    # فقط ماژول‌های سطح بالا و فرزندان مستقیمشان؛ بقیه در cumulative آن‌ها حساب شده‌اند
+    for cumulative_us, self_us, depth, name in sorted((r for r in rows if r[2] <= 1), reverse=True)[:args.top]:
+        print(f"  {'  ' * depth}{name:<40} {cumulative_us / 1000:9.1f} {self_us / 1000:9.1f} self")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# benchmarks/loadtest/__init__.py
+"""End-to-end load test of the bot against a fake Telegram Bot API (``python -m benchmarks.loadtest``)."""
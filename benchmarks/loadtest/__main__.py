@@ -0,0 +1,239 @@
+# benchmarks/loadtest/__main__.py
+"""End-to-end load test: the real bot process against a local fake Bot API.
+
+Run from the project root:
+
+    python -m benchmarks.loadtest --preset smoke
+    python -m benchmarks.loadtest --applicants 2000 --admins 3 --save results/before.json
+    python -m benchmarks.loadtest --preset standard --baseline results/before.json
+    python -m benchmarks.loadtest --local-api
+    python -m benchmarks.loadtest --keep-throttle --album-size 10 --applicants 5
+
+The bot (main.py) runs as a subprocess in a throw-away working directory
+(fresh db.sqlite3, uploads/ and Excel file) with ``TELEGRAM_API_BASE``
+pointing at the fake server. Throttling is relaxed unless
+``--keep-throttle`` is given, since simulated users answer much faster than
+people do. ``--local-api`` runs the fake server and the bot in local Bot API
+mode (``TELEGRAM_API_LOCAL``), so uploads are taken from disk. At the end the bot's /metrics endpoint is scraped for the DB
+call counts and /proc for its memory.
+
+With ``--album-size N`` every applicant sends its work samples as one
+album of N documents. After the run the bot's database is checked: every
+applicant must have all the files it uploaded in ``uploaded_files``,
+otherwise the exit status is 1. With ``--keep-throttle`` the simulated
+users are paced to ``THROTTLE_RATE`` so the production limits only drop
+what they are meant to drop.
+
+With ``--baseline`` the run is compared against a saved result and the exit
+status is 1 when a metric is worse by more than ``--tolerance``.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import ClientSession
+
+import config
+from benchmarks.loadtest import report
+from benchmarks.loadtest.fake_api import FakeBotAPI, start_fake_api
+from benchmarks.loadtest.scenarios import Client, Stats, admin_scenario, applicant_scenario, run_user
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TOKEN = "123456:LOADTEST"
+ADMIN_BASE_ID = 1000
+APPLICANT_BASE_ID = 100000
+PRESETS = {
+    "smoke": {"applicants": 50, "admins": 1, "concurrency": 50},
+    "standard": {"applicants": 1000, "admins": 2, "concurrency": 200},
+    "stress": {"applicants": 5000, "admins": 3, "concurrency": 1000},
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def read_memory(pid: int) -> dict:
+    """Current and peak RSS of ``pid`` in MB (Linux only)."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    fields[key] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return {"bot_rss_mb": fields.get("VmRSS"), "bot_peak_rss_mb": fields.get("VmHWM")}
+
+
+def start_bot(workdir: str, api_base: str, metrics_port: int, admin_ids: list, keep_throttle: bool,
+              local_api: bool = False):
+    env = dict(os.environ,
+               BOT_TOKEN=TOKEN, TELEGRAM_API_BASE=api_base, ADMIN_IDS=",".join(map(str, admin_ids)),
+               METRICS_HOST="127.0.0.1", METRICS_PORT=str(metrics_port), PROFILE_ON_START="0",
+               PYTHONUNBUFFERED="1", TELEGRAM_API_LOCAL="1" if local_api else "0")
+    if not keep_throttle:
+        env.update(THROTTLE_RATE="1000", THROTTLE_BURST="1000",
+                   UPLOAD_THROTTLE_RATE="1000", UPLOAD_THROTTLE_BURST="1000")
+    log = open(os.path.join(workdir, "bot.log"), "wb")
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py")], cwd=workdir, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    return process, log
+
+
+def stop_bot(process) -> None:
+    if process.poll() is not None:
+        return
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def scrape_db_calls(metrics_port: int) -> dict:
+    try:
+        async with ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{metrics_port}/metrics") as response:
+                return report.db_call_counts(report.parse_prometheus(await response.text()))
+    except OSError:
+        return {}
+
+
+def check_stored_uploads(workdir: str, expected: dict) -> dict:
+    """Compare the files each applicant uploaded with the length of its ``uploaded_files``."""
+    conn = sqlite3.connect(os.path.join(workdir, config.DATABASE_NAME))
+    try:
+        stored = dict(conn.execute(
+            "SELECT user_id, COALESCE(json_array_length(uploaded_files), 0) FROM resumes WHERE uploaded_files LIKE '[%'"
+        ).fetchall())
+    finally:
+        conn.close()
+    incomplete = {user_id: stored.get(user_id, 0) for user_id, count in expected.items() if stored.get(user_id, 0) != count}
+    return {"checked": len(expected), "incomplete": incomplete}
+
+
+async def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    # پوشه سرور کنار پوشه ربات، روی همان دیسک (hardlink ممکن است)
+    api = FakeBotAPI(TOKEN, local_dir=os.path.join(workdir, "bot-api") if args.local_api else None)
+    runner, api_base = await start_fake_api(api)
+    metrics_port = _free_port()
+    admin_ids = [ADMIN_BASE_ID + i for i in range(max(args.admins, 1))]
+    process, log = start_bot(workdir, api_base, metrics_port, admin_ids, args.keep_throttle, args.local_api)
+    try:
+        try:
+            await asyncio.wait_for(api.polling.wait(), args.startup_timeout)
+        except asyncio.TimeoutError:
+            raise SystemExit(f"bot did not start polling within {args.startup_timeout}s, see {workdir}/bot.log")
+
+        stats = Stats()
+        rng = random.Random(args.seed)
+        gate = asyncio.Semaphore(args.concurrency)
+
+        # با محدودیت‌های واقعی، هر کاربر کمی کندتر از THROTTLE_RATE مرحله می‌فرستد
+        pace = 1.1 / config.THROTTLE_RATE if args.keep_throttle else 0.0
+
+        def client(user_id):
+            return Client(api, user_id, stats, args.timeout, args.settle, args.think_time, pace)
+
+        async def applicant(user_id):
+            async with gate:
+                scenario = applicant_scenario(client(user_id), random.Random(rng.random()),
+                                              args.edit_ratio, args.max_upload_kb, args.album_size)
+                await run_user(stats, "applicant", scenario)
+
+        tasks = [applicant(APPLICANT_BASE_ID + i) for i in range(args.applicants)]
+        tasks += [
+            run_user(stats, "admin", admin_scenario(client(admin_id), random.Random(rng.random()), args.admin_rounds))
+            for admin_id in admin_ids[:args.admins]
+        ]
+        started = time.monotonic()
+        await asyncio.gather(*tasks)
+        duration = time.monotonic() - started
+
+        db_calls = await scrape_db_calls(metrics_port)
+        memory = read_memory(process.pid)
+        settings = {k: v for k, v in vars(args).items() if k not in ("save", "baseline", "keep")}
+        result = report.summarize(stats, duration, api, db_calls, memory, settings)
+        result["stored_uploads"] = check_stored_uploads(workdir, stats.expected_files)
+        result["commit"] = _git_commit()
+        return result
+    finally:
+        stop_bot(process)
+        log.close()
+        await runner.cleanup()
+        if args.keep:
+            print(f"working directory kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description=__doc__.split("\n")[0])
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="predefined size (explicit options win)")
+    parser.add_argument("--applicants", type=int, help="number of simulated applicants")
+    parser.add_argument("--admins", type=int, help="number of simulated admins")
+    parser.add_argument("--concurrency", type=int, help="applicants walking the flow at the same time")
+    parser.add_argument("--admin-rounds", type=int, default=3, help="search/stats/export/backup rounds per admin")
+    parser.add_argument("--edit-ratio", type=float, default=0.3, help="share of applicants editing before confirming")
+    parser.add_argument("--max-upload-kb", type=int, default=2048, help="upper bound of work sample sizes")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause before each step, seconds")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for the bot's answer")
+    parser.add_argument("--settle", type=float, default=0.05, help="quiet time that ends a step, seconds")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-throttle", action="store_true", help="keep the production anti-flood limits")
+    parser.add_argument("--album-size", type=int, default=0, help="send work samples as one album of N documents")
+    parser.add_argument("--local-api", action="store_true", help="local Bot API server mode (files from disk)")
+    parser.add_argument("--keep", action="store_true", help="keep the bot's working directory")
+    parser.add_argument("--save", metavar="PATH", help="write the result as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="compare with a saved result")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    defaults = PRESETS[args.preset or "smoke"]
+    for key, value in defaults.items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    result = asyncio.run(run(args))
+    print(report.format_report(result))
+    status = 1 if result["stored_uploads"]["incomplete"] else 0
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        report.save(result, args.save)
+    if args.baseline:
+        lines, regressed = report.compare(result, report.load(args.baseline), args.tolerance)
+        print("\n".join(lines))
+        return 1 if regressed else status
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
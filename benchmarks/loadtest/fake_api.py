@@ -0,0 +1,286 @@
+# benchmarks/loadtest/fake_api.py
+"""Local stand-in for the Telegram Bot API, good enough to drive the bot under load.
+
+The bot talks to it through ``TELEGRAM_API_BASE`` (see config.py). Updates
+are injected with ``push_update`` and delivered either by ``getUpdates``
+long polling or, after ``setWebhook``, by POSTing them to the webhook URL.
+Every bot request that targets a chat is put in that chat's ``Inbox`` so
+the scenario driver can wait for the bot's answers.
+
+Implemented methods: getMe, getUpdates, setWebhook, deleteWebhook,
+getWebhookInfo, sendMessage, editMessageText, editMessageReplyMarkup,
+answerCallbackQuery, getFile (+ file download), sendDocument,
+sendMediaGroup. Anything else answers ``true`` and is only counted.
+
+With ``local_dir`` it behaves like a ``--local`` server: getFile writes
+the file under that directory and answers with its absolute path, and
+nothing is downloaded over HTTP.
+"""
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import Counter, deque
+
+from aiohttp import ClientSession, web
+
+BOT_USER = {"id": 4200000000, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot"}
+# متدهایی که پیام برمی‌گردانند
+MESSAGE_METHODS = frozenset({
+    "sendMessage", "editMessageText", "editMessageReplyMarkup", "sendDocument", "sendPhoto", "copyMessage",
+})
+
+
+class Inbox:
+    """Bot API calls addressed to one chat: ``(monotonic time, method, params)``."""
+
+    def __init__(self):
+        self.events = asyncio.Queue()
+        self.last_message_id = None
+
+    def drain(self) -> int:
+        count = 0
+        while not self.events.empty():
+            self.events.get_nowait()
+            count += 1
+        return count
+
+    async def next(self, timeout: float):
+        return await asyncio.wait_for(self.events.get(), timeout)
+
+
+class FakeBotAPI:
+    def __init__(self, token: str, poll_limit: int = 100, local_dir: str = None):
+        self.token = token
+        self.poll_limit = poll_limit
+        self.local_dir = local_dir
+        self.inboxes = {}
+        self.calls = Counter()
+        self.uploaded_bytes = 0
+        self.downloaded_bytes = 0
+        self.local_bytes = 0
+        self.files = {}
+        self.polling = asyncio.Event()
+        self.webhook_url = None
+        self._pending = deque()
+        self._has_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._callback_chats = {}
+        self._payloads = {}
+        self._webhook_task = None
+        self._client = None
+
+    def inbox(self, chat_id: int) -> Inbox:
+        inbox = self.inboxes.get(chat_id)
+        if inbox is None:
+            inbox = self.inboxes[chat_id] = Inbox()
+        return inbox
+
+    def next_message_id(self) -> int:
+        return next(self._message_ids)
+
+    # --- تزریق آپدیت ---
+
+    def push_update(self, update: dict) -> int:
+        update_id = update["update_id"] = next(self._update_ids)
+        callback = update.get("callback_query")
+        if callback is not None:
+            self._callback_chats[callback["id"]] = callback["from"]["id"]
+        self._pending.append(update)
+        self._has_updates.set()
+        return update_id
+
+    def add_file(self, file_id: str, size: int) -> None:
+        """Make ``file_id`` available to getFile / download with ``size`` bytes of content."""
+        self.files[file_id] = size
+
+    # --- سرور ---
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=256 * 1024 * 1024)
+        app.router.add_post(f"/bot{self.token}/{{method}}", self._handle_method)
+        app.router.add_get(f"/bot{self.token}/{{method}}", self._handle_method)
+        app.router.add_get(f"/file/bot{self.token}/{{path:.*}}", self._handle_download)
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+    async def _cleanup(self, app) -> None:
+        if self._webhook_task:
+            self._webhook_task.cancel()
+        if self._client:
+            await self._client.close()
+
+    async def _read_params(self, request) -> dict:
+        params = dict(request.query)
+        if request.can_read_body:
+            form = await request.post()
+            for key, value in form.items():
+                if isinstance(value, web.FileField):
+                    self.uploaded_bytes += len(value.file.read())
+                    value = f"attach://{value.filename}"
+                params[key] = value
+        return params
+
+    async def _handle_method(self, request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._read_params(request)
+        self.calls[method] += 1
+
+        if method == "getUpdates":
+            if self.webhook_url:
+                return _error(409, "Conflict: can't use getUpdates method while webhook is active")
+            return _ok(await self._get_updates(params))
+        handler = getattr(self, f"_api_{method}", None)
+        result = handler(params) if handler else True
+
+        chat_id = params.get("chat_id")
+        if method == "answerCallbackQuery":
+            chat_id = self._callback_chats.pop(params.get("callback_query_id"), None)
+        if chat_id is not None:
+            chat_id = int(chat_id)
+            inbox = self.inbox(chat_id)
+            if isinstance(result, dict) and method in MESSAGE_METHODS:
+                inbox.last_message_id = result["message_id"]
+            inbox.events.put_nowait((time.monotonic(), method, params))
+        return _ok(result)
+
+    async def _get_updates(self, params: dict) -> list:
+        self.polling.set()
+        offset = int(params.get("offset") or 0)
+        limit = min(int(params.get("limit") or self.poll_limit), self.poll_limit)
+        timeout = float(params.get("timeout") or 0)
+        # آپدیت‌های قبل از offset تایید شده‌اند
+        while self._pending and self._pending[0]["update_id"] < offset:
+            self._pending.popleft()
+        if not self._pending and timeout:
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self._pending, limit))
+
+    async def _handle_download(self, request) -> web.Response:
+        path = request.match_info["path"]
+        file_id = path.rsplit("/", 1)[-1].split(".", 1)[0]
+        size = self.files.get(file_id)
+        if size is None:
+            return web.Response(status=404)
+        self.calls["downloadFile"] += 1
+        self.downloaded_bytes += size
+        return web.Response(body=self._payload(size), content_type="application/octet-stream")
+
+    def _payload(self, size: int) -> bytes:
+        payload = self._payloads.get(size)
+        if payload is None:
+            payload = self._payloads[size] = bytes(size)
+        return payload
+
+    # --- وب‌هوک ---
+
+    def _api_setWebhook(self, params: dict):
+        self.webhook_url = params.get("url") or None
+        if self.webhook_url and self._webhook_task is None:
+            self._webhook_task = asyncio.create_task(self._deliver_webhooks())
+        return True
+
+    def _api_deleteWebhook(self, params: dict):
+        self.webhook_url = None
+        if params.get("drop_pending_updates") in ("true", "True", "1"):
+            self._pending.clear()
+        return True
+
+    def _api_getWebhookInfo(self, params: dict):
+        return {"url": self.webhook_url or "", "has_custom_certificate": False,
+                "pending_update_count": len(self._pending)}
+
+    async def _deliver_webhooks(self) -> None:
+        self._client = ClientSession()
+        try:
+            while True:
+                if not self.webhook_url or not self._pending:
+                    self._has_updates.clear()
+                    await self._has_updates.wait()
+                    continue
+                self.polling.set()
+                update = self._pending[0]
+                try:
+                    async with self._client.post(self.webhook_url, json=update) as response:
+                        delivered = response.status < 300
+                except OSError:
+                    delivered = False
+                if delivered:
+                    self._pending.popleft()
+                else:
+                    await asyncio.sleep(0.1)
+        finally:
+            self._webhook_task = None
+
+    # --- متدهای پیام ---
+
+    def _message(self, params: dict, **fields) -> dict:
+        return {
+            "message_id": self.next_message_id(), "date": int(time.time()),
+            "chat": {"id": int(params["chat_id"]), "type": "private"}, "from": BOT_USER, **fields,
+        }
+
+    def _api_getMe(self, params: dict):
+        return BOT_USER
+
+    def _api_sendMessage(self, params: dict):
+        return self._message(params, text=params.get("text", ""))
+
+    def _api_editMessageText(self, params: dict):
+        if "chat_id" not in params:
+            return True  # پیام inline
+        message = self._message(params, text=params.get("text", ""))
+        message["message_id"] = int(params.get("message_id") or message["message_id"])
+        return message
+
+    def _api_editMessageReplyMarkup(self, params: dict):
+        if "chat_id" not in params:
+            return True
+        message = self._message(params, text="")
+        message["message_id"] = int(params.get("message_id") or message["message_id"])
+        return message
+
+    def _api_sendDocument(self, params: dict):
+        file_id = f"out{self.next_message_id()}"
+        return self._message(params, document={"file_id": file_id, "file_unique_id": file_id})
+
+    def _api_sendMediaGroup(self, params: dict):
+        media = json.loads(params.get("media") or "[]")
+        return [self._message(params) for _ in media]
+
+    def _api_getFile(self, params: dict):
+        file_id = params.get("file_id")
+        size = self.files.get(file_id, 0)
+        path = f"documents/{file_id}.bin"
+        if self.local_dir:
+            # مثل سرور محلی: فایل روی دیسک نوشته و مسیر مطلق آن برگردانده می‌شود
+            path = os.path.join(self.local_dir, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(self._payload(size))
+            self.local_bytes += size
+        return {"file_id": file_id, "file_unique_id": file_id, "file_size": size, "file_path": path}
+
+
+def _ok(result) -> web.Response:
+    return web.json_response({"ok": True, "result": result})
+
+
+def _error(code: int, description: str) -> web.Response:
+    return web.json_response({"ok": False, "error_code": code, "description": description}, status=code)
+
+
+async def start_fake_api(api: FakeBotAPI, host: str = "127.0.0.1", port: int = 0):
+    """Serve ``api``; returns ``(runner, base_url)``."""
+    runner = web.AppRunner(api.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}"
@@ -0,0 +1,146 @@
+# benchmarks/loadtest/report.py
+"""Load-test result summary, text report and comparison with a saved baseline."""
+import json
+import re
+
+# متدهای DatabaseManager که در دیتابیس می‌نویسند
+WRITE_METHODS = frozenset({
+    "save_resume_data", "update_user_field", "soft_delete_user", "restore_user", "delete_user",
+    "log", "log_admin_action", "rebuild_dedup_index", "bulk_update_users", "confirm_resume",
+    "mark_outbox_sent", "mark_outbox_failed", "prune_outbox", "create_broadcast", "checkpoint_broadcast",
+    "set_broadcast_status", "set_broadcast_progress_message", "compact_changelog",
+})
+# کلیدهای قابل مقایسه با baseline: (کلید، بزرگ‌تر بهتر است؟)
+COMPARED = (
+    ("updates_per_sec", True),
+    ("latency_ms.p50", False),
+    ("latency_ms.p95", False),
+    ("latency_ms.p99", False),
+    ("db_writes_per_update", False),
+    ("bot_peak_rss_mb", False),
+)
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_prometheus(text: str) -> list:
+    """[(name, labels dict, value)] from Prometheus text exposition."""
+    samples = []
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            samples.append((name, dict(_LABEL.findall(labels or "")), float(value)))
+    return samples
+
+
+def db_call_counts(samples: list) -> dict:
+    return {labels["method"]: int(value) for name, labels, value in samples
+            if name == "bot_db_seconds_count" and "method" in labels}
+
+
+def percentile(ordered: list, q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_summary(values: list) -> dict:
+    ordered = sorted(values)
+    return {
+        "p50": percentile(ordered, 0.5) * 1000, "p95": percentile(ordered, 0.95) * 1000,
+        "p99": percentile(ordered, 0.99) * 1000, "max": (ordered[-1] if ordered else 0.0) * 1000,
+    }
+
+
+def summarize(stats, duration: float, api, db_calls: dict, memory: dict, settings: dict) -> dict:
+    writes = {m: n for m, n in db_calls.items() if m in WRITE_METHODS}
+    answered = len(stats.latencies)
+    return {
+        "settings": settings,
+        "duration_sec": duration,
+        "updates_sent": stats.sent,
+        "updates_answered": answered,
+        "timeouts": stats.timeouts,
+        "updates_per_sec": answered / duration if duration else 0.0,
+        "latency_ms": latency_summary(stats.latencies),
+        "latency_ms_by_step": {label: latency_summary(values) for label, values in sorted(stats.latency_by_step.items())},
+        "scenarios_completed": dict(stats.completed),
+        "scenarios_failed": dict(stats.failed),
+        "uploaded_files": stats.uploaded_files,
+        "downloaded_mb": api.downloaded_bytes / 1024 / 1024,
+        "local_files_mb": api.local_bytes / 1024 / 1024,
+        "api_calls": dict(api.calls.most_common()),
+        "db_calls": db_calls,
+        "db_writes": sum(writes.values()),
+        "db_writes_by_method": writes,
+        "db_writes_per_update": sum(writes.values()) / answered if answered else 0.0,
+        **memory,
+    }
+
+
+def format_report(result: dict) -> str:
+    lat = result["latency_ms"]
+    lines = [
+        f"duration            {result['duration_sec']:.1f} s",
+        f"updates             {result['updates_answered']}/{result['updates_sent']} answered, {result['timeouts']} timeouts",
+        f"throughput          {result['updates_per_sec']:.1f} updates/s",
+        f"latency (ms)        p50 {lat['p50']:.1f}  p95 {lat['p95']:.1f}  p99 {lat['p99']:.1f}  max {lat['max']:.1f}",
+        f"scenarios           completed {result['scenarios_completed']}",
+    ]
+    for reason, count in sorted(result["scenarios_failed"].items()):
+        lines.append(f"  failed            {count} × {reason}")
+    lines.append(f"uploads             {result['uploaded_files']} files, {result['downloaded_mb']:.1f} MB downloaded by the bot")
+    stored = result.get("stored_uploads")
+    if stored:
+        complete = stored["checked"] - len(stored["incomplete"])
+        lines.append(f"stored uploads      {complete}/{stored['checked']} applicants have every file in uploaded_files")
+        for user_id, count in sorted(stored["incomplete"].items())[:5]:
+            lines.append(f"  incomplete        user {user_id}: {count} stored")
+    if result.get("local_files_mb"):
+        lines.append(f"                    {result['local_files_mb']:.1f} MB taken from the local server's disk")
+    lines.append(f"DB writes           {result['db_writes']} ({result['db_writes_per_update']:.2f} per update)")
+    for method, count in sorted(result["db_writes_by_method"].items(), key=lambda item: -item[1]):
+        lines.append(f"  {method:<28} {count}")
+    if result.get("bot_rss_mb") is not None:
+        lines.append(f"bot memory          RSS {result['bot_rss_mb']:.1f} MB, peak {result['bot_peak_rss_mb']:.1f} MB")
+    lines.append("slowest steps (p95 ms):")
+    steps = sorted(result["latency_ms_by_step"].items(), key=lambda item: -item[1]["p95"])
+    for label, summary in steps[:8]:
+        lines.append(f"  {label:<28} p50 {summary['p50']:8.1f}  p95 {summary['p95']:8.1f}")
+    return "\n".join(lines)
+
+
+def _lookup(result: dict, dotted: str):
+    value = result
+    for part in dotted.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> tuple:
+    """(report lines, regressed?) — a metric regresses when it is worse than baseline by more than ``tolerance``."""
+    lines, regressed = [], False
+    for key, higher_is_better in COMPARED:
+        new, old = _lookup(result, key), _lookup(baseline, key)
+        if not new or not old:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > tolerance:
+            flag, regressed = "  REGRESSION", True
+        lines.append(f"  {key:<24} {old:10.2f} -> {new:10.2f} ({change:+.1%}){flag}")
+    header = f"vs baseline {baseline.get('commit', '?')[:10]} (tolerance {tolerance:.0%}):"
+    return [header] + lines, regressed
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(result: dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
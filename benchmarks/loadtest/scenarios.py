@@ -0,0 +1,230 @@
+# benchmarks/loadtest/scenarios.py
+"""Scripted users for the load test.
+
+A ``Client`` is one Telegram user. ``step`` injects a message or callback
+update into the fake API and waits for the bot's answer; the delay until the
+first bot call addressed to the chat (message, edit or callback answer) is
+the recorded latency.
+
+* ``applicant_scenario`` walks every ``ResumeStates`` step: consent, the
+  personal/education fields, a loop of one to three skills (sometimes a
+  typed "other" skill), work-sample uploads (or one album) or skip, the work/position/
+  license/training questions, optionally an edit round trip from the
+  preview, and the final confirmation.
+* ``admin_scenario`` repeatedly opens the admin panel and runs a search,
+  the stats, the Excel export and the backup.
+"""
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+
+import config
+from benchmarks.loadtest.fake_api import BOT_USER
+
+OTHER_SKILL = "سایر مهارت‌ها"
+SKILL_CHOICES = [s for row in config.KEYBOARD_SKILLS[:-1] for s in row if s != OTHER_SKILL]
+LEVELS = config.KEYBOARD_SKILL_LEVEL[0]
+ENGLISH_LEVELS = ["مبتدی", "متوسط", "پیشرفته"]
+FIRST_NAMES = ["علی", "مریم", "رضا", "سارا", "محمد", "زهرا", "حسین", "نرگس", "امیر", "فاطمه"]
+LAST_NAMES = ["رضایی", "احمدی", "محمدی", "کریمی", "حسینی", "موسوی", "جعفری", "صادقی"]
+CITIES = ["تهران", "اصفهان", "شیراز", "تبریز", "مشهد", "کرج"]
+# هر مرحله با یکی از این‌ها تمام می‌شود (سؤال بعدی یا فایل درخواستی)
+REPLY_METHODS = frozenset({"sendMessage", "sendDocument", "sendMediaGroup", "sendPhoto"})
+
+
+class StepTimeout(Exception):
+    pass
+
+
+class Stats:
+    """Shared counters of one load-test run."""
+
+    def __init__(self):
+        self.latencies = []
+        self.latency_by_step = {}
+        self.sent = 0
+        self.timeouts = 0
+        self.completed = Counter()
+        self.failed = Counter()
+        self.uploaded_files = 0
+        self.expected_files = {}  # user_id -> work samples the bot should have stored
+
+
+    def record(self, label: str, seconds: float) -> None:
+        self.latencies.append(seconds)
+        self.latency_by_step.setdefault(label, []).append(seconds)
+
+
+class Client:
+    _ids = itertools.count(1)
+
+    def __init__(self, api, user_id: int, stats: Stats, timeout: float, settle: float, think_time: float = 0.0,
+                 pace: float = 0.0):
+        self.api = api
+        self.user_id = user_id
+        self.stats = stats
+        self.timeout = timeout
+        self.settle = settle
+        self.think_time = think_time
+        # کمترین فاصله بین دو مرحله؛ با محدودیت‌های واقعی ضد فلود (--keep-throttle) لازم است
+        self.pace = pace
+        self._stepped_at = 0.0
+        self.inbox = api.inbox(user_id)
+        self.user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+        self.chat = {"id": user_id, "type": "private"}
+
+    def _message(self, **fields) -> dict:
+        return {"message_id": self.api.next_message_id(), "date": int(time.time()),
+                "chat": self.chat, "from": self.user, **fields}
+
+    async def step(self, label: str, update, reply_methods=REPLY_METHODS) -> list:
+        """Send one update (or a list sent back to back); returns the bot calls it produced as ``(method, params)``.
+
+        The step ends once the bot has sent a message (the next question or
+        the requested file) and then stayed quiet for ``settle`` seconds, so
+        the next update never races the handler that is still running.
+        """
+        if self.think_time:
+            await asyncio.sleep(random.uniform(0, 2 * self.think_time))
+        if self.pace:
+            await asyncio.sleep(max(0.0, self._stepped_at + self.pace - time.monotonic()))
+        self.inbox.drain()
+        updates = update if isinstance(update, list) else [update]
+        self.stats.sent += 1
+        start = self._stepped_at = time.monotonic()
+        deadline = start + self.timeout
+        for update in updates:
+            self.api.push_update(update)
+        calls, replied = [], False
+        while True:
+            wait = max(0.0, deadline - time.monotonic())
+            if replied:
+                wait = min(wait, self.settle)
+            try:
+                received, method, params = await self.inbox.next(wait)
+            except asyncio.TimeoutError:
+                if replied:
+                    return calls
+                self.stats.timeouts += 1
+                raise StepTimeout(label) from None
+            if not calls:
+                self.stats.record(label, received - start)
+            calls.append((method, params))
+            replied = replied or method in reply_methods
+
+    async def text(self, text: str, label: str = None) -> list:
+        return await self.step(label or text, {"message": self._message(text=text)})
+
+    async def tap(self, data: str, label: str = None) -> list:
+        message = {"message_id": self.inbox.last_message_id or self.api.next_message_id(),
+                   "date": int(time.time()), "chat": self.chat, "from": BOT_USER, "text": "…"}
+        callback = {"id": f"cb{next(self._ids)}", "from": self.user, "chat_instance": str(self.user_id),
+                    "data": data, "message": message}
+        return await self.step(label or data.split("_", 1)[0], {"callback_query": callback})
+
+    def _document(self, file_name: str, size: int) -> dict:
+        file_id = f"f{self.user_id}x{next(self._ids)}"
+        self.api.add_file(file_id, size)
+        self.stats.uploaded_files += 1
+        return {"file_id": file_id, "file_unique_id": file_id, "file_name": file_name,
+                "mime_type": "application/pdf", "file_size": size}
+
+    async def upload(self, file_name: str, size: int) -> list:
+        # از فایل دوم به بعد ربات همان پیام وضعیت آپلود را ویرایش می‌کند
+        return await self.step("upload", {"message": self._message(document=self._document(file_name, size))},
+                               REPLY_METHODS | {"editMessageText"})
+
+    async def upload_album(self, sizes: list) -> list:
+        """Send one album (documents sharing a ``media_group_id``) the way Telegram does: all parts at once."""
+        group = f"g{self.user_id}x{next(self._ids)}"
+        parts = [
+            {"message": self._message(document=self._document(f"album{i}.pdf", size), media_group_id=group)}
+            for i, size in enumerate(sizes)
+        ]
+        return await self.step("upload_album", parts, REPLY_METHODS | {"editMessageText"})
+
+
+async def applicant_scenario(client: Client, rng: random.Random, edit_ratio: float = 0.3,
+                             max_upload_kb: int = 2048, album_size: int = 0) -> None:
+    full_name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    await client.text("/start")
+    await client.tap("consent_accept")
+    await client.text(config.KEYBOARD_MAIN_TEXTS[0], label="build_resume")
+    await client.text(f"@user{client.user_id}", label="username")
+    await client.text(full_name, label="full_name")
+    await client.tap(f"study_status_{rng.choice(config.KEYBOARD_STUDY_STATUS_TEXTS)}")
+    await client.tap(f"degree_{rng.choice(config.KEYBOARD_DEGREE_TEXTS)}")
+    await client.tap(f"major_{rng.choice(config.KEYBOARD_MAJOR_TEXTS)}")
+    await client.text(f"دانشگاه {rng.choice(CITIES)}", label="field_university")
+    await client.text(f"{rng.uniform(12, 20):.2f}", label="gpa")
+    await client.text(f"{rng.choice(CITIES)} خیابان {rng.randint(1, 99)}", label="location")
+    await client.text(f"0912{rng.randint(1000000, 9999999)}", label="phone_main")
+    await client.text(f"0935{rng.randint(1000000, 9999999)}", label="phone_emergency")
+    await client.tap(f"english_{rng.choice(ENGLISH_LEVELS)}")
+
+    # لوپ مهارت‌ها: یک تا سه مهارت، گاهی «سایر مهارت‌ها» با نام تایپ‌شده
+    for skill in rng.sample(SKILL_CHOICES, rng.randint(1, 3)):
+        if rng.random() < 0.2:
+            await client.tap(f"skill_{OTHER_SKILL}", label="skill")
+            skill = f"مهارت {rng.randint(1, 50)}"
+            await client.text(skill, label="skill_other_name")
+        else:
+            await client.tap(f"skill_{skill}", label="skill")
+        await client.tap(f"level_{skill}_{rng.choice(LEVELS)}", label="level")
+    await client.tap("skill_continue", label="skill")
+
+    uploads = album_size or rng.choice((0, 1, 1, 2))
+    if uploads:
+        if album_size:
+            await client.upload_album([rng.randint(16, max_upload_kb) * 1024 for _ in range(album_size)])
+        else:
+            for i in range(uploads):
+                await client.upload(f"sample{i}.pdf", rng.randint(16, max_upload_kb) * 1024)
+        client.stats.expected_files[client.user_id] = uploads
+        await client.tap("worksample_finish", label="worksample")
+    else:
+        await client.tap("worksample_skip", label="worksample")
+
+    if rng.random() < 0.5:
+        await client.text(config.KEYBOARD_WORK_HISTORY_TEXTS[0], label="work_history")
+        await client.text(f"شرکت {rng.randint(1, 500)}", label="work_history_details")
+    else:
+        await client.text(config.KEYBOARD_WORK_HISTORY_TEXTS[1], label="work_history")
+    await client.text(rng.choice(config.KEYBOARD_JOB_POSITION_TEXTS), label="job_position")
+    await client.text("رد شدن", label="other_details")
+    if rng.random() < 0.5:
+        await client.text("بله", label="license")
+        await client.text(rng.choice(CITIES), label="license_city")
+    else:
+        await client.text("خیر", label="license")
+    await client.text(rng.choice(config.KEYBOARD_TRAINING_REQUEST_TEXTS), label="training")
+
+    if rng.random() < edit_ratio:
+        await client.tap("edit_resume", label="edit")
+        await client.text(config.FIELD_LABELS["gpa"], label="edit_select_field")
+        await client.text(f"{rng.uniform(12, 20):.2f}", label="edit_value")
+        await client.text("تایید ویرایش", label="edit_confirm")
+    await client.tap("confirm_send", label="confirm")
+
+
+async def admin_scenario(client: Client, rng: random.Random, rounds: int, pause: float = 1.0) -> None:
+    for _ in range(rounds):
+        await client.text("/admin")
+        await client.text("🔎 جستجوی کاربر", label="admin_search")
+        await client.text(rng.choice(LAST_NAMES), label="admin_search_term")
+        await client.text("/admin")
+        await client.text("📊 آمار کلی", label="admin_stats")
+        await client.text("📤 دریافت اکسل", label="admin_export")
+        await client.text("📥 پشتیبان‌گیری", label="admin_backup")
+        await asyncio.sleep(pause)
+
+
+async def run_user(stats: Stats, kind: str, scenario) -> None:
+    try:
+        await scenario
+    except StepTimeout as e:
+        stats.failed[f"{kind}: timeout at {e}"] += 1
+    else:
+        stats.completed[kind] += 1
@@ -0,0 +1,198 @@
+# broadcast.py
+"""Send one admin message to every applicant matching a filter.
+
+A broadcast is a row in the ``broadcasts`` table: the filter, the text
+and a cursor (the last user id handled). ``BroadcastEngine`` walks the
+recipients in user id order with keyset pages, sends a few messages at a
+time through ``RateLimiter`` and checkpoints the cursor and the counts
+after every chunk, so after a restart ``resume_all`` carries on where it
+stopped (at most one chunk is sent twice). Chats that blocked the bot
+are recorded on their resume (``chat_blocked_at``) and skipped by later
+broadcasts and reminders until the user writes to the bot again.
+"""
+import asyncio
+import time
+
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+import config
+
+# کلیدهای فیلتر گیرندگان به شکلی که ادمین می‌نویسد («مهارت: AutoCAD پیشرفته»)
+FILTER_KEYS = {
+    "مهارت": "skill",
+    "شهر": "location",
+    "جایگاه": "job_position",
+    "مقطع": "degree",
+    "وضعیت": "study_status",
+}
+ALL_RECIPIENTS = "همه"
+
+
+def parse_filters(text: str) -> dict:
+    """Filter dict from lines of ``key: value``; ``همه`` selects everyone.
+
+    Raises ValueError naming the first line it does not understand.
+    """
+    text = (text or "").strip()
+    if text == ALL_RECIPIENTS:
+        return {}
+    filters = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        key, sep, value = line.partition(":")
+        field = FILTER_KEYS.get(key.strip())
+        value = value.strip()
+        if not sep or field is None or not value:
+            raise ValueError(line.strip())
+        if field == "skill":
+            # سطح مهارت (اختیاری) آخرین کلمه است: «AutoCAD پیشرفته» یعنی پیشرفته یا بالاتر
+            name, _, level = value.rpartition(" ")
+            if name and level in config.KEYBOARD_SKILL_LEVEL[0]:
+                value = name.strip()
+                filters["skill_level"] = level
+        filters[field] = value
+    if not filters:
+        raise ValueError(text)
+    return filters
+
+
+def describe_filters(filters: dict) -> str:
+    if not filters:
+        return ALL_RECIPIENTS
+    labels = {field: key for key, field in FILTER_KEYS.items()}
+    parts = []
+    for field, value in filters.items():
+        if field == "skill_level":
+            continue
+        if field == "skill" and filters.get("skill_level"):
+            value = f"{value} ({filters['skill_level']} یا بالاتر)"
+        parts.append(f"{labels[field]}: {value}")
+    return "، ".join(parts)
+
+
+class RateLimiter:
+    """Space sends to at most ``rate`` per second overall and one per ``per_chat`` seconds to the same chat.
+
+    Each ``wait`` reserves its slot before sleeping, so concurrent callers
+    never share one; ``pause`` pushes every later slot back (flood wait).
+    """
+
+    def __init__(self, rate: float, per_chat: float = 1.0, max_chats: int = 10000):
+        self.interval = 1.0 / rate
+        self.per_chat = per_chat
+        self.max_chats = max_chats
+        self._next = 0.0
+        self._chats = {}
+
+    async def wait(self, chat_id: int) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next, self._chats.get(chat_id, 0.0))
+        self._next = slot + self.interval
+        self._chats[chat_id] = slot + self.per_chat
+        if len(self._chats) > self.max_chats:
+            self._chats = {chat: t for chat, t in self._chats.items() if t > now}
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        self._next = max(self._next, time.monotonic() + seconds)
+
+
+class BroadcastEngine:
+    def __init__(self, db, bot, rate: float = 20.0, concurrency: int = 4, page_size: int = 500,
+                 progress_interval: float = 5.0, on_progress=None):
+        self.db = db
+        self.bot = bot
+        self.limiter = RateLimiter(rate)
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress
+        self.sent = 0
+        self._tasks = {}
+        self._stopping = set()
+
+    def start(self, broadcast_id: int) -> None:
+        # توقفی که هنوز به تسک در حال اجرا نرسیده لغو می‌شود و همان تسک ادامه می‌دهد
+        self._stopping.discard(broadcast_id)
+        if broadcast_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(broadcast_id))
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+
+    def resume_all(self) -> None:
+        """Restart the broadcasts that were running when the bot stopped."""
+        for broadcast_id in self.db.get_broadcast_ids('running'):
+            self.start(broadcast_id)
+
+    def stop(self, broadcast_id: int, status: str) -> bool:
+        """Pause ("paused") or cancel ("cancelled") a broadcast; a running one stops after its current chunk."""
+        if self.db.set_broadcast_status(broadcast_id, status, expected='running'):
+            self._stopping.add(broadcast_id)
+            return True
+        return status == 'cancelled' and self.db.set_broadcast_status(broadcast_id, status, expected='paused')
+
+    def resume(self, broadcast_id: int) -> bool:
+        if not self.db.set_broadcast_status(broadcast_id, 'running', expected='paused'):
+            return False
+        self.start(broadcast_id)
+        return True
+
+    async def _run(self, broadcast_id: int) -> None:
+        broadcast = self.db.get_broadcast(broadcast_id)
+        if broadcast is None or broadcast['status'] != 'running':
+            return
+        cursor = broadcast['cursor']
+        reported = time.monotonic()
+        try:
+            while broadcast_id not in self._stopping:
+                page = self.db.get_broadcast_recipients(broadcast['filters'], cursor, self.page_size)
+                if not page:
+                    self.db.set_broadcast_status(broadcast_id, 'done')
+                    break
+                for start in range(0, len(page), self.concurrency):
+                    if broadcast_id in self._stopping:
+                        break
+                    chunk = page[start:start + self.concurrency]
+                    results = await asyncio.gather(*(self._send(user_id, broadcast['text']) for user_id in chunk))
+                    cursor = chunk[-1]
+                    blocked = [user_id for user_id, result in zip(chunk, results) if result == 'blocked']
+                    sent = results.count('sent')
+                    self.db.checkpoint_broadcast(broadcast_id, cursor, sent, results.count('failed'), blocked)
+                    self.sent += sent
+                    if time.monotonic() - reported >= self.progress_interval:
+                        reported = time.monotonic()
+                        await self._report(broadcast_id)
+        except Exception as e:
+            # با وضعیت «متوقف» می‌ماند تا ادمین پس از رفع مشکل ادامه دهد
+            self.db.log("ERROR", f"Broadcast {broadcast_id} stopped: {e}")
+            self.db.set_broadcast_status(broadcast_id, 'paused')
+        finally:
+            self._stopping.discard(broadcast_id)
+        await self._report(broadcast_id)
+
+    async def _send(self, user_id: int, text: str) -> str:
+        while True:
+            await self.limiter.wait(user_id)
+            try:
+                await self.bot.send_message(user_id, text, parse_mode=ParseMode.HTML)
+                return 'sent'
+            except TelegramRetryAfter as e:
+                self.limiter.pause(e.retry_after)
+            except TelegramForbiddenError:
+                return 'blocked'
+            except TelegramBadRequest as e:
+                return 'blocked' if 'chat not found' in str(e).lower() else 'failed'
+            except Exception:
+                return 'failed'
+
+    async def _report(self, broadcast_id: int) -> None:
+        if self.on_progress is None:
+            return
+        try:
+            await self.on_progress(self.db.get_broadcast(broadcast_id))
+        except Exception as e:
+            self.db.log("ERROR", f"Broadcast {broadcast_id} progress update failed: {e}")
@@ -0,0 +1,42 @@
+# cache.py
+"""Small in-process caches shared by the bot handlers."""
+from collections import OrderedDict
+
+
+class VersionedLRUCache:
+    """LRU cache whose entries are valid only for one row version.
+
+    Entries are stored per ``user_id`` together with the ``row_version`` they
+    were built from; a lookup with a different version is a miss. This keeps
+    the cache correct even for writes that bypass ``invalidate``.
+    """
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, version):
+        entry = self._data.get(user_id)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self._data.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user_id, version, value):
+        self._data[user_id] = (version, value)
+        self._data.move_to_end(user_id)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, user_id):
+        self._data.pop(user_id, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
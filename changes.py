@@ -0,0 +1,121 @@
+# changes.py
+"""Incremental feed of resume changes for the HR system.
+
+Every write to ``resumes`` (form saves, admin edits, block/unblock, soft
+delete/restore, bulk actions, purge) appends a row to the ``changelog``
+table in the same transaction, numbered by a monotonic ``seq``. Instead
+of re-importing the whole Excel file, a client keeps the last seq it has
+applied and asks for what came after it:
+
+    GET /changes?since=<seq>&limit=<n>
+    Authorization: Bearer <CHANGES_TOKEN>
+
+The answer is NDJSON, one line per changed user with the latest op and
+the user's current resume (``null`` after a purge), gzip-compressed when
+the client accepts it. ``X-Next-Cursor`` is the ``since`` for the next
+call and ``X-Has-More`` says whether to call again right away. The ETag
+changes with every new change, so a poll with ``If-None-Match`` and
+nothing new costs a 304. Lines carry the current row, not the row as it
+was at that seq, so applying them is idempotent (upsert by user_id).
+
+``compact_changelog`` drops old changes that a newer change of the same
+user supersedes; reading from ``since=0`` still yields every user.
+"""
+import asyncio
+import hmac
+import json
+
+from aiohttp import web
+
+import config
+
+MAX_LIMIT = 10000
+# ردیف‌هایی که در هر نوبت از دیتابیس خوانده و در پاسخ نوشته می‌شوند
+WRITE_BATCH = 500
+FEED_COLUMNS = ["user_id", *config.RESUME_FIELDS, "is_blocked", "is_deleted", "score", "completed_at", "row_version"]
+JSON_COLUMNS = ("skills", "uploaded_files")
+
+
+def feed_resume(row: dict) -> dict:
+    resume = {column: row.get(column) for column in FEED_COLUMNS}
+    for column in JSON_COLUMNS:
+        if isinstance(resume[column], str):
+            try:
+                resume[column] = json.loads(resume[column])
+            except ValueError:
+                pass
+    return resume
+
+
+def latest_per_user(changes: list) -> list:
+    """The last change of each user in ``changes``, in seq order."""
+    latest = {}
+    for change in changes:
+        latest[change[1]] = change
+    return sorted(latest.values())
+
+
+async def start_changes_server(db, host: str, port: int, token: str, default_limit: int = 1000) -> web.AppRunner:
+    async def handle_changes(request):
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            raise web.HTTPUnauthorized()
+        try:
+            since = int(request.query.get("since", 0))
+            limit = min(int(request.query.get("limit", default_limit)), MAX_LIMIT)
+        except ValueError:
+            raise web.HTTPBadRequest(text="since and limit must be integers")
+        if since < 0 or limit < 1:
+            raise web.HTTPBadRequest(text="since must be >= 0 and limit >= 1")
+
+        changes = db.get_changes(since, limit)
+        cursor = changes[-1][0] if changes else since
+        head = db.get_change_head()
+        headers = {
+            "ETag": f'"{since}-{cursor}-{head}"',
+            "X-Next-Cursor": str(cursor),
+            "X-Has-More": "1" if cursor < head else "0",
+        }
+        if headers["ETag"] in request.headers.get("If-None-Match", ""):
+            raise web.HTTPNotModified(headers=headers)
+
+        response = web.StreamResponse(headers=headers)
+        response.content_type = "application/x-ndjson"
+        response.charset = "utf-8"
+        # gzip فقط اگر کلاینت Accept-Encoding آن را داشته باشد
+        response.enable_compression()
+        await response.prepare(request)
+        latest = latest_per_user(changes)
+        for start in range(0, len(latest), WRITE_BATCH):
+            batch = latest[start:start + WRITE_BATCH]
+            rows, columns = db.get_resumes_for_export([change[1] for change in batch])
+            resumes = {resume['user_id']: resume for resume in (dict(zip(columns, row)) for row in rows)}
+            lines = []
+            for seq, user_id, op, fields, row_version, changed_at in batch:
+                resume = resumes.get(user_id)
+                lines.append(json.dumps({
+                    "seq": seq, "user_id": user_id, "op": op,
+                    "fields": json.loads(fields) if fields else None,
+                    "row_version": row_version, "changed_at": changed_at,
+                    "resume": feed_resume(resume) if resume else None,
+                }, ensure_ascii=False, default=str))
+            await response.write(("\n".join(lines) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/changes", handle_changes)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def compact_changelog(db, keep_days: int, interval: float = 3600.0) -> None:
+    while True:
+        try:
+            deleted = db.compact_changelog(keep_days)
+            if deleted:
+                db.log("INFO", f"Changelog compacted: {deleted} superseded changes removed")
+        except Exception as e:
+            db.log("ERROR", f"Changelog compaction failed: {e}")
+        await asyncio.sleep(interval)
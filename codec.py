@@ -0,0 +1,149 @@
+# codec.py
+"""Storage form of resume values.
+
+Handlers and exports work with the labels the user picked, the GPA as a
+string ("17", not "17.0") and ``"%Y-%m-%d %H:%M:%S"`` date strings; the
+``resumes`` table stores small integer codes for enumerations, REAL for
+the GPA and unix timestamps for dates (migration 4). ``ResumeCodec``
+converts between the two. Codes live in the ``enum_labels`` table so they
+never change once assigned; a label that is not there yet (a new keyboard
+option, an admin typing a free value) gets the next code on first write.
+"""
+import datetime
+import sqlite3
+
+import config
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# فیلدهای شمارشی و فهرست برچسب‌هایی که کدهای اولیه از روی آن‌ها ساخته می‌شوند (کد = جایگاه + 1)
+ENUM_FIELDS = {
+    "study_status": config.KEYBOARD_STUDY_STATUS_TEXTS,
+    "degree": config.KEYBOARD_DEGREE_TEXTS,
+    "major": config.KEYBOARD_MAJOR_TEXTS,
+    "english_level": config.KEYBOARD_SKILL_LEVEL[0],
+    "job_position": config.KEYBOARD_JOB_POSITION_TEXTS,
+    "training_request": config.KEYBOARD_TRAINING_REQUEST_TEXTS,
+    # همان دکمه‌های بله/خیر
+    "has_work_license": config.KEYBOARD_TRAINING_REQUEST_TEXTS,
+}
+TIMESTAMP_FIELDS = ("register_date", "deleted_at")
+REAL_FIELDS = ("gpa",)
+
+
+def to_timestamp(value):
+    """Local date string -> unix timestamp; anything unparsable is returned unchanged."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    text = str(value).strip()
+    for fmt in (DATE_FORMAT, "%Y-%m-%d"):
+        try:
+            return int(datetime.datetime.strptime(text, fmt).timestamp())
+        except ValueError:
+            continue
+    return value
+
+
+def from_timestamp(value):
+    if isinstance(value, (int, float)):
+        return datetime.datetime.fromtimestamp(value).strftime(DATE_FORMAT)
+    return value
+
+
+def to_real(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return value
+
+
+def from_real(value):
+    # 17.0 همان‌طور که کاربر نوشته بود (17) نمایش داده می‌شود؛ repr بدون گرد کردن و دقیقاً برگشت‌پذیر است
+    if isinstance(value, float):
+        text = repr(value)
+        return text[:-2] if text.endswith(".0") else text
+    return value
+
+
+class ResumeCodec:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.load()
+
+    def load(self) -> None:
+        """(Re)read the codes from ``enum_labels``; call it after a rollback so labels added by it are forgotten."""
+        codes = {field: {} for field in ENUM_FIELDS}   # field -> {label: code}
+        labels = {field: {} for field in ENUM_FIELDS}  # field -> {code: label}
+        for field, code, label in self.conn.execute("SELECT field, code, label FROM enum_labels"):
+            if field in codes:
+                codes[field][label] = code
+                labels[field][code] = label
+        self._codes, self._labels = codes, labels
+
+    def code(self, field: str, label, create: bool = True):
+        """Code of ``label``; a new label is added to ``enum_labels`` (the caller commits) unless ``create`` is False.
+
+        The new code is cached right away so the rest of the transaction sees
+        it; a caller that rolls back must ``load()`` again.
+        """
+        if label is None or isinstance(label, int):
+            return label
+        codes = self._codes[field]
+        code = codes.get(label)
+        if code is None and create:
+            code = max(codes.values(), default=0) + 1
+            self.conn.execute("INSERT INTO enum_labels (field, code, label) VALUES (?, ?, ?)", (field, code, label))
+            codes[label] = code
+            self._labels[field][code] = label
+        return code
+
+    def label(self, field: str, code):
+        return self._labels[field].get(code, code)
+
+    def codes_matching(self, field: str, term: str) -> list:
+        """Codes whose label contains ``term`` (the LIKE search of the old TEXT column)."""
+        term = term.casefold()
+        return [code for label, code in self._codes[field].items() if term in label.casefold()]
+
+    def encode(self, field: str, value):
+        if field in ENUM_FIELDS:
+            return self.code(field, value)
+        if field in TIMESTAMP_FIELDS:
+            return to_timestamp(value)
+        if field in REAL_FIELDS:
+            return to_real(value)
+        return value
+
+    def decode(self, field: str, value):
+        if field in ENUM_FIELDS:
+            return self.label(field, value)
+        if field in TIMESTAMP_FIELDS:
+            return from_timestamp(value)
+        if field in REAL_FIELDS:
+            return from_real(value)
+        return value
+
+    def decode_row(self, data: dict) -> dict:
+        for field, value in data.items():
+            if value is not None:
+                data[field] = self.decode(field, value)
+        return data
+
+    def row_decoder(self, columns: list):
+        """Function decoding a row tuple with the given column names (for bulk reads)."""
+        decoders = [
+            (i, field) for i, field in enumerate(columns)
+            if field in ENUM_FIELDS or field in TIMESTAMP_FIELDS or field in REAL_FIELDS
+        ]
+
+        def decode(row):
+            if not decoders:
+                return row
+            row = list(row)
+            for i, field in decoders:
+                if row[i] is not None:
+                    row[i] = self.decode(field, row[i])
+            return tuple(row)
+        return decode
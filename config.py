@@ -1,12 +1,21 @@
 # config.py
 import os
-from dotenv import load_dotenv
 
-# Load .env (if present)
-load_dotenv()
+# Load .env (if present); python-dotenv is only imported when there is a file to read
+_ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(_ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(_ENV_FILE)
 
 # --- تنظیمات اصلی ---
 TOKEN = os.getenv("BOT_TOKEN") or os.getenv("TOKEN") or "8490115986:AAFC1N284kS1k0yRALylr4pBRAP5HJ1NCqo"
+# آدرس سرور Bot API (خالی = api.telegram.org). برای سرور محلی یا تست بار، مثلاً http://127.0.0.1:8081
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE") or ""
+# سرور محلی telegram-bot-api با --local: فایل‌ها از دیسک سرور برداشته می‌شوند (local_api.py)
+TELEGRAM_API_LOCAL = os.getenv("TELEGRAM_API_LOCAL", "0").lower() in ("1", "true", "yes")
+# اگر سرور پوشه فایل‌ها را با مسیر دیگری می‌بیند (مثلاً volume داکر): مسیر از دید سرور و از دید ربات
+TELEGRAM_API_SERVER_DIR = os.getenv("TELEGRAM_API_SERVER_DIR") or ""
+TELEGRAM_API_LOCAL_DIR = os.getenv("TELEGRAM_API_LOCAL_DIR") or ""
 
 # Support multiple admin IDs via .env: set ADMIN_IDS="123,456" or ADMIN_ID="123"
 _admins_env = os.getenv("ADMIN_IDS") or os.getenv("ADMIN_ID")
@@ -46,7 +55,6 @@ DATABASE_NAME = "db.sqlite3"
 LOG_FILE = "logs.txt"
 UPLOADS_DIR = "uploads"
 EXCEL_OUTPUT = "resumes_export.xlsx"
-os.makedirs(UPLOADS_DIR, exist_ok=True)
 
 # --- محتوای متنی ---
 START_MESSAGE = (
@@ -156,4 +164,95 @@ FIELD_LABELS = {
 
 # نمایش فارسی ساختار رزومه بر اساس ترتیب `RESUME_FIELDS` (برای اکسپورت/نمایش)
 # این لیست از `FIELD_LABELS` ساخته می‌شود تا همیشه برچسب‌های فارسی هم‌ردیف با کلیدها فراهم باشد
-RESUME_FIELDS_PERSIAN = [FIELD_LABELS.get(k, k) for k in RESUME_FIELDS]
\ No newline at end of file
+RESUME_FIELDS_PERSIAN = [FIELD_LABELS.get(k, k) for k in RESUME_FIELDS]
+
+# --- امتیازدهی و رتبه‌بندی متقاضیان ---
+# امتیاز هر رزومه از مجموع وزن‌دار این مؤلفه‌ها ساخته می‌شود (scoring.py)
+SCORE_WEIGHTS = {
+    "degree": 1.0,         # ضریب امتیاز مقطع (SCORE_DEGREE_POINTS)
+    "gpa": 20.0,           # حداکثر امتیاز معدل (معدل ۲۰ = امتیاز کامل)
+    "major_match": 10.0,   # رشته در لیست رشته‌های ترجیحی
+    "skills": 2.0,         # به ازای هر امتیاز سطح مهارت
+    "english_level": 6.0,  # حداکثر امتیاز زبان انگلیسی
+    "work_history": 15.0,  # داشتن سابقه کار
+    "license": 8.0,        # داشتن پروانه اشتغال
+}
+SCORE_DEGREE_POINTS = {"کاردانی": 5, "کارشناسی": 10, "ارشد": 15, "دکتری": 20}
+# امتیاز سطوح بر اساس ترتیب KEYBOARD_SKILL_LEVEL (مبتدی=1، متوسط=2، پیشرفته=3)
+SCORE_LEVEL_POINTS = {level: i + 1 for i, level in enumerate(KEYBOARD_SKILL_LEVEL[0])}
+SCORE_SKILLS_CAP = 15
+SCORE_GPA_MAX = 20.0
+_preferred_majors_env = os.getenv("SCORE_PREFERRED_MAJORS")
+SCORE_PREFERRED_MAJORS = (
+    [m.strip() for m in _preferred_majors_env.split(',') if m.strip()]
+    if _preferred_majors_env else ["شهرسازی", "نقشه‌برداری", "GIS"]
+)
+TOP_CANDIDATES_LIMIT = 10
+
+# --- تشخیص متقاضیان تکراری ---
+DEDUP_NUM_PERM = 32              # تعداد جایگشت‌های MinHash
+DEDUP_BANDS = 8                  # تعداد باندهای LSH (هر باند DEDUP_NUM_PERM / DEDUP_BANDS ردیف)
+DEDUP_SIMILARITY_THRESHOLD = 0.6 # حداقل شباهت سه‌حرفی برای اعلام «احتمال تکراری»
+DEDUP_LINKED_PHONE_BONUS = 0.2   # افزوده به شباهت وقتی تلفن اصلی یکی تلفن اضطراری دیگری است
+
+# --- کش ---
+RESUME_CARD_CACHE_SIZE = 512  # تعداد کارت‌های رزومه رندرشده نگهداری‌شده در حافظه (LRU)
+
+# --- خروجی PDF رزومه (resume_pdf.py) ---
+# فونت TTF فارسی، مثلاً Vazirmatn؛ نیاز به پکیج‌های reportlab، arabic-reshaper و python-bidi دارد
+PDF_FONT_PATH = os.getenv("PDF_FONT_PATH") or "fonts/Vazirmatn-Regular.ttf"
+PDF_RENDER_WORKERS = 2        # پروسه‌های رندر PDF
+PDF_CACHE_SIZE = 64           # تعداد PDFهای رندرشده نگهداری‌شده در حافظه (LRU)
+PDF_ZIP_OUTPUT = "resumes_pdf_{admin_id}.zip"
+
+# --- محافظت در برابر سوءاستفاده و ارسال پشت‌سرهم ---
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE") or 1.0)               # تعداد پیام/کلیک مجاز در هر ثانیه برای هر کاربر (به‌طور میانگین)
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST") or 8)                  # حداکثر پیام/کلیک پشت‌سرهم
+UPLOAD_THROTTLE_RATE = float(os.getenv("UPLOAD_THROTTLE_RATE") or 0.2)  # آپلود فایل: یک فایل در هر ۵ ثانیه
+UPLOAD_THROTTLE_BURST = int(os.getenv("UPLOAD_THROTTLE_BURST") or 10)   # حداکثر فایل پشت‌سرهم (مثلاً یک آلبوم نمونه کار)
+MEDIA_GROUP_WINDOW_SEC = 0.5  # مکث پس از آخرین قسمت یک آلبوم پیش از پردازش یکجای آن
+CALLBACK_DEDUP_TTL_SEC = 1.0   # کلیک دوباره روی همان دکمه همان پیام در این فاصله نادیده گرفته می‌شود
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY") or 64)        # حداکثر هندلرهای همزمان؛ بقیه به ترتیب اولویت صبر می‌کنند
+MAX_PENDING_UPDATES = int(os.getenv("MAX_PENDING_UPDATES") or 1000)    # آپدیت‌های دریافت‌شده و تمام‌نشده؛ بیش از این، دریافت آپدیت متوقف می‌شود
+SHED_QUEUE_DEPTH = int(os.getenv("SHED_QUEUE_DEPTH") or 200)           # با این تعداد منتظر، کلیک‌های تکراری پشتیبانی/کانال دور ریخته می‌شوند
+
+# --- صف ارسال پیام‌ها (outbox) ---
+OUTBOX_BATCH_SIZE = 50          # پیام‌های خوانده و ارسال‌شده در هر دور
+OUTBOX_INTERVAL_SEC = 5.0       # فاصله بررسی صف برای تلاش‌های دوباره (پیام‌های جدید بلافاصله ارسال می‌شوند)
+OUTBOX_MAX_ATTEMPTS = 8         # پس از این تعداد تلاش ناموفق، پیام کنار گذاشته می‌شود
+
+# --- یادآوری رزومه‌های نیمه‌کاره ---
+REMINDER_INTERVALS_HOURS = [24, 72, 168]   # فاصله هر یادآوری از آخرین فعالیت کاربر؛ فهرست خالی یعنی خاموش
+REMINDER_BATCH_SIZE = 20                  # حداکثر یادآوری در هر دور (محدودیت نرخ ارسال)
+REMINDER_INTERVAL_SEC = 10.0              # فاصله دورهای بررسی یادآوری‌ها
+REMINDER_MESSAGE = (
+    "👋 رزومه شما در مهندس یار هنوز کامل نشده است.\n"
+    "برای ادامه از همان جایی که متوقف شدید، روی دکمه زیر بزنید."
+)
+
+# --- ارسال همگانی ---
+BROADCAST_RATE_PER_SEC = 20.0            # سقف کل پیام‌های همگانی در ثانیه (محدودیت تلگرام حدود ۳۰ است)
+BROADCAST_CONCURRENCY = 4                # پیام‌های همزمان؛ پیشرفت پس از هر دسته ذخیره می‌شود
+BROADCAST_PROGRESS_INTERVAL_SEC = 5.0    # فاصله به‌روزرسانی پیام پیشرفت در پنل ادمین
+
+# --- متریک‌ها و پایش عملکرد ---
+# endpoint متریک‌ها با فرمت Prometheus روی http://METRICS_HOST:METRICS_PORT/metrics (پورت 0 = غیرفعال)
+METRICS_HOST = os.getenv("METRICS_HOST") or "127.0.0.1"
+METRICS_PORT = int(os.getenv("METRICS_PORT") or 9108)
+METRICS_WINDOW = 1024  # تعداد آخرین نمونه‌هایی که صدک‌ها (p50/p95/p99) از آن‌ها محاسبه می‌شوند
+
+# --- فید تغییرات برای سیستم منابع انسانی (changes.py) ---
+# http://CHANGES_HOST:CHANGES_PORT/changes?since=<seq>؛ پورت 0 یا توکن خالی = غیرفعال
+CHANGES_HOST = os.getenv("CHANGES_HOST") or "127.0.0.1"
+CHANGES_PORT = int(os.getenv("CHANGES_PORT") or 0)
+CHANGES_TOKEN = os.getenv("CHANGES_TOKEN") or ""
+CHANGES_PAGE_LIMIT = 1000      # تعداد پیش‌فرض تغییرات در هر درخواست
+CHANGELOG_KEEP_DAYS = 30       # تغییرات قدیمی‌تر که تغییر جدیدتری از همان کاربر دارند فشرده می‌شوند
+
+# --- پروفایلینگ و ردیابی کندی ---
+PROFILE_ON_START = int(os.getenv("PROFILE_ON_START") or 0)  # پروفایل N ثانیه اول اجرا و ارسال برای ادمین (0 = غیرفعال)
+PROFILE_DEFAULT_SECONDS = 30      # مدت پیش‌فرض دستور /profile
+PROFILE_MAX_SECONDS = 300
+PROFILE_INTERVAL_MS = 5           # فاصله نمونه‌برداری از پشته‌ها
+SLOW_HANDLER_THRESHOLD_SEC = float(os.getenv("SLOW_HANDLER_THRESHOLD_SEC") or 3.0)
+SLOW_SQL_THRESHOLD_MS = float(os.getenv("SLOW_SQL_THRESHOLD_MS") or 100)
@@ -3,74 +3,78 @@ import os
 import sqlite3
 import json
 import datetime
-import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Alignment, Font
 import config # وارد کردن کل ماژول config
+from scoring import SCORE_INPUT_FIELDS, compute_score
+from profiling import TimedCursor
+import dedup
+import migrations
+from codec import ResumeCodec
 
 class DatabaseManager:
-    def __init__(self):
-        self.conn = sqlite3.connect(config.DATABASE_NAME)
-        self.cursor = self.conn.cursor()
+    # فاصله یادآوری‌های رزومه نیمه‌کاره از آخرین فعالیت کاربر (ثانیه)
+    REMINDER_DELAYS = [int(hours * 3600) for hours in config.REMINDER_INTERVALS_HOURS]
+
+    def __init__(self, db_path: str = None):
+        self.conn = sqlite3.connect(db_path or config.DATABASE_NAME)
+        # کوئری‌های کندتر از SLOW_SQL_THRESHOLD_MS با پارامترهای پنهان‌شده در فایل لاگ ثبت می‌شوند
+        self.cursor = TimedCursor(self.conn.cursor(), config.SLOW_SQL_THRESHOLD_MS / 1000, self._log_slow_query)
+        # callbacks(user_id, fields) invoked after every committed write to a resume row;
+        # fields is a set of changed columns or None when the whole row was rewritten
+        self._write_listeners = []
         self._create_tables()
 
     def _create_tables(self):
-        # جدول اصلی رزومه‌ها: ستون is_blocked برای قابلیت بلاک/آنبلاک اضافه شد
-        self.cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS resumes (
-                user_id INTEGER PRIMARY KEY,
-                {', '.join([f'{field} TEXT' for field in config.RESUME_FIELDS])},
-                is_admin_notified INTEGER DEFAULT 0,
-                is_blocked INTEGER DEFAULT 0,
-                is_deleted INTEGER DEFAULT 0,
-                deleted_at TEXT,
-                deleted_by INTEGER
-            )
-        """)
-        # جدول لاگ فعالیت‌ها
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                level TEXT,
-                message TEXT
-            )
-        """)
-        self.conn.commit()
-        # جدول ثبت اعمال ادمین (تاریخچه تغییرات)
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS admin_actions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                admin_id INTEGER,
-                target_user_id INTEGER,
-                action_type TEXT,
-                field_name TEXT,
-                old_value TEXT,
-                new_value TEXT
-            )
-        """)
+        # جدول‌ها، ستون‌ها و ایندکس‌ها با مهاجرت‌های نسخه‌دار ساخته/به‌روز می‌شوند (migrations.py)؛
+        # اگر طرح دیتابیس به‌روز باشد فقط یک SELECT اجرا می‌شود
+        applied = migrations.migrate(self.conn, log=self._log_migration)
+        # مقادیر شمارشی/تاریخ به شکل کد و timestamp ذخیره می‌شوند؛ تبدیل به برچسب با codec
+        self.codec = ResumeCodec(self.conn)
+        if not applied:
+            return
+        self.log("INFO", f"Applied schema migrations: {applied}")
+        # ردیف‌هایی که پیش از ستون score یا جدول dedup_keys (یا کلیدهای e: مهاجرت ۱۰) نوشته شده‌اند
+        self._backfill_scores()
+        self.cursor.execute("SELECT 1 FROM dedup_keys LIMIT 1")
+        if self.cursor.fetchone() is None:
+            self.cursor.execute("SELECT 1 FROM resumes LIMIT 1")
+            if self.cursor.fetchone() is not None:
+                self.rebuild_dedup_index()
+
+    def _log_migration(self, message):
+        # جدول logs ممکن است هنوز ساخته نشده باشد؛ فقط در فایل
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._append_log_file(timestamp, "MIGRATION", message)
+
+    def _backfill_scores(self):
+        """Compute scores for rows written before the score column existed."""
+        self.cursor.execute("SELECT * FROM resumes WHERE score IS NULL")
+        rows = self.cursor.fetchall()
+        if not rows:
+            return
+        columns = [col[0] for col in self.cursor.description]
+        updates = []
+        for row in rows:
+            data = self.codec.decode_row(dict(zip(columns, row)))
+            updates.append((compute_score(data), data['user_id']))
+        self.cursor.executemany("UPDATE resumes SET score = ? WHERE user_id = ?", updates)
         self.conn.commit()
-        # Ensure all fields from config.RESUME_FIELDS exist as columns (migrate if needed)
-        try:
-            self.cursor.execute("PRAGMA table_info(resumes)")
-            existing_cols = [row[1] for row in self.cursor.fetchall()]
-            for field in config.RESUME_FIELDS:
-                if field not in existing_cols:
-                    self.cursor.execute(f"ALTER TABLE resumes ADD COLUMN {field} TEXT")
-            # ensure new admin/soft-delete columns exist
-            extra_cols = ['is_admin_notified', 'is_blocked', 'is_deleted', 'deleted_at', 'deleted_by']
-            for c in extra_cols:
-                if c not in existing_cols:
-                    try:
-                        self.cursor.execute(f"ALTER TABLE resumes ADD COLUMN {c} TEXT")
-                    except Exception:
-                        pass
-            self.conn.commit()
-        except Exception:
-            # If pragma/alter not supported or fails, ignore and continue (table already created earlier)
-            pass
+        self.log("INFO", f"Backfilled scores for {len(updates)} resumes.")
+
+    def add_write_listener(self, callback):
+        """Register callback(user_id, fields) to run after a resume row is written."""
+        self._write_listeners.append(callback)
+
+    def _rollback(self):
+        self.conn.rollback()
+        # برچسب‌های شمارشی که در همین تراکنش کد گرفته بودند دیگر وجود ندارند
+        self.codec.load()
+
+    def _notify_write(self, user_id, fields=None):
+        for callback in self._write_listeners:
+            try:
+                callback(user_id, fields)
+            except Exception as e:
+                self.log("ERROR", f"Write listener failed for user {user_id}: {e}")
 
     def log(self, level, message):
         """ثبت رویداد در دیتابیس و فایل متنی"""
@@ -80,12 +84,57 @@ class DatabaseManager:
             (timestamp, level, message)
         )
         self.conn.commit()
+        self._append_log_file(timestamp, level, message)
+
+    def _append_log_file(self, timestamp, level, message):
         # ثبت در فایل متنی
         with open(config.LOG_FILE, 'a', encoding='utf-8') as f:
             f.write(f"[{timestamp}] [{level}] {message}\n")
 
+    def _log_slow_query(self, sql, params, seconds):
+        # فقط در فایل؛ نوشتن در جدول logs وسط یک تراکنش باز، آن را زودتر commit می‌کرد
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._append_log_file(timestamp, "SLOW_SQL", f"{seconds * 1000:.1f} ms: {sql} params={params}")
+
     def save_resume_data(self, user_id, data: dict):
         """ذخیره یا به‌روزرسانی اطلاعات رزومه کاربر"""
+        try:
+            self._write_resume(user_id, data)
+            self.conn.commit()
+        except Exception:
+            self._rollback()
+            raise
+        self._notify_write(user_id)
+        self.log("INFO", f"Resume data updated for User ID: {user_id}")
+
+    def confirm_resume(self, user_id, data: dict, messages: list):
+        """Save the confirmed resume and queue its ``messages`` in one transaction.
+
+        ``messages`` is a list of (kind, chat_id, payload dict) for the
+        outbox; is_admin_notified is reset until the admin notifications
+        among them are delivered (``mark_outbox_sent``). Raises on failure,
+        after rolling back: then neither the resume nor the messages exist.
+        """
+        now = int(datetime.datetime.now().timestamp())
+        try:
+            self._write_resume(user_id, data, admin_notified=0)
+            self.cursor.execute(
+                "UPDATE resumes SET completed_at = ?, next_reminder_at = NULL WHERE user_id = ?", (now, user_id)
+            )
+            self.cursor.executemany(
+                "INSERT INTO outbox (kind, chat_id, user_id, payload, created_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(kind, chat_id, user_id, json.dumps(payload, ensure_ascii=False), now, now)
+                 for kind, chat_id, payload in messages]
+            )
+            self.conn.commit()
+        except Exception:
+            self._rollback()
+            raise
+        self._notify_write(user_id)
+        self.log("INFO", f"Resume confirmed for User ID: {user_id}, {len(messages)} messages queued")
+
+    def _write_resume(self, user_id, data: dict, admin_notified=None):
         # For any list or dict values (e.g., skills, uploaded_files), store as JSON text
         fields = config.RESUME_FIELDS.copy()
         values = []
@@ -97,21 +146,48 @@ class DatabaseManager:
                 except Exception:
                     values.append(str(v))
             else:
-                values.append(v)
+                values.append(self.codec.encode(k, v))
+
+        # امتیاز رتبه‌بندی همراه با همان INSERT ذخیره می‌شود
+        fields.append('score')
+        values.append(compute_score(data))
 
         field_placeholders = ', '.join(fields)
         value_placeholders = ', '.join(['?' for _ in fields])
+        updates = ', '.join(f"{f} = excluded.{f}" for f in fields)
 
+        # هر ذخیره فعالیت کاربر است: شمارش یادآوری از نو و اولین یادآوری پس از REMINDER_DELAYS[0]
+        now = int(datetime.datetime.now().timestamp())
+        next_reminder = now + self.REMINDER_DELAYS[0] if self.REMINDER_DELAYS else None
+
+        # هر نوشتن، نسخه ردیف را یک واحد افزایش می‌دهد (برای اعتبارسنجی کش کارت رزومه)
+        # بقیه ستون‌ها (بلاک، اطلاع‌رسانی ادمین، زمان تکمیل) حفظ می‌شوند؛ حذف نرم مثل قبل (REPLACE) برمی‌گردد
         query = f"""
-            INSERT OR REPLACE INTO resumes (user_id, {field_placeholders})
-            VALUES (?, {value_placeholders})
+            INSERT INTO resumes (user_id, {field_placeholders}, row_version, is_admin_notified,
+                                 last_activity_at, reminder_count, next_reminder_at)
+            VALUES (?, {value_placeholders}, 1, COALESCE(?, 0), ?, 0, ?)
+            ON CONFLICT(user_id) DO UPDATE SET {updates},
+                row_version = COALESCE(row_version, 0) + 1,
+                is_admin_notified = COALESCE(?, is_admin_notified),
+                is_deleted = 0, deleted_at = NULL, deleted_by = NULL,
+                last_activity_at = excluded.last_activity_at, reminder_count = 0, chat_blocked_at = NULL,
+                next_reminder_at = CASE WHEN completed_at IS NULL THEN excluded.next_reminder_at END
         """
 
         # Prepare params: user_id first
-        params = (user_id, *values)
+        params = (user_id, *values, admin_notified, now, next_reminder, admin_notified)
         self.cursor.execute(query, params)
-        self.conn.commit()
-        self.log("INFO", f"Resume data updated for User ID: {user_id}")
+        self._index_dedup_keys(user_id, data)
+        self._record_change([user_id], 'upsert')
+
+    def _record_change(self, user_ids, op: str, fields=None):
+        """Append one changelog row per user in the caller's transaction (with the row's new row_version)."""
+        self.cursor.execute(
+            "INSERT INTO changelog (user_id, op, fields, row_version, changed_at) "
+            "SELECT user_id, ?, ?, row_version, ? FROM resumes WHERE user_id IN (SELECT value FROM json_each(?))",
+            (op, json.dumps(sorted(fields)) if fields else None, int(datetime.datetime.now().timestamp()),
+             json.dumps(list(user_ids)))
+        )
         
     def get_resume_data(self, user_id):
         """دریافت تمام اطلاعات یک کاربر"""
@@ -119,7 +195,7 @@ class DatabaseManager:
         row = self.cursor.fetchone()
         if row:
             columns = [col[0] for col in self.cursor.description]
-            data = dict(zip(columns, row))
+            data = self.codec.decode_row(dict(zip(columns, row)))
             if 'skills' in data and data['skills']:
                 try:
                     data['skills'] = json.loads(data['skills'])
@@ -128,13 +204,59 @@ class DatabaseManager:
             return data
         return None
 
-    def get_resumes_for_export(self):
-        self.cursor.execute("SELECT * FROM resumes")
-        return self.cursor.fetchall(), [col[0] for col in self.cursor.description]
+    def get_row_version(self, user_id):
+        """نسخه فعلی ردیف کاربر (None اگر کاربر وجود نداشته باشد)؛ یک جستجوی ساده روی کلید اصلی."""
+        self.cursor.execute("SELECT row_version FROM resumes WHERE user_id = ?", (user_id,))
+        row = self.cursor.fetchone()
+        return (row[0] or 0) if row else None
+
+    def get_blocked_user_ids(self):
+        """شناسه همه کاربران بلاک‌شده (برای گرم کردن کش میان‌افزار ضد سوءاستفاده)"""
+        self.cursor.execute("SELECT user_id FROM resumes WHERE is_blocked = 1")
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def is_user_blocked(self, user_id) -> bool:
+        self.cursor.execute("SELECT is_blocked FROM resumes WHERE user_id = ?", (user_id,))
+        row = self.cursor.fetchone()
+        return bool(row and row[0])
+
+    def get_resumes_for_export(self, user_ids=None):
+        if user_ids is None:
+            self.cursor.execute("SELECT * FROM resumes")
+        else:
+            # فهرست شناسه‌ها به شکل یک آرایه JSON؛ محدودیت تعداد پارامترهای SQLite در کار نیست
+            self.cursor.execute(
+                "SELECT * FROM resumes WHERE user_id IN (SELECT value FROM json_each(?)) ORDER BY user_id",
+                (json.dumps(list(user_ids)),)
+            )
+        columns = [col[0] for col in self.cursor.description]
+        decode = self.codec.row_decoder(columns)
+        return [decode(row) for row in self.cursor.fetchall()], columns
 
     def search_resumes(self, term: str, limit: int = 10, offset: int = 0, filters: dict = None):
         """Search resumes by full_name, username or major with pagination. Returns (rows, total_count)."""
-        filters = filters or {}
+        where, params = self._search_where(term, filters)
+
+        # total count
+        count_q = f"SELECT COUNT(user_id) FROM resumes {where}"
+        self.cursor.execute(count_q, tuple(params))
+        total = self.cursor.fetchone()[0]
+
+        q = f"SELECT user_id, full_name, username, register_date FROM resumes {where} ORDER BY register_date DESC LIMIT ? OFFSET ?"
+        exec_params = tuple(params + [limit, offset])
+        self.cursor.execute(q, exec_params)
+        decode = self.codec.row_decoder(['user_id', 'full_name', 'username', 'register_date'])
+        rows = [decode(row) for row in self.cursor.fetchall()]
+        return rows, total
+
+    def search_user_ids(self, term: str, filters: dict = None) -> list:
+        """All user ids matching a search_resumes query (every page), for bulk operations."""
+        where, params = self._search_where(term, filters)
+        self.cursor.execute(f"SELECT user_id FROM resumes {where} ORDER BY register_date DESC", tuple(params))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def _search_where(self, term: str, filters: dict = None):
+        filters = dict(filters or {})
         like = f"%{term.strip()}%"
         # base where clause - exclude deleted by default
         include_deleted = filters.pop('_include_deleted', False)
@@ -144,27 +266,19 @@ class DatabaseManager:
             where = "WHERE is_deleted = 0"
         params = []
         if term:
-            where += " AND (full_name LIKE ? OR username LIKE ? OR major LIKE ?)"
-            params.extend([like, like, like])
+            # رشته به صورت کد ذخیره شده؛ جستجو روی برچسب‌ها در حافظه و سپس IN روی کدها
+            major_codes = self.codec.codes_matching('major', term.strip())
+            where += f" AND (full_name LIKE ? OR username LIKE ? OR major IN ({', '.join('?' * len(major_codes))}))"
+            params.extend([like, like, *major_codes])
 
         # basic filters support
         if 'study_status' in filters:
             where += " AND study_status = ?"
-            params.append(filters['study_status'])
+            params.append(self.codec.code('study_status', filters['study_status'], create=False))
         if 'degree' in filters:
             where += " AND degree = ?"
-            params.append(filters['degree'])
-
-        # total count
-        count_q = f"SELECT COUNT(user_id) FROM resumes {where}"
-        self.cursor.execute(count_q, tuple(params))
-        total = self.cursor.fetchone()[0]
-
-        q = f"SELECT user_id, full_name, username, register_date FROM resumes {where} ORDER BY register_date DESC LIMIT ? OFFSET ?"
-        exec_params = tuple(params + [limit, offset])
-        self.cursor.execute(q, exec_params)
-        rows = self.cursor.fetchall()
-        return rows, total
+            params.append(self.codec.code('degree', filters['degree'], create=False))
+        return where, params
 
     def log_admin_action(self, admin_id: int, target_user_id: int, action_type: str, field_name: str = None, old_value: str = None, new_value: str = None):
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -177,21 +291,65 @@ class DatabaseManager:
 
     def soft_delete_user(self, user_id: int, admin_id: int) -> bool:
         """Mark a user as deleted (soft delete)."""
-        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ts = int(datetime.datetime.now().timestamp())
         try:
-            self.cursor.execute("UPDATE resumes SET is_deleted = 1, deleted_at = ?, deleted_by = ? WHERE user_id = ?", (ts, admin_id, user_id))
+            self.cursor.execute("UPDATE resumes SET is_deleted = 1, deleted_at = ?, deleted_by = ?, row_version = COALESCE(row_version, 0) + 1 WHERE user_id = ?", (ts, admin_id, user_id))
+            self._record_change([user_id], 'soft_delete', {'is_deleted'})
             self.conn.commit()
+            self._notify_write(user_id, {'is_deleted'})
             self.log_admin_action(admin_id, user_id, 'soft_delete', None, None, None)
             return True
         except Exception as e:
             self.log("ERROR", f"soft_delete_user failed: {e}")
             return False
 
+    # action: (SET clause, condition of rows the action actually changes, changed column)
+    BULK_ACTIONS = {
+        'block': ("is_blocked = 1", "is_blocked = 0", 'is_blocked'),
+        'unblock': ("is_blocked = 0", "is_blocked = 1", 'is_blocked'),
+        'soft_delete': ("is_deleted = 1, deleted_at = :now, deleted_by = :admin_id", "is_deleted = 0", 'is_deleted'),
+        'restore': ("is_deleted = 0, deleted_at = NULL, deleted_by = NULL", "is_deleted = 1", 'is_deleted'),
+    }
+
+    def bulk_update_users(self, user_ids, action: str, admin_id: int):
+        """Apply a BULK_ACTIONS action to many users in one transaction.
+
+        Rows already in the target state are left alone; one admin_actions
+        row is written per changed user. Returns the changed user ids, or
+        None when the transaction failed and was rolled back.
+        """
+        set_clause, condition, field = self.BULK_ACTIONS[action]
+        now = datetime.datetime.now()
+        try:
+            self.cursor.execute(
+                f"UPDATE resumes SET {set_clause}, row_version = COALESCE(row_version, 0) + 1 "
+                f"WHERE user_id IN (SELECT value FROM json_each(:ids)) AND {condition} RETURNING user_id",
+                {'ids': json.dumps(list(user_ids)), 'now': int(now.timestamp()), 'admin_id': admin_id}
+            )
+            changed = [row[0] for row in self.cursor.fetchall()]
+            self._record_change(changed, action, {field})
+            timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+            self.cursor.executemany(
+                "INSERT INTO admin_actions (timestamp, admin_id, target_user_id, action_type) VALUES (?, ?, ?, ?)",
+                [(timestamp, admin_id, user_id, action) for user_id in changed]
+            )
+            self.conn.commit()
+        except Exception as e:
+            self._rollback()
+            self.log("ERROR", f"bulk {action} failed: {e}")
+            return None
+        for user_id in changed:
+            self._notify_write(user_id, {field})
+        self.log("ADMIN", f"Admin {admin_id} bulk {action} on {len(changed)} of {len(user_ids)} users")
+        return changed
+
     def restore_user(self, user_id: int, admin_id: int) -> bool:
         """Restore a soft-deleted user."""
         try:
-            self.cursor.execute("UPDATE resumes SET is_deleted = 0, deleted_at = NULL, deleted_by = NULL WHERE user_id = ?", (user_id,))
+            self.cursor.execute("UPDATE resumes SET is_deleted = 0, deleted_at = NULL, deleted_by = NULL, row_version = COALESCE(row_version, 0) + 1 WHERE user_id = ?", (user_id,))
+            self._record_change([user_id], 'restore', {'is_deleted'})
             self.conn.commit()
+            self._notify_write(user_id, {'is_deleted'})
             self.log_admin_action(admin_id, user_id, 'restore', None, None, None)
             return True
         except Exception as e:
@@ -200,12 +358,18 @@ class DatabaseManager:
     
 # database.py (فقط تابع export_to_excel اصلاح شده)
 
-    def export_to_excel(self):
-        """(مورد 3) تهیه خروجی اکسل از تمام رزومه‌ها"""
-        rows, columns = self.get_resumes_for_export()
+    def export_to_excel(self, user_ids=None):
+        """(مورد 3) تهیه خروجی اکسل از تمام رزومه‌ها (یا فقط user_ids)"""
+        rows, columns = self.get_resumes_for_export(user_ids)
         if not rows:
             return False, "دیتابیس خالی است."
-        
+
+        # pandas/openpyxl فقط برای خروجی اکسل لازم‌اند؛ import آن‌ها شروع ربات را کند می‌کرد
+        import pandas as pd
+        from openpyxl import load_workbook
+        from openpyxl.utils import get_column_letter
+        from openpyxl.styles import Alignment, Font
+
         df = pd.DataFrame(rows, columns=columns)
         
         if 'skills' in df.columns:
@@ -333,15 +497,23 @@ class DatabaseManager:
         self.cursor.execute("SELECT COUNT(user_id) FROM resumes")
         total_users = self.cursor.fetchone()[0]
         
-        self.cursor.execute("SELECT COUNT(user_id) FROM resumes WHERE register_date LIKE ?", (f'{today_date_str}%',))
+        # بازه [شروع روز، شروع روز بعد) روی ایندکس idx_resumes_register_date
+        day = datetime.datetime.strptime(today_date_str, "%Y-%m-%d")
+        self.cursor.execute(
+            "SELECT COUNT(user_id) FROM resumes WHERE register_date >= ? AND register_date < ?",
+            (int(day.timestamp()), int((day + datetime.timedelta(days=1)).timestamp()))
+        )
         today_users = self.cursor.fetchone()[0]
         
         return total_users, today_users
 
     def delete_user(self, user_id):
         """(مورد 5) حذف کاربر از دیتابیس"""
+        # قبل از DELETE ثبت می‌شود تا نسخه آخر ردیف در changelog بماند
+        self._record_change([user_id], 'purge')
         self.cursor.execute("DELETE FROM resumes WHERE user_id = ?", (user_id,))
         self.conn.commit()
+        self._notify_write(user_id)
         self.log("ADMIN", f"User {user_id} deleted from database.")
         
     def update_user_field(self, user_id, field_name, new_value):
@@ -359,13 +531,474 @@ class DatabaseManager:
             # برای سادگی، اگر یک لیست بود به JSON تبدیل شود
             if isinstance(new_value, list):
                 new_value = json.dumps(new_value, ensure_ascii=False)
-        
-        query = f"UPDATE resumes SET {field_name} = ? WHERE user_id = ?"
-        self.cursor.execute(query, (new_value, user_id))
-        self.conn.commit()
+        try:
+            stored_value = self.codec.encode(field_name, new_value)
+
+            query = f"UPDATE resumes SET {field_name} = ?, row_version = COALESCE(row_version, 0) + 1 WHERE user_id = ?"
+            self.cursor.execute(query, (stored_value, user_id))
+            if field_name in SCORE_INPUT_FIELDS:
+                self._refresh_score(user_id)
+            if field_name in dedup.DEDUP_INPUT_FIELDS:
+                row = self.get_resume_data(user_id)
+                if row:
+                    self._index_dedup_keys(user_id, row)
+            if field_name == 'is_blocked':
+                self._record_change([user_id], 'block' if int(new_value or 0) else 'unblock', {field_name})
+            else:
+                self._record_change([user_id], 'update', {field_name})
+            self.conn.commit()
+        except Exception:
+            self._rollback()
+            raise
+        self._notify_write(user_id, {field_name})
         self.log("ADMIN", f"User {user_id} field '{field_name}' updated to '{new_value}'.")
         return True
 
+    def _refresh_score(self, user_id):
+        """Recompute the stored score of a single row (caller commits)."""
+        self.cursor.execute("SELECT * FROM resumes WHERE user_id = ?", (user_id,))
+        row = self.cursor.fetchone()
+        if not row:
+            return
+        data = self.codec.decode_row(dict(zip([col[0] for col in self.cursor.description], row)))
+        self.cursor.execute("UPDATE resumes SET score = ? WHERE user_id = ?", (compute_score(data), user_id))
+
+    def get_top_candidates(self, job_position: str = None, limit: int = 10):
+        """برترین متقاضیان بر اساس امتیاز از پیش محاسبه‌شده. Returns (user_id, full_name, username, job_position, score) rows."""
+        if job_position:
+            self.cursor.execute(
+                "SELECT user_id, full_name, username, job_position, score FROM resumes "
+                "WHERE job_position = ? AND is_deleted = 0 ORDER BY score DESC LIMIT ?",
+                (self.codec.code('job_position', job_position, create=False), limit)
+            )
+        else:
+            self.cursor.execute(
+                "SELECT user_id, full_name, username, job_position, score FROM resumes "
+                "WHERE is_deleted = 0 ORDER BY score DESC LIMIT ?",
+                (limit,)
+            )
+        decode = self.codec.row_decoder(['user_id', 'full_name', 'username', 'job_position', 'score'])
+        return [decode(row) for row in self.cursor.fetchall()]
+
+    # ===============================================
+    #           تشخیص متقاضیان تکراری
+    # ===============================================
+
+    def _index_dedup_keys(self, user_id, data: dict):
+        """Replace the dedup keys of one user (caller commits)."""
+        self.cursor.execute("DELETE FROM dedup_keys WHERE user_id = ?", (user_id,))
+        self.cursor.executemany(
+            "INSERT OR IGNORE INTO dedup_keys (dedup_key, user_id) VALUES (?, ?)",
+            [(key, user_id) for key in dedup.dedup_keys(data)]
+        )
+
+    def find_duplicates(self, user_id, data: dict = None):
+        """Likely duplicates of a user. Returns [(other_user_id, reason, similarity)], reason is 'phone' or 'similar'."""
+        if data is None:
+            data = self.get_resume_data(user_id)
+            if not data:
+                return []
+        keys = dedup.dedup_keys(data)
+        if not keys:
+            return []
+        main_key = next((key for key in keys if key.startswith('p:')), None)
+        # تماس اضطراری مشترک (مثلاً دو خواهر و برادر) تکراری نیست؛ فقط کلیدهای مرتبط جستجو می‌شوند
+        lookup = list(dict.fromkeys(
+            [key for key in keys if not key.startswith('e:')] + dedup.linked_phone_keys(data)
+        ))
+        placeholders = ', '.join('?' for _ in lookup)
+        # کاربران حذف‌شده (نرم) نه با تلفن و نه با شباهت تکراری حساب نمی‌شوند
+        self.cursor.execute(
+            f"SELECT k.dedup_key, k.user_id FROM dedup_keys k JOIN resumes r ON r.user_id = k.user_id "
+            f"WHERE k.dedup_key IN ({placeholders}) AND k.user_id != ? AND r.is_deleted = 0",
+            (*lookup, user_id)
+        )
+        phone_hits, linked_hits, band_hits = set(), set(), set()
+        for key, other_id in self.cursor.fetchall():
+            if key == main_key:
+                phone_hits.add(other_id)
+            elif key.startswith(('p:', 'e:')):
+                linked_hits.add(other_id)
+            else:
+                band_hits.add(other_id)
+
+        results = {uid: (uid, 'phone', 1.0) for uid in phone_hits}
+        candidates = (band_hits | linked_hits) - phone_hits
+        if candidates:
+            placeholders = ', '.join('?' for _ in candidates)
+            self.cursor.execute(
+                f"SELECT user_id, full_name, field_university, phone_main FROM resumes WHERE user_id IN ({placeholders})",
+                tuple(candidates)
+            )
+            for other_id, full_name, university, phone in self.cursor.fetchall():
+                other = {'full_name': full_name, 'field_university': university, 'phone_main': phone}
+                score = dedup.similarity(data, other, linked=other_id in linked_hits)
+                if score >= config.DEDUP_SIMILARITY_THRESHOLD:
+                    results[other_id] = (other_id, 'similar', round(score, 2))
+        return sorted(results.values(), key=lambda r: -r[2])
+
+    def rebuild_dedup_index(self, batch_size: int = 1000) -> int:
+        """Recompute dedup keys for the whole table in batches. Returns number of indexed users."""
+        self.cursor.execute("DELETE FROM dedup_keys")
+        last_id, count = None, 0
+        while True:
+            if last_id is None:
+                self.cursor.execute(
+                    "SELECT user_id, full_name, field_university, phone_main, phone_emergency FROM resumes "
+                    "ORDER BY user_id LIMIT ?", (batch_size,)
+                )
+            else:
+                self.cursor.execute(
+                    "SELECT user_id, full_name, field_university, phone_main, phone_emergency FROM resumes "
+                    "WHERE user_id > ? ORDER BY user_id LIMIT ?", (last_id, batch_size)
+                )
+            rows = self.cursor.fetchall()
+            if not rows:
+                break
+            params = []
+            for uid, full_name, university, phone_main, phone_emergency in rows:
+                data = {'full_name': full_name, 'field_university': university,
+                        'phone_main': phone_main, 'phone_emergency': phone_emergency}
+                params.extend((key, uid) for key in dedup.dedup_keys(data))
+            self.cursor.executemany("INSERT OR IGNORE INTO dedup_keys (dedup_key, user_id) VALUES (?, ?)", params)
+            self.conn.commit()
+            last_id = rows[-1][0]
+            count += len(rows)
+        self.conn.commit()
+        self.log("INFO", f"Dedup index rebuilt for {count} resumes.")
+        return count
+
+    def sweep_duplicates(self):
+        """Batch sweep over the non-deleted users. Returns clusters of likely-duplicate user ids (largest first)."""
+        self.cursor.execute(
+            "SELECT k.dedup_key, GROUP_CONCAT(k.user_id) FROM dedup_keys k JOIN resumes r ON r.user_id = k.user_id "
+            "WHERE r.is_deleted = 0 GROUP BY k.dedup_key HAVING COUNT(*) > 1"
+        )
+        groups = self.cursor.fetchall()
+        candidate_ids = set()
+        pairs = set()
+        confirmed = []
+        for key, ids in groups:
+            members = sorted(int(i) for i in ids.split(','))
+            if key.startswith('p:'):
+                confirmed.append(members)
+                continue
+            if key.startswith('e:'):
+                # تماس اضطراری مشترک به‌تنهایی نشانه تکراری بودن نیست
+                continue
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    pairs.add((a, b))
+                    candidate_ids.update((a, b))
+        # تلفن اصلی یک نفر تماس اضطراری دیگری است: فقط همراه با شباهت کافی
+        self.cursor.execute(
+            "SELECT p.user_id, e.user_id FROM dedup_keys p "
+            "JOIN dedup_keys e ON e.dedup_key = 'e:' || substr(p.dedup_key, 3) AND e.user_id != p.user_id "
+            "JOIN resumes rp ON rp.user_id = p.user_id JOIN resumes re ON re.user_id = e.user_id "
+            "WHERE p.dedup_key >= 'p:' AND p.dedup_key < 'p;' AND rp.is_deleted = 0 AND re.is_deleted = 0"
+        )
+        linked = {tuple(sorted(pair)) for pair in self.cursor.fetchall()}
+        for pair in linked:
+            pairs.add(pair)
+            candidate_ids.update(pair)
+
+        if candidate_ids:
+            rows = {}
+            ids = list(candidate_ids)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                self.cursor.execute(
+                    f"SELECT user_id, full_name, field_university, phone_main FROM resumes "
+                    f"WHERE user_id IN ({', '.join('?' for _ in chunk)})",
+                    tuple(chunk)
+                )
+                for uid, full_name, university, phone in self.cursor.fetchall():
+                    rows[uid] = {'full_name': full_name, 'field_university': university, 'phone_main': phone}
+            for a, b in pairs:
+                if a not in rows or b not in rows:
+                    continue
+                if dedup.similarity(rows[a], rows[b], linked=(a, b) in linked) >= config.DEDUP_SIMILARITY_THRESHOLD:
+                    confirmed.append([a, b])
+
+        # union-find: ادغام زوج‌ها و گروه‌های تلفن مشترک در خوشه‌های نهایی
+        parent = {}
+
+        def find(x):
+            parent.setdefault(x, x)
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for members in confirmed:
+            root = find(members[0])
+            for m in members[1:]:
+                parent[find(m)] = root
+        clusters = {}
+        for uid in parent:
+            clusters.setdefault(find(uid), []).append(uid)
+        return sorted((sorted(c) for c in clusters.values() if len(c) > 1), key=len, reverse=True)
+
+    # --- outbox (پیام‌های در صف ارسال؛ OutboxDispatcher آن‌ها را می‌فرستد) ---
+
+    ADMIN_NOTIFICATION_KIND = 'admin_notification'
+
+    def get_due_outbox(self, limit: int = 50):
+        """Undelivered outbox rows whose retry time has come, oldest first:
+        [(id, kind, chat_id, user_id, payload dict, attempts)]."""
+        now = int(datetime.datetime.now().timestamp())
+        self.cursor.execute(
+            "SELECT id, kind, chat_id, user_id, payload, attempts FROM outbox "
+            "WHERE sent_at IS NULL AND failed_at IS NULL AND next_attempt_at <= ? "
+            "ORDER BY next_attempt_at, id LIMIT ?",
+            (now, limit)
+        )
+        return [(id_, kind, chat_id, user_id, json.loads(payload), attempts)
+                for id_, kind, chat_id, user_id, payload, attempts in self.cursor.fetchall()]
+
+    def mark_outbox_sent(self, ids) -> list:
+        """Mark delivered rows in one transaction; returns the users whose admin notifications are now done.
+
+        A user's is_admin_notified is set in the same transaction once none
+        of their admin notifications is still waiting (each was delivered or
+        given up on). A row already marked is left alone, so marking twice
+        has no effect.
+        """
+        now = int(datetime.datetime.now().timestamp())
+        try:
+            self.cursor.execute(
+                "UPDATE outbox SET sent_at = :now WHERE id IN (SELECT value FROM json_each(:ids)) "
+                "AND sent_at IS NULL RETURNING user_id, kind",
+                {'ids': json.dumps(list(ids)), 'now': now}
+            )
+            user_ids = {user_id for user_id, kind in self.cursor.fetchall() if kind == self.ADMIN_NOTIFICATION_KIND}
+            self.cursor.execute(
+                "UPDATE resumes SET is_admin_notified = 1 "
+                "WHERE user_id IN (SELECT value FROM json_each(:ids)) AND is_admin_notified = 0 "
+                "AND NOT EXISTS (SELECT 1 FROM outbox WHERE outbox.user_id = resumes.user_id "
+                "AND kind = :kind AND sent_at IS NULL AND failed_at IS NULL) RETURNING user_id",
+                {'ids': json.dumps(list(user_ids)), 'kind': self.ADMIN_NOTIFICATION_KIND}
+            )
+            notified = [row[0] for row in self.cursor.fetchall()]
+            self.conn.commit()
+        except Exception:
+            self._rollback()
+            raise
+        for user_id in notified:
+            self._notify_write(user_id, {'is_admin_notified'})
+        return notified
+
+    def mark_outbox_failed(self, failures):
+        """Record failed attempts: [(id, error text, next attempt timestamp or None to give up)]."""
+        now = int(datetime.datetime.now().timestamp())
+        self.cursor.executemany(
+            "UPDATE outbox SET attempts = attempts + 1, last_error = ?, "
+            "next_attempt_at = COALESCE(?, next_attempt_at), failed_at = CASE WHEN ? IS NULL THEN ? END "
+            "WHERE id = ?",
+            [(error, retry_at, retry_at, now, id_) for id_, error, retry_at in failures]
+        )
+        self.conn.commit()
+
+    def queue_due_reminders(self, kind: str, limit: int) -> int:
+        """Queue outbox reminders for up to ``limit`` users whose reminder time has come.
+
+        Claimed rows move to their next reminder time (``REMINDER_DELAYS``
+        after the last activity) or leave the schedule when none is left.
+        Blocked, deleted and completed users and chats that blocked the bot
+        leave it without a message.
+        One transaction; returns the number of reminders queued.
+        """
+        now = int(datetime.datetime.now().timestamp())
+        try:
+            self.cursor.execute(
+                "UPDATE resumes SET reminder_count = reminder_count + 1, next_reminder_at = CASE "
+                "WHEN is_blocked = 1 OR is_deleted = 1 OR completed_at IS NOT NULL OR chat_blocked_at IS NOT NULL THEN NULL "
+                "ELSE last_activity_at + json_extract(:delays, '$[' || (reminder_count + 1) || ']') END "
+                "WHERE user_id IN (SELECT user_id FROM resumes WHERE next_reminder_at <= :now "
+                "ORDER BY next_reminder_at LIMIT :limit) "
+                "RETURNING user_id, reminder_count, "
+                "is_blocked = 0 AND is_deleted = 0 AND completed_at IS NULL AND chat_blocked_at IS NULL",
+                {'delays': json.dumps(self.REMINDER_DELAYS), 'now': now, 'limit': limit}
+            )
+            due = [(user_id, count) for user_id, count, eligible in self.cursor.fetchall() if eligible]
+            self.cursor.executemany(
+                "INSERT INTO outbox (kind, chat_id, user_id, payload, created_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(kind, user_id, user_id, json.dumps({'reminder': count}), now, now) for user_id, count in due]
+            )
+            self.conn.commit()
+        except Exception:
+            self._rollback()
+            raise
+        return len(due)
+
+    def get_outbox_counts(self) -> dict:
+        """{"pending": undelivered rows still being retried, "failed": rows given up on}."""
+        self.cursor.execute(
+            "SELECT COALESCE(SUM(sent_at IS NULL AND failed_at IS NULL), 0), COUNT(failed_at) FROM outbox"
+        )
+        pending, failed = self.cursor.fetchone()
+        return {"pending": pending, "failed": failed}
+
+    def prune_outbox(self, keep_days: int) -> int:
+        """Delete rows delivered more than ``keep_days`` days ago."""
+        before = int((datetime.datetime.now() - datetime.timedelta(days=keep_days)).timestamp())
+        self.cursor.execute("DELETE FROM outbox WHERE sent_at < ?", (before,))
+        self.conn.commit()
+        return self.cursor.rowcount
+
+    # --- ارسال همگانی ---
+
+    BROADCAST_COLUMNS = (
+        'id', 'created_by', 'created_at', 'filters', 'text', 'status', 'cursor', 'total',
+        'sent', 'failed', 'blocked', 'progress_chat_id', 'progress_message_id', 'finished_at',
+    )
+
+    def _broadcast_where(self, filters: dict):
+        """WHERE clause and named params selecting the recipients of a broadcast.
+
+        filters: skill (with optional skill_level = that level or higher),
+        location (substring), job_position, degree, study_status. Deleted and
+        blocked users and chats that blocked the bot are never included.
+        """
+        where = "WHERE is_deleted = 0 AND is_blocked = 0 AND chat_blocked_at IS NULL"
+        params = {}
+        if filters.get('skill'):
+            levels = config.KEYBOARD_SKILL_LEVEL[0]
+            level = filters.get('skill_level')
+            where += (
+                " AND EXISTS (SELECT 1 FROM json_each(CASE WHEN json_valid(skills) THEN skills ELSE '[]' END) "
+                "WHERE json_extract(value, '$.name') = :skill"
+            )
+            if level in levels:
+                where += " AND json_extract(value, '$.level') IN (SELECT value FROM json_each(:levels))"
+                params['levels'] = json.dumps(levels[levels.index(level):], ensure_ascii=False)
+            where += ")"
+            params['skill'] = filters['skill']
+        if filters.get('location'):
+            where += " AND location LIKE :location"
+            params['location'] = f"%{filters['location']}%"
+        for field in ('job_position', 'degree', 'study_status'):
+            if filters.get(field):
+                where += f" AND {field} = :{field}"
+                params[field] = self.codec.code(field, filters[field], create=False)
+        return where, params
+
+    def count_broadcast_recipients(self, filters: dict) -> int:
+        where, params = self._broadcast_where(filters)
+        self.cursor.execute(f"SELECT COUNT(*) FROM resumes {where}", params)
+        return self.cursor.fetchone()[0]
+
+    def get_broadcast_recipients(self, filters: dict, after: int, limit: int) -> list:
+        """Next ``limit`` recipient ids greater than ``after``, in id order (keyset pagination)."""
+        where, params = self._broadcast_where(filters)
+        self.cursor.execute(
+            f"SELECT user_id FROM resumes {where} AND user_id > :after ORDER BY user_id LIMIT :limit",
+            {**params, 'after': after, 'limit': limit}
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def create_broadcast(self, admin_id: int, filters: dict, text: str, total: int) -> int:
+        now = int(datetime.datetime.now().timestamp())
+        self.cursor.execute(
+            "INSERT INTO broadcasts (created_by, created_at, filters, text, total) VALUES (?, ?, ?, ?, ?)",
+            (admin_id, now, json.dumps(filters, ensure_ascii=False), text, total)
+        )
+        self.conn.commit()
+        broadcast_id = self.cursor.lastrowid
+        self.log("ADMIN", f"Admin {admin_id} started broadcast {broadcast_id} to {total} users")
+        return broadcast_id
+
+    def get_broadcast(self, broadcast_id: int):
+        self.cursor.execute(f"SELECT {', '.join(self.BROADCAST_COLUMNS)} FROM broadcasts WHERE id = ?", (broadcast_id,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        broadcast = dict(zip(self.BROADCAST_COLUMNS, row))
+        broadcast['filters'] = json.loads(broadcast['filters'])
+        return broadcast
+
+    def get_broadcast_ids(self, status: str) -> list:
+        self.cursor.execute("SELECT id FROM broadcasts WHERE status = ? ORDER BY id", (status,))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def get_recent_broadcasts(self, limit: int = 5) -> list:
+        self.cursor.execute(
+            f"SELECT {', '.join(self.BROADCAST_COLUMNS)} FROM broadcasts ORDER BY id DESC LIMIT ?", (limit,)
+        )
+        broadcasts = [dict(zip(self.BROADCAST_COLUMNS, row)) for row in self.cursor.fetchall()]
+        for broadcast in broadcasts:
+            broadcast['filters'] = json.loads(broadcast['filters'])
+        return broadcasts
+
+    def set_broadcast_progress_message(self, broadcast_id: int, chat_id: int, message_id: int):
+        self.cursor.execute(
+            "UPDATE broadcasts SET progress_chat_id = ?, progress_message_id = ? WHERE id = ?",
+            (chat_id, message_id, broadcast_id)
+        )
+        self.conn.commit()
+
+    def checkpoint_broadcast(self, broadcast_id: int, cursor: int, sent: int, failed: int, blocked_ids=()):
+        """Advance a broadcast past ``cursor``, add the new counts and record chats that blocked the bot, in one transaction."""
+        now = int(datetime.datetime.now().timestamp())
+        try:
+            self.cursor.execute(
+                "UPDATE broadcasts SET cursor = ?, sent = sent + ?, failed = failed + ?, blocked = blocked + ? "
+                "WHERE id = ?",
+                (cursor, sent, failed, len(blocked_ids), broadcast_id)
+            )
+            if blocked_ids:
+                self.cursor.execute(
+                    "UPDATE resumes SET chat_blocked_at = ?, next_reminder_at = NULL "
+                    "WHERE user_id IN (SELECT value FROM json_each(?))",
+                    (now, json.dumps(list(blocked_ids)))
+                )
+            self.conn.commit()
+        except Exception:
+            self._rollback()
+            raise
+
+    def set_broadcast_status(self, broadcast_id: int, status: str, expected: str = 'running') -> bool:
+        """Move a broadcast from ``expected`` to ``status``; False when it was not in ``expected``."""
+        finished_at = int(datetime.datetime.now().timestamp()) if status in ('done', 'cancelled') else None
+        self.cursor.execute(
+            "UPDATE broadcasts SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+            (status, finished_at, broadcast_id, expected)
+        )
+        self.conn.commit()
+        return self.cursor.rowcount == 1
+
+    # --- changelog (فید تغییرات برای سیستم منابع انسانی؛ changes.py) ---
+
+    def get_changes(self, since: int, limit: int) -> list:
+        """Changelog rows after ``since`` in seq order: (seq, user_id, op, fields, row_version, changed_at)."""
+        self.cursor.execute(
+            "SELECT seq, user_id, op, fields, row_version, changed_at FROM changelog WHERE seq > ? ORDER BY seq LIMIT ?",
+            (since, limit)
+        )
+        return self.cursor.fetchall()
+
+    def get_change_head(self) -> int:
+        """Latest changelog seq (0 when empty)."""
+        self.cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM changelog")
+        return self.cursor.fetchone()[0]
+
+    def compact_changelog(self, keep_days: int) -> int:
+        """Delete changes older than ``keep_days`` that a later change of the same user supersedes.
+
+        The newest change of every user is always kept, so reading from
+        seq 0 still returns every user's current state.
+        """
+        cutoff = int((datetime.datetime.now() - datetime.timedelta(days=keep_days)).timestamp())
+        self.cursor.execute(
+            "DELETE FROM changelog WHERE changed_at < ? AND EXISTS ("
+            "SELECT 1 FROM changelog AS later WHERE later.user_id = changelog.user_id AND later.seq > changelog.seq)",
+            (cutoff,)
+        )
+        deleted = self.cursor.rowcount
+        self.conn.commit()
+        return deleted
+
     def get_all_logs(self):
         """(مورد 10) دریافت آخرین لاگ‌های فعالیت"""
         self.cursor.execute("SELECT * FROM logs ORDER BY timestamp DESC LIMIT 500")
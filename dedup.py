@@ -0,0 +1,146 @@
+# dedup.py
+"""Duplicate / near-duplicate applicant detection.
+
+Every resume is reduced to a small set of lookup keys that are stored in the
+``dedup_keys`` table (see ``DatabaseManager``):
+
+* ``p:09xxxxxxxxx`` — canonical form of ``phone_main`` (Persian/Arabic
+  digits folded, +98/0098 prefixes normalised); a shared key is a certain
+  duplicate.
+* ``e:09xxxxxxxxx`` — the same for ``phone_emergency``. Two applicants with
+  one emergency contact (siblings) are not duplicates; one's main number
+  being the other's emergency contact only raises their ``similarity``.
+* ``b<i>:<hash>``  — MinHash/LSH band keys over character trigrams of
+  full_name + university + phone, so near-identical applications collide in
+  at least one band.
+
+Finding candidates for a resume is then a single indexed ``IN (...)`` lookup;
+band and linked-phone hits are confirmed with an exact trigram Jaccard
+similarity.
+"""
+import hashlib
+import re
+
+import config
+
+# فیلدهایی که کلیدهای تشخیص تکراری از آن‌ها ساخته می‌شود
+DEDUP_INPUT_FIELDS = frozenset({"full_name", "field_university", "phone_main", "phone_emergency"})
+
+_DIGIT_FOLD = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+# یکسان‌سازی حروف عربی/فارسی و حذف نیم‌فاصله و اعراب
+_CHAR_FOLD = str.maketrans({"ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "أ": "ا", "إ": "ا", "آ": "ا", "\u200c": " "})
+_DIACRITICS_RE = re.compile("[\u064b-\u065f\u0670]")
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_phone(phone) -> str:
+    """Return the canonical 09xxxxxxxxx form of an Iranian mobile number, or None."""
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", str(phone).translate(_DIGIT_FOLD))
+    if digits.startswith("0098"):
+        digits = "0" + digits[4:]
+    elif digits.startswith("98") and len(digits) == 12:
+        digits = "0" + digits[2:]
+    elif digits.startswith("9") and len(digits) == 10:
+        digits = "0" + digits
+    return digits if re.fullmatch(r"09\d{9}", digits) else None
+
+
+def normalize_text(text) -> str:
+    if not text:
+        return ""
+    text = _DIACRITICS_RE.sub("", str(text).translate(_CHAR_FOLD).translate(_DIGIT_FOLD).lower())
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+def _document(data: dict) -> str:
+    return " ".join(filter(None, (
+        normalize_text(data.get("full_name")),
+        normalize_text(data.get("field_university")),
+        normalize_phone(data.get("phone_main")),
+    )))
+
+
+def shingles(text: str) -> set:
+    """Character trigrams of a normalised document."""
+    if len(text) < 3:
+        return {text} if text else set()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _permutations(num_perm: int):
+    # ضرایب ثابت و قطعی تا امضاها بین اجراهای مختلف برنامه قابل مقایسه باشند
+    params = []
+    for i in range(num_perm):
+        a = _hash64(f"minhash-a-{i}") % (_MERSENNE_PRIME - 1) + 1
+        b = _hash64(f"minhash-b-{i}") % _MERSENNE_PRIME
+        params.append((a, b))
+    return tuple(params)
+
+
+_PERMUTATIONS = _permutations(config.DEDUP_NUM_PERM)
+
+
+def minhash(shingle_set: set) -> list:
+    if not shingle_set:
+        return []
+    hashes = [_hash64(s) for s in shingle_set]
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def band_keys(signature: list) -> list:
+    if not signature:
+        return []
+    rows = len(signature) // config.DEDUP_BANDS
+    keys = []
+    for band in range(config.DEDUP_BANDS):
+        chunk = signature[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(repr(chunk).encode("ascii"), digest_size=8).hexdigest()
+        keys.append(f"b{band}:{digest}")
+    return keys
+
+
+def phone_keys(data: dict) -> list:
+    """``p:`` key of the main phone and ``e:`` key of the emergency contact."""
+    keys = []
+    for prefix, field in (("p", "phone_main"), ("e", "phone_emergency")):
+        phone = normalize_phone(data.get(field))
+        if phone:
+            keys.append(f"{prefix}:{phone}")
+    return keys
+
+
+def linked_phone_keys(data: dict) -> list:
+    """Keys of resumes whose emergency contact is this main phone, or whose main phone is this emergency contact."""
+    return [("e" if key.startswith("p:") else "p") + key[1:] for key in phone_keys(data)]
+
+
+def dedup_keys(data: dict) -> list:
+    """All lookup keys (phone + LSH bands) for a resume."""
+    return phone_keys(data) + band_keys(minhash(shingles(_document(data))))
+
+
+def similarity(a: dict, b: dict, linked: bool = False) -> float:
+    """Exact trigram Jaccard similarity of two resumes' identity documents.
+
+    ``linked`` (one's main phone is the other's emergency contact) adds
+    ``DEDUP_LINKED_PHONE_BONUS``.
+    """
+    sa, sb = shingles(_document(a)), shingles(_document(b))
+    if not sa or not sb:
+        return 0.0
+    score = len(sa & sb) / len(sa | sb)
+    if linked:
+        score = min(1.0, score + config.DEDUP_LINKED_PHONE_BONUS)
+    return score
@@ -0,0 +1,140 @@
+# fast_router.py
+"""Dict-indexed routing for message and callback handlers.
+
+aiogram checks the filters of every registered handler, in order, for each
+update. ``FastRouter`` keeps the same "first registered match wins" rule but
+finds the candidate handlers with dict lookups on the message text / callback
+data and the current FSM state (``raw_state``, already loaded by the FSM
+middleware). Only the extra filters of those few candidates are evaluated, so
+the cost of an update no longer grows with the number of handlers.
+
+    router = FastRouter(name="applicant")
+
+    @router.route_message(config.SUPPORT_LABEL)
+    @router.route_message(state=ResumeStates.full_name)
+    @router.route_message(~F.text.startswith("/"), state=ResumeStates.skills_select_level)
+
+    @router.route_callback("confirm_send")
+    @router.route_callback(prefix="view_resume_")
+"""
+from contextvars import ContextVar
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.fsm.state import State
+
+# مثل StateFilter("*"): هندلر در هر وضعیتی اجرا می‌شود
+ANY_STATE = "*"
+
+# HandlerObject هندلری که آپدیت جاری را پردازش کرد (برای متریک‌ها و لاگ)
+current_handler = ContextVar("current_handler", default=None)
+
+
+def _state_key(state):
+    return state.state if isinstance(state, State) else state
+
+
+class RouteIndex:
+    """Handlers of one event type, indexed by (key, state).
+
+    A handler is registered under exact keys, a key prefix, or no key at all
+    (state-only / catch-all), and under one FSM state (``None`` is the
+    default state, ``ANY_STATE`` matches every state).
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._prefix = {}
+        self._prefix_lengths = ()
+        self._keyless = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, callback, filters=(), keys=None, prefix=None, state=ANY_STATE) -> HandlerObject:
+        if keys is not None and prefix is not None:
+            raise ValueError("route can't have both exact keys and a prefix")
+        handler = HandlerObject(callback=callback, filters=[FilterObject(callback=f) for f in filters] or None)
+        # شماره ترتیب ثبت؛ بین کاندیداها همیشه اولین هندلر ثبت‌شده برنده است
+        entry = (self._count, handler)
+        self._count += 1
+        state = _state_key(state)
+
+        if prefix is not None:
+            self._prefix.setdefault((prefix, state), []).append(entry)
+            self._prefix_lengths = tuple(sorted({len(p) for p, _ in self._prefix}))
+        elif keys is not None:
+            for key in ([keys] if isinstance(keys, str) else keys):
+                self._exact.setdefault((key, state), []).append(entry)
+        else:
+            self._keyless.setdefault(state, []).append(entry)
+        return handler
+
+    def match(self, key, state) -> list:
+        """Candidate handlers for ``key`` in ``state``, in registration order."""
+        found = []
+        for st in (state, ANY_STATE):
+            if key is not None:
+                found += self._exact.get((key, st), ())
+                for length in self._prefix_lengths:
+                    found += self._prefix.get((key[:length], st), ())
+            found += self._keyless.get(st, ())
+        found.sort(key=lambda entry: entry[0])
+        return found
+
+    async def dispatch(self, event, key, data: dict):
+        for _, handler in self.match(key, data.get("raw_state")):
+            passed, kwargs = await handler.check(event, **data)
+            if not passed:
+                continue
+            kwargs["handler"] = handler
+            current_handler.set(handler)
+            try:
+                return await handler.call(event, **kwargs)
+            except SkipHandler:
+                continue
+        # به روتر بعدی اجازه بررسی آپدیت را می‌دهیم
+        raise SkipHandler()
+
+
+class FastRouter(Router):
+    """Router whose message / callback handlers are resolved through ``RouteIndex``.
+
+    Plain ``router.message(...)`` handlers still work and are checked after
+    the indexed routes.
+    """
+
+    def __init__(self, *, name: str = None):
+        super().__init__(name=name)
+        self.messages = RouteIndex()
+        self.callbacks = RouteIndex()
+        self.message.register(self._dispatch_message)
+        self.callback_query.register(self._dispatch_callback)
+
+    def route_message(self, *filters, text=None, prefix=None, state=ANY_STATE):
+        """Register a message handler by exact text (str or iterable), text prefix and/or state."""
+        if filters and isinstance(filters[0], str):
+            text, filters = filters[0], filters[1:]
+
+        def wrapper(callback):
+            self.messages.add(callback, filters, keys=text, prefix=prefix, state=state)
+            return callback
+        return wrapper
+
+    def route_callback(self, *filters, data=None, prefix=None, state=ANY_STATE):
+        """Register a callback handler by exact callback data, data prefix and/or state."""
+        if filters and isinstance(filters[0], str):
+            data, filters = filters[0], filters[1:]
+
+        def wrapper(callback):
+            self.callbacks.add(callback, filters, keys=data, prefix=prefix, state=state)
+            return callback
+        return wrapper
+
+    async def _dispatch_message(self, message, **data):
+        return await self.messages.dispatch(message, message.text, data)
+
+    async def _dispatch_callback(self, callback, **data):
+        return await self.callbacks.dispatch(callback, callback.data, data)
@@ -0,0 +1,387 @@
+# keyboards.py
+"""Keyboard factory for the bot.
+
+Every ``get_*_keyboard`` builder is registered with ``registry``. Each distinct
+keyboard is built (and pydantic-validated) once, serialized to JSON once, and
+the same frozen instance is returned on later calls. Builders without
+arguments are built eagerly by ``registry.build_all()`` at startup;
+parameterized ones are memoized per argument tuple with LRU eviction.
+
+Instances are frozen (attribute assignment raises). The button rows are
+shared between all callers, so they must never be mutated in place. Build a
+new keyboard through a parameterized builder instead.
+"""
+import functools
+import inspect
+import json
+from collections import OrderedDict
+
+from aiohttp import FormData
+from pydantic import ConfigDict
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, KeyboardButton, ReplyKeyboardMarkup
+
+import config
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+
+
+class FrozenReplyKeyboardMarkup(ReplyKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+
+
+def _hashable(value):
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+class KeyboardRegistry:
+    """Memoizes keyboard builders and keeps the pre-serialized JSON of every instance."""
+
+    def __init__(self):
+        # (memoized getter, argument tuples to prebuild at startup)
+        self._builders = []
+        # id(markup) -> (markup, json); the markup reference keeps the id stable while cached
+        self._serialized = {}
+        self.builds = 0
+
+    def keyboard(self, maxsize: int = None, warm=()):
+        """Decorator: memoize a keyboard builder (maxsize=None means unbounded).
+
+        ``warm`` lists argument tuples to prebuild in ``build_all``; builders
+        without required parameters are always prebuilt.
+        """
+        def decorator(builder):
+            warm_args = list(warm)
+            required = [
+                p for p in inspect.signature(builder).parameters.values()
+                if p.default is p.empty and p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+            ]
+            if not required:
+                warm_args.insert(0, ())
+
+            cache = OrderedDict()
+
+            @functools.wraps(builder)
+            def get(*args, **kwargs):
+                key = (tuple(_hashable(a) for a in args), tuple(sorted((k, _hashable(v)) for k, v in kwargs.items())))
+                markup = cache.get(key)
+                if markup is not None:
+                    cache.move_to_end(key)
+                    return markup
+                markup = builder(*args, **kwargs)
+                self.builds += 1
+                self._serialized[id(markup)] = (markup, self._dump(markup))
+                cache[key] = markup
+                if maxsize is not None and len(cache) > maxsize:
+                    _, evicted = cache.popitem(last=False)
+                    self._serialized.pop(id(evicted), None)
+                return markup
+
+            get.cache = cache
+            self._builders.append((get, warm_args))
+            return get
+        return decorator
+
+    @staticmethod
+    def _dump(markup) -> str:
+        # معادل خروجی prepare_value در aiogram: فیلدهای None حذف می‌شوند
+        return json.dumps(markup.model_dump(exclude_none=True, warnings=False))
+
+    def serialized(self, markup):
+        """Cached JSON of a registry-built markup, or None for foreign objects."""
+        entry = self._serialized.get(id(markup))
+        if entry is not None and entry[0] is markup:
+            return entry[1]
+        return None
+
+    def build_all(self):
+        """Build every static keyboard once (called at startup); the rest are built on first use."""
+        for get, warm_args in self._builders:
+            for args in warm_args:
+                get(*args)
+
+
+registry = KeyboardRegistry()
+
+
+class KeyboardCachingSession(AiohttpSession):
+    """AiohttpSession that sends the pre-serialized JSON of registry keyboards."""
+
+    def build_form_data(self, bot, method) -> FormData:
+        cached = registry.serialized(getattr(method, "reply_markup", None))
+        if cached is None:
+            return super().build_form_data(bot, method)
+
+        form = FormData(quote_fields=False)
+        files = {}
+        for key, value in method.model_dump(warnings=False, exclude={"reply_markup"}).items():
+            value = self.prepare_value(value, bot=bot, files=files)
+            if not value:
+                continue
+            form.add_field(key, value)
+        form.add_field("reply_markup", cached)
+        for key, value in files.items():
+            form.add_field(key, value.read(bot), filename=value.filename or key)
+        return form
+
+
+# --- توابع کمکی ساخت کیبورد ---
+
+@registry.keyboard(maxsize=128)
+def create_reply_keyboard(texts, one_time: bool = False) -> ReplyKeyboardMarkup:
+    """ساخت ReplyKeyboardMarkup با تبدیل لیست رشته‌ای به KeyboardButton"""
+    keyboard_rows = []
+    # Arrange buttons in 2 columns per row for a compact layout
+    cols = 2
+    row = []
+    for t in texts:
+        row.append(KeyboardButton(text=t))
+        if len(row) >= cols:
+            keyboard_rows.append(row)
+            row = []
+    if row:
+        keyboard_rows.append(row)
+
+    return FrozenReplyKeyboardMarkup(keyboard=keyboard_rows, resize_keyboard=True, one_time_keyboard=one_time)
+
+
+@registry.keyboard(warm=[(False,), (True,)])
+def get_main_keyboard(is_admin) -> ReplyKeyboardMarkup:
+    # ساخت دکمه‌های اصلی: ارسال رزومه و پشتیبانی در یک ردیف، دکمه پنل ادمین در ردیف جداگانه (در صورت ادمین)
+    main_btn = KeyboardButton(text=config.KEYBOARD_MAIN_TEXTS[0])
+    support_btn = KeyboardButton(text=config.SUPPORT_LABEL)
+    channel_btn = KeyboardButton(text=config.MOHANDES_YAR_CHANNEL_LABEL)
+
+    keyboard_rows = [[main_btn, support_btn, channel_btn]]
+
+    # اضافه کردن دکمه ادمین (Admin Panel) در ردیف بعدی
+    if is_admin:
+        admin_button = KeyboardButton(text=config.KEYBOARD_ADMIN_TEXTS[0])
+        keyboard_rows.append([admin_button])
+
+    return FrozenReplyKeyboardMarkup(
+        keyboard=keyboard_rows,
+        resize_keyboard=True,
+        input_field_placeholder="منوی اصلی..."
+    )
+
+
+@registry.keyboard()
+def get_consent_keyboard() -> InlineKeyboardMarkup:
+    """کیبورد درخواست تایید شرایط: دو دکمه پذیرش یا عدم پذیرش به صورت شیشه‌ای (Inline)."""
+    return FrozenInlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="✅ شرایط را میپذیرم", callback_data="consent_accept"),
+            InlineKeyboardButton(text="❌ شرایط را نمیپذیرم", callback_data="consent_decline")
+        ]
+    ])
+
+
+@registry.keyboard()
+def get_restart_keyboard() -> ReplyKeyboardMarkup:
+    """دکمه استارت مجدد پس از عدم پذیرش شرایط"""
+    return FrozenReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text="/start")]],
+        resize_keyboard=True,
+        one_time_keyboard=True
+    )
+
+
+@registry.keyboard()
+def get_support_link_keyboard() -> InlineKeyboardMarkup:
+    return FrozenInlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="رفتن به پشتیبانی", url=config.SUPPORT_CHAT_LINK)]
+    ])
+
+
+@registry.keyboard()
+def get_channel_link_keyboard() -> InlineKeyboardMarkup:
+    return FrozenInlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="ورود به کانال", url=config.MOHANDES_YAR_CHANNEL_LINK)]
+    ])
+
+
+@registry.keyboard(warm=[(True,)])
+def get_skill_keyboard(is_editing: bool = False) -> InlineKeyboardMarkup:
+    # این کیبورد Inline است و نیازی به تبدیل ندارد
+    kb = []
+    for row in config.KEYBOARD_SKILLS[:-1]:
+        kb.append([InlineKeyboardButton(text=s, callback_data=f"skill_{s}") for s in row])
+
+    # اگر در حالت ویرایش باشیم، دکمه "اتمام ویرایش" را نمایش می‌دهیم
+    if is_editing:
+        kb.append([InlineKeyboardButton(text="✅ اتمام ویرایش مهارت‌ها", callback_data="skill_edit_finish")])
+    else:
+        # در حالت عادی، دکمه "ادامه" نمایش داده می‌شود
+        kb.append([InlineKeyboardButton(text=config.KEYBOARD_SKILLS[-1][0], callback_data="skill_continue")])
+
+    return FrozenInlineKeyboardMarkup(inline_keyboard=kb)
+
+
+# نام مهارت «سایر» را کاربر تایپ می‌کند، پس تعداد حالت‌ها محدود نیست
+@registry.keyboard(maxsize=256)
+def get_skill_level_keyboard(skill_name) -> InlineKeyboardMarkup:
+    kb = [
+        [InlineKeyboardButton(text=level, callback_data=f"level_{skill_name}_{level}")]
+        for level in config.KEYBOARD_SKILL_LEVEL[0]
+    ]
+    return FrozenInlineKeyboardMarkup(inline_keyboard=kb)
+
+
+@registry.keyboard()
+def get_english_level_keyboard() -> InlineKeyboardMarkup:
+    """کیبورد شیشه‌ای برای انتخاب میزان تسلط به زبان انگلیسی"""
+    kb = [
+        [InlineKeyboardButton(text=level, callback_data=f"english_{level}")]
+        for level in config.KEYBOARD_SKILL_LEVEL[0]
+    ]
+    return FrozenInlineKeyboardMarkup(inline_keyboard=kb)
+
+
+@registry.keyboard()
+def get_major_keyboard() -> InlineKeyboardMarkup:
+    """شیشه‌ای کردن کلیدهای انتخاب رشته (Inline keyboard)"""
+    # ساخت کیبورد با چیدمان چندستونه (پیش‌فرض: 2 ستون) برای ظاهر جمع‌وجور
+    kb = []
+    row = []
+    cols = 2
+    for m in config.KEYBOARD_MAJOR_TEXTS:
+        row.append(InlineKeyboardButton(text=m, callback_data=f"major_{m}"))
+        if len(row) >= cols:
+            kb.append(row)
+            row = []
+    if row:
+        kb.append(row)
+    return FrozenInlineKeyboardMarkup(inline_keyboard=kb)
+
+
+@registry.keyboard()
+def get_study_status_keyboard() -> InlineKeyboardMarkup:
+    """کیبورد شیشه‌ای برای انتخاب وضعیت تحصیلی."""
+    kb = [
+        [InlineKeyboardButton(text=status, callback_data=f"study_status_{status}")]
+        for status in config.KEYBOARD_STUDY_STATUS_TEXTS
+    ]
+    return FrozenInlineKeyboardMarkup(inline_keyboard=kb)
+
+
+@registry.keyboard()
+def get_degree_keyboard() -> InlineKeyboardMarkup:
+    """کیبورد شیشه‌ای برای انتخاب مقطع تحصیلی."""
+    kb = []
+    row = []
+    for degree in config.KEYBOARD_DEGREE_TEXTS:
+        row.append(InlineKeyboardButton(text=degree, callback_data=f"degree_{degree}"))
+        if len(row) >= 2:
+            kb.append(row)
+            row = []
+    if row:
+        kb.append(row)
+    return FrozenInlineKeyboardMarkup(inline_keyboard=kb)
+
+
+@registry.keyboard()
+def get_skip_worksample_keyboard() -> InlineKeyboardMarkup:
+    """کیبورد شیشه‌ای برای رد کردن مرحله آپلود نمونه‌کار (مرحله بعد)"""
+    # Provide two actions: skip the uploads or finish uploads and continue
+    return FrozenInlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="اتمام آپلود و ادامه", callback_data="worksample_finish"),
+            InlineKeyboardButton(text="رد کردن این مرحله", callback_data="worksample_skip")
+        ]
+    ])
+
+
+@registry.keyboard()
+def get_confirmation_keyboard() -> InlineKeyboardMarkup:
+    return FrozenInlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="✅ تایید و ارسال", callback_data="confirm_send"),
+            InlineKeyboardButton(text="✏️ ویرایش", callback_data="edit_resume")
+        ]
+    ])
+
+
+def _edit_field_rows() -> list:
+    # Present Persian labels to the user using config.FIELD_LABELS
+    keyboard_rows = []
+    cols = 2
+    row = []
+    for key, label in config.FIELD_LABELS.items():
+        if key in ("register_date", "file_path"):
+            continue
+        row.append(KeyboardButton(text=label))
+        if len(row) >= cols:
+            keyboard_rows.append(row)
+            row = []
+    if row:
+        keyboard_rows.append(row)
+
+    # add a confirm-edit button next to cancel so user can finish editing
+    keyboard_rows.append([KeyboardButton(text="تایید ویرایش"), KeyboardButton(text="انصراف")])
+    return keyboard_rows
+
+
+@registry.keyboard()
+def get_edit_fields_keyboard() -> ReplyKeyboardMarkup:
+    return FrozenReplyKeyboardMarkup(keyboard=_edit_field_rows(), resize_keyboard=True, one_time_keyboard=True)
+
+
+@registry.keyboard()
+def get_user_fields_keyboard() -> ReplyKeyboardMarkup:
+    """کیبورد فیلدهای قابل ویرایش (پنل ادمین)"""
+    return FrozenReplyKeyboardMarkup(keyboard=_edit_field_rows(), resize_keyboard=True, one_time_keyboard=True)
+
+
+ADMIN_TOGGLE_DELETED_LABEL = "🔁 نمایش حذف‌شده‌ها"
+
+
+@registry.keyboard(warm=[(False,), (True,)])
+def get_admin_main_keyboard(show_deleted: bool = None) -> ReplyKeyboardMarkup:
+    """منوی اصلی پنل ادمین؛ show_deleted وضعیت فعلی را روی دکمه نمایش حذف‌شده‌ها نشان می‌دهد."""
+    if show_deleted is None:
+        toggle_text = ADMIN_TOGGLE_DELETED_LABEL
+    else:
+        toggle_text = f"{ADMIN_TOGGLE_DELETED_LABEL}: {'روشن' if show_deleted else 'خاموش'}"
+    keyboard_rows = []
+    keyboard_rows.append([KeyboardButton(text="📋 لیست کاربران"), KeyboardButton(text="🔎 جستجوی کاربر")])
+    keyboard_rows.append([KeyboardButton(text="📊 آمار کلی"), KeyboardButton(text="📤 دریافت اکسل")])
+    keyboard_rows.append([KeyboardButton(text="📥 پشتیبان‌گیری"), KeyboardButton(text="📄 مشاهده لاگ"), KeyboardButton(text="📈 عملکرد")])
+    keyboard_rows.append([KeyboardButton(text="🏆 برترین متقاضیان"), KeyboardButton(text="👥 بررسی تکراری‌ها"), KeyboardButton(text="📣 ارسال همگانی")])
+    keyboard_rows.append([KeyboardButton(text=toggle_text), KeyboardButton(text="🏠 منوی اصلی")])
+    return FrozenReplyKeyboardMarkup(keyboard=keyboard_rows, resize_keyboard=True)
+
+
+@registry.keyboard(warm=[(False,), (True,)])
+def _user_actions_keyboard(is_blocked: bool) -> ReplyKeyboardMarkup:
+    block_status = "✅ آنبلاک" if is_blocked else "🚫 بلاک"
+    keyboard_rows = [
+        [KeyboardButton(text="✏️ ویرایش اطلاعات"), KeyboardButton(text="🗑️ حذف کاربر"), KeyboardButton(text="📂 دریافت نمونه کار")],
+        [KeyboardButton(text="📄 PDF"), KeyboardButton(text=block_status)],
+        [KeyboardButton(text="🔙 بازگشت به جستجو")],
+        [KeyboardButton(text="بازگشت به صفحه اصلی")]
+    ]
+    return FrozenReplyKeyboardMarkup(keyboard=keyboard_rows, resize_keyboard=True)
+
+
+def get_user_actions_keyboard(user_id: int, is_blocked: bool) -> ReplyKeyboardMarkup:
+    """کیبورد اقدامات ادمین روی کاربر خاص"""
+    # the layout does not depend on user_id, so only two instances ever exist
+    return _user_actions_keyboard(bool(is_blocked))
+
+
+@registry.keyboard()
+def get_search_back_keyboard() -> ReplyKeyboardMarkup:
+    return FrozenReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="بازگشت")]], resize_keyboard=True, one_time_keyboard=True)
+
+
+@registry.keyboard(maxsize=64)
+def get_delete_confirm_keyboard(user_id: int) -> ReplyKeyboardMarkup:
+    return FrozenReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text=f"حذف کاربر {user_id}"), KeyboardButton(text="لغو")]],
+        resize_keyboard=True, one_time_keyboard=True
+    )
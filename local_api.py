@@ -0,0 +1,94 @@
+# local_api.py
+"""Self-hosted Bot API server ("local mode").
+
+With ``TELEGRAM_API_LOCAL=1`` the bot talks to a ``telegram-bot-api``
+server started with ``--local`` at ``TELEGRAM_API_BASE``. There ``getFile``
+serves files of any size the bot accepts and answers with the absolute
+path of a file the server has already written to disk. ``save_file``
+ingests that file into UPLOADS_DIR by hardlink (or rename) instead of
+downloading it a second time, and ``input_file`` sends stored files as
+``file://`` URIs that the server reads from disk instead of receiving a
+multipart upload.
+
+When the server sees the shared directory under another path (a docker
+volume, for example) set ``TELEGRAM_API_SERVER_DIR`` and
+``TELEGRAM_API_LOCAL_DIR`` to the server's and the bot's view of it.
+"""
+import asyncio
+import os
+import shutil
+from pathlib import Path
+
+from aiogram.client.telegram import PRODUCTION, SimpleFilesPathWrapper, TelegramAPIServer
+from aiogram.types import FSInputFile
+
+import config
+
+# getFile در Bot API ابری فقط فایل‌های تا ۲۰ مگابایت را برمی‌گرداند
+CLOUD_DOWNLOAD_LIMIT_BYTES = 20 * 1024 * 1024
+
+
+def api_server() -> TelegramAPIServer:
+    if not config.TELEGRAM_API_BASE:
+        return PRODUCTION
+    if not config.TELEGRAM_API_LOCAL:
+        return TelegramAPIServer.from_base(config.TELEGRAM_API_BASE)
+    kwargs = {}
+    if config.TELEGRAM_API_SERVER_DIR and config.TELEGRAM_API_LOCAL_DIR:
+        kwargs["wrap_local_file"] = SimpleFilesPathWrapper(
+            Path(config.TELEGRAM_API_SERVER_DIR), Path(config.TELEGRAM_API_LOCAL_DIR)
+        )
+    return TelegramAPIServer.from_base(config.TELEGRAM_API_BASE, is_local=True, **kwargs)
+
+
+def download_limit(api: TelegramAPIServer):
+    """Largest file ``save_file`` can fetch through ``api`` in bytes (None = no server-side limit)."""
+    return None if api.is_local else CLOUD_DOWNLOAD_LIMIT_BYTES
+
+
+def ingest_local_file(source: str, destination: str) -> str:
+    """Hardlink ``source`` at ``destination``, or move it when linking fails; returns "link" or "rename".
+
+    Raises OSError when neither works (another filesystem, no permission).
+    """
+    try:
+        # فایل سرور سر جایش می‌ماند تا getFile بعدی دوباره آن را دانلود نکند
+        os.link(source, destination)
+        return "link"
+    except OSError:
+        os.replace(source, destination)
+        return "rename"
+
+
+async def save_file(bot, file_id: str, destination: str) -> str:
+    """Store the Telegram file ``file_id`` at ``destination``.
+
+    Returns how it got there: "link", "rename" or "copy" from the local
+    server's disk, or "download" over HTTP from the cloud API.
+    """
+    file = await bot.get_file(file_id)
+    api = bot.session.api
+    if not api.is_local:
+        await bot.download_file(file.file_path, destination)
+        return "download"
+    source = str(api.wrap_local_file.to_local(file.file_path))
+    try:
+        return ingest_local_file(source, destination)
+    except OSError:
+        # دیسک دیگر یا بدون دسترسی نوشتن روی پوشه سرور؛ کپی محلی، باز هم بدون انتقال شبکه
+        await asyncio.to_thread(shutil.copyfile, source, destination)
+        return "copy"
+
+
+def input_file(bot, path: str):
+    """Document argument for sending ``path``: a ``file://`` URI in local mode, otherwise an upload."""
+    api = bot.session.api
+    if api.is_local:
+        try:
+            server_path = api.wrap_local_file.to_server(os.path.abspath(path))
+        except ValueError:
+            # بیرون از پوشه مشترک؛ سرور این مسیر را نمی‌بیند
+            pass
+        else:
+            return Path(server_path).as_uri()
+    return FSInputFile(path)
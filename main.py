@@ -4,29 +4,143 @@ import re
 import os
 import json
 import html
+from collections import namedtuple
 from datetime import datetime
+from functools import lru_cache, partial
+from types import MappingProxyType
 
 # --- ایمپورت‌های aiogram ---
-from aiogram import Bot, Dispatcher, types, F, Router
+from aiogram import Bot, Dispatcher, types, F
 from aiogram.enums import ParseMode
-from aiogram.filters import CommandStart, StateFilter
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup 
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile, KeyboardButton, ReplyKeyboardMarkup
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile, BufferedInputFile
 from aiogram.client.default import DefaultBotProperties # برای رفع خطای TypeError در تعریف Bot
 from aiogram.utils.markdown import markdown_decoration
 
 # --- ایمپورت‌های محلی ---
 import config 
+import broadcast
+import changes
+from cache import VersionedLRUCache
 from database import DatabaseManager
+from fast_router import FastRouter
+import local_api
+from media_group import MediaGroupCollector
+from metrics import (
+    Metrics, HandlerMetricsMiddleware, RequestMetricsMiddleware, InstrumentedStorage,
+    instrument_database, monitor_event_loop_lag, start_metrics_server,
+)
+from outbox import OutboxDispatcher
+from reminders import ReminderScheduler
+import resume_pdf
+from middlewares import (
+    AntiAbuseMiddleware, BufferedFSMContext, FSMUnitOfWorkMiddleware, PerUserLockMiddleware, PriorityGate,
+    install_outer_middleware,
+)
+from profiling import SamplingProfiler, SlowHandlerWatchdog, format_collapsed
+from keyboards import (
+    registry as keyboard_registry, KeyboardCachingSession, ADMIN_TOGGLE_DELETED_LABEL,
+    create_reply_keyboard, get_main_keyboard, get_consent_keyboard, get_restart_keyboard,
+    get_support_link_keyboard, get_channel_link_keyboard, get_skill_keyboard, get_skill_level_keyboard,
+    get_english_level_keyboard, get_major_keyboard, get_study_status_keyboard, get_degree_keyboard,
+    get_skip_worksample_keyboard, get_confirmation_keyboard, get_edit_fields_keyboard,
+    get_user_fields_keyboard, get_admin_main_keyboard, get_user_actions_keyboard,
+    get_search_back_keyboard, get_delete_confirm_keyboard,
+)
 
 # --- پیکربندی اولیه ---
+metrics = Metrics(window=config.METRICS_WINDOW)
 bot = Bot(
     token=config.TOKEN,
+    # کیبوردهای ثابت فقط یک بار ساخته و سریال می‌شوند
+    session=KeyboardCachingSession(
+        api=local_api.api_server()
+    ),
     default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN) # رفع خطای TypeError
 )
-dp = Dispatcher()
-db = DatabaseManager()
+bot.session.middleware(RequestMetricsMiddleware(metrics))
+dp = Dispatcher(storage=InstrumentedStorage(MemoryStorage(), metrics))
+dp.message.middleware(HandlerMetricsMiddleware(metrics))
+dp.callback_query.middleware(HandlerMetricsMiddleware(metrics))
+# هر بخش روتر خودش را دارد؛ هندلرها با دیکشنری (متن دکمه، داده کال‌بک، وضعیت) پیدا می‌شوند
+applicant_router = FastRouter(name="applicant")
+admin_router = FastRouter(name="admin")
+callback_router = FastRouter(name="callbacks")
+dp.include_routers(applicant_router, admin_router, callback_router)
+db = instrument_database(DatabaseManager(), metrics)
+# کاربران بلاک‌شده و ارسال‌های پشت‌سرهم قبل از خواندن FSM و دیتابیس کنار گذاشته می‌شوند
+anti_abuse = AntiAbuseMiddleware(
+    admin_ids=config.ADMIN_IDS,
+    rate=config.THROTTLE_RATE, burst=config.THROTTLE_BURST,
+    upload_rate=config.UPLOAD_THROTTLE_RATE, upload_burst=config.UPLOAD_THROTTLE_BURST,
+)
+anti_abuse.attach(db)
+install_outer_middleware(dp, anti_abuse)
+# قسمت‌های یک آلبوم نمونه کار با هم پردازش می‌شوند
+media_groups = MediaGroupCollector(window=config.MEDIA_GROUP_WINDOW_SEC)
+# آپدیت‌های هر کاربر به ترتیب و یکی‌یکی اجرا می‌شوند (کاربران مختلف همزمان) و کلیک دوباره روی یک دکمه کنار می‌رود
+user_locks = PerUserLockMiddleware(callback_ttl=config.CALLBACK_DEDUP_TTL_SEC, collector=media_groups)
+install_outer_middleware(dp, user_locks)
+# هندلرهای همزمان محدودند؛ ادمین‌ها جلوی صف و کلیک تکراری پشتیبانی/کانال ته صف (و هنگام ازدحام دور ریخته می‌شود)
+update_gate = PriorityGate(
+    limit=config.UPDATE_CONCURRENCY, admin_ids=config.ADMIN_IDS,
+    low_value_texts=(config.SUPPORT_LABEL, config.MOHANDES_YAR_CHANNEL_LABEL), shed_depth=config.SHED_QUEUE_DEPTH,
+    observe=lambda lane, seconds: metrics.observe("bot_update_wait_seconds", seconds, lane=lane),
+)
+install_outer_middleware(dp, update_gate)
+# داده FSM یک بار در هر آپدیت خوانده و در پایان یک بار نوشته می‌شود؛ ذخیره رزومه هم همان‌جا
+fsm_unit_of_work = FSMUnitOfWorkMiddleware(
+    persist=lambda user_id, data: save_resume_snapshot(user_id, data), fields=config.RESUME_FIELDS
+)
+fsm_unit_of_work.attach(db)
+dp.update.middleware(fsm_unit_of_work)
+# آپدیت‌هایی که بیش از SLOW_HANDLER_THRESHOLD_SEC طول بکشند با پشته‌شان در لاگ ثبت می‌شوند
+slow_watchdog = SlowHandlerWatchdog(config.SLOW_HANDLER_THRESHOLD_SEC, report=lambda text: db.log("SLOW", text))
+dp.update.outer_middleware.register(slow_watchdog)
+profiler = SamplingProfiler(interval=config.PROFILE_INTERVAL_MS / 1000)
+# اعلان ادمین و پیام تایید کاربر در همان تراکنش ثبت رزومه در صف outbox نوشته و از آنجا ارسال می‌شوند
+OUTBOX_RESUME_CONFIRMED = "resume_confirmed"
+OUTBOX_RESUME_REMINDER = "resume_reminder"
+# ارجاع به تسک‌های پس‌زمینه تا قبل از اتمام توسط garbage collector حذف نشوند
+background_tasks = set()
+
+
+def run_in_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+def collect_app_metrics(m: Metrics) -> None:
+    for reason in ("blocked", "flood", "upload_flood"):
+        m.set_counter("bot_updates_dropped_total", anti_abuse.dropped[reason], reason=reason)
+    m.set_counter("bot_resume_card_cache_hits_total", resume_card_cache.hits)
+    m.set_counter("bot_resume_card_cache_misses_total", resume_card_cache.misses)
+    m.set_counter("bot_resume_pdf_cache_hits_total", resume_pdfs.cache.hits)
+    m.set_counter("bot_resume_pdf_renders_total", resume_pdfs.rendered)
+    m.set_counter("bot_slow_updates_total", slow_watchdog.slow_count)
+    m.set_counter("bot_resume_saves_skipped_total", fsm_unit_of_work.skipped)
+    m.set_counter("bot_duplicate_callbacks_total", user_locks.duplicates)
+    m.set_counter("bot_user_lock_waits_total", user_locks.waited)
+    m.set_gauge("bot_user_locks", len(user_locks))
+    m.set_gauge("bot_updates_in_flight", update_gate.running)
+    for lane, name in enumerate(update_gate.LANES):
+        m.set_gauge("bot_update_queue_depth", update_gate.depth(lane), lane=name)
+    m.set_counter("bot_updates_shed_total", update_gate.shed)
+    m.set_counter("bot_outbox_sent_total", outbox.sent)
+    m.set_counter("bot_outbox_failed_total", outbox.failed)
+    m.set_counter("bot_reminders_queued_total", reminders.queued)
+    m.set_counter("bot_broadcast_sent_total", broadcasts.sent)
+    for status, count in db.get_outbox_counts().items():
+        m.set_gauge("bot_outbox_messages", count, status=status)
+
+
+metrics.add_collector(collect_app_metrics)
 # per-admin toggle to include deleted users in listings
 admin_show_deleted = {}
 
@@ -35,14 +149,34 @@ async def persist_state_to_db(user_id: int, state: FSMContext) -> None:
     """Unified helper to persist current FSM state data to the database.
 
     This centralizes saving logic so the codebase is consistent and
-    every save goes through the same path.
+    every save goes through the same path. Inside a handler the save is
+    deferred to the end of the update by ``fsm_unit_of_work`` and skipped
+    when no resume field changed since the last save.
     """
+    if isinstance(state, BufferedFSMContext):
+        await state.request_persist(user_id)
+        return
+    save_resume_snapshot(user_id, await state.get_data())
+
+
+def save_resume_snapshot(user_id: int, data: dict) -> None:
     try:
-        data = await state.get_data()
         db.save_resume_data(user_id, data)
     except Exception as e:
         db.log("ERROR", f"Failed to persist state for user {user_id}: {e}")
 
+
+async def stale_callback(callback: types.CallbackQuery, state: FSMContext, expected: State) -> bool:
+    """Answer and report True when the form is no longer in ``expected`` (a late second tap or an old message)."""
+    if await state.get_state() == expected.state:
+        return False
+    await callback.answer("این دکمه دیگر فعال نیست.")
+    try:
+        await callback.message.edit_reply_markup(reply_markup=None)
+    except Exception:
+        pass
+    return True
+
 # --- تعاریف FSM ---
 class ResumeStates(StatesGroup):
     username = State()
@@ -73,141 +207,49 @@ class ResumeStates(StatesGroup):
 
     finished = State()
 
-# --- توابع کمکی ساخت کیبورد (رفع خطای ValidationError) ---
-
-def create_reply_keyboard(texts: list, one_time: bool = True) -> ReplyKeyboardMarkup:
-    """ساخت ReplyKeyboardMarkup با تبدیل لیست رشته‌ای به KeyboardButton"""
-    keyboard_rows = []
-    # Arrange buttons in 2 columns per row for a compact layout
-    cols = 2
-    row = []
-    for t in texts:
-        row.append(KeyboardButton(text=t))
-        if len(row) >= cols:
-            keyboard_rows.append(row)
-            row = []
-    if row:
-        keyboard_rows.append(row)
-
-    return ReplyKeyboardMarkup(keyboard=keyboard_rows, resize_keyboard=True, one_time_keyboard=one_time)
-
-def get_main_keyboard(is_admin) -> ReplyKeyboardMarkup:
-    # ساخت دکمه‌های اصلی: ارسال رزومه و پشتیبانی در یک ردیف، دکمه پنل ادمین در ردیف جداگانه (در صورت ادمین)
-    main_btn = KeyboardButton(text=config.KEYBOARD_MAIN_TEXTS[0])
-    support_btn = KeyboardButton(text=config.SUPPORT_LABEL)
-    channel_btn = KeyboardButton(text=config.MOHANDES_YAR_CHANNEL_LABEL)
-
-    keyboard_rows = [[main_btn, support_btn, channel_btn]]
-
-    # اضافه کردن دکمه ادمین (Admin Panel) در ردیف بعدی
-    if is_admin:
-        admin_button = KeyboardButton(text=config.KEYBOARD_ADMIN_TEXTS[0])
-        keyboard_rows.append([admin_button])
-
-    return ReplyKeyboardMarkup(
-        keyboard=keyboard_rows,
-        resize_keyboard=True,
-        input_field_placeholder="منوی اصلی..."
-    )
-
-
-def get_skill_keyboard(is_editing: bool = False) -> InlineKeyboardMarkup:
-    # این کیبورد Inline است و نیازی به تبدیل ندارد
-    kb = []
-    for row in config.KEYBOARD_SKILLS[:-1]:
-        kb.append([InlineKeyboardButton(text=s, callback_data=f"skill_{s}") for s in row])
-    
-    # اگر در حالت ویرایش باشیم، دکمه "اتمام ویرایش" را نمایش می‌دهیم
-    if is_editing:
-        kb.append([InlineKeyboardButton(text="✅ اتمام ویرایش مهارت‌ها", callback_data="skill_edit_finish")])
-    else:
-        # در حالت عادی، دکمه "ادامه" نمایش داده می‌شود
-        kb.append([InlineKeyboardButton(text=config.KEYBOARD_SKILLS[-1][0], callback_data="skill_continue")])
-    
-    return InlineKeyboardMarkup(inline_keyboard=kb)
-
-
-def get_skill_level_keyboard(skill_name) -> InlineKeyboardMarkup:
-    kb = [
-        [InlineKeyboardButton(text=level, callback_data=f"level_{skill_name}_{level}")]
-        for level in config.KEYBOARD_SKILL_LEVEL[0]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=kb)
-
-
-def get_english_level_keyboard() -> InlineKeyboardMarkup:
-    """کیبورد شیشه‌ای برای انتخاب میزان تسلط به زبان انگلیسی"""
-    kb = [
-        [InlineKeyboardButton(text=level, callback_data=f"english_{level}")]
-        for level in config.KEYBOARD_SKILL_LEVEL[0]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=kb)
-
-
-def get_major_keyboard() -> InlineKeyboardMarkup:
-    """شیشه‌ای کردن کلیدهای انتخاب رشته (Inline keyboard)"""
-    # ساخت کیبورد با چیدمان چندستونه (پیش‌فرض: 2 ستون) برای ظاهر جمع‌وجور
-    kb = []
-    row = []
-    cols = 2
-    for m in config.KEYBOARD_MAJOR_TEXTS:
-        row.append(InlineKeyboardButton(text=m, callback_data=f"major_{m}"))
-        if len(row) >= cols:
-            kb.append(row)
-            row = []
-    if row:
-        kb.append(row)
-    return InlineKeyboardMarkup(inline_keyboard=kb)
-
-
-def get_study_status_keyboard() -> InlineKeyboardMarkup:
-    """کیبورد شیشه‌ای برای انتخاب وضعیت تحصیلی."""
-    kb = [
-        [InlineKeyboardButton(text=status, callback_data=f"study_status_{status}")]
-        for status in config.KEYBOARD_STUDY_STATUS_TEXTS
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=kb)
-
-
-def get_degree_keyboard() -> InlineKeyboardMarkup:
-    """کیبورد شیشه‌ای برای انتخاب مقطع تحصیلی."""
-    kb = []
-    row = []
-    for degree in config.KEYBOARD_DEGREE_TEXTS:
-        row.append(InlineKeyboardButton(text=degree, callback_data=f"degree_{degree}"))
-        if len(row) >= 2:
-            kb.append(row)
-            row = []
-    if row:
-        kb.append(row)
-    return InlineKeyboardMarkup(inline_keyboard=kb)
-
-def get_consent_keyboard() -> InlineKeyboardMarkup:
-    """کیبورد درخواست تایید شرایط: دو دکمه پذیرش یا عدم پذیرش به صورت شیشه‌ای (Inline)."""
-    kb = InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="✅ شرایط را میپذیرم", callback_data="consent_accept"),
-            InlineKeyboardButton(text="❌ شرایط را نمیپذیرم", callback_data="consent_decline")
-        ]
-    ])
-    return kb
-
-
-def get_skip_worksample_keyboard() -> InlineKeyboardMarkup:
-    """کیبورد شیشه‌ای برای رد کردن مرحله آپلود نمونه‌کار (مرحله بعد)"""
-    # Provide two actions: skip the uploads or finish uploads and continue
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="اتمام آپلود و ادامه", callback_data="worksample_finish"),
-            InlineKeyboardButton(text="رد کردن این مرحله", callback_data="worksample_skip")
-        ]
-    ])
+# --- توابع کمکی (کیبوردها در keyboards.py ساخته و کش می‌شوند) ---
 
 def is_valid_phone(phone: str) -> bool:
     return re.fullmatch(r"09\d{9}", phone.strip())
 
+
+# --- رجیستری ویرایش فیلدها (مشترک بین ویرایش کاربر و ادمین) ---
+# نگاشت معکوس برچسب فارسی → کلید فیلد؛ یک بار ساخته می‌شود و فقط‌خواندنی است
+FIELD_KEY_BY_LABEL = MappingProxyType({label: key for key, label in config.FIELD_LABELS.items()})
+
+# کلید فیلد → (وضعیت مقصد، متن درخواست، سازنده کیبورد یا None برای حذف کیبورد)
+EDIT_DISPATCH = MappingProxyType({
+    'full_name': (ResumeStates.full_name, "لطفاً نام و نام خانوادگی خود را وارد کنید (مثال: علی رضایی)", None),
+    'username': (ResumeStates.username, "لطفاً آیدی تلگرام خود را وارد کنید (مثال: @alirezaei)", None),
+    'study_status': (ResumeStates.study_status, "لطفاً وضعیت تحصیلی خود را انتخاب کنید.", get_study_status_keyboard),
+    'degree': (ResumeStates.degree, "لطفاً مقطع تحصیلی خود را انتخاب کنید.", get_degree_keyboard),
+    'major': (ResumeStates.major, "لطفاً رشته تحصیلی خود را انتخاب کنید.", get_major_keyboard),
+    'field_university': (ResumeStates.field_university, "لطفاً نام دانشگاه یا مؤسسه آموزشی آخرین محل تحصیل خود را وارد کنید:", None),
+    'gpa': (ResumeStates.gpa, "لطفاً معدل کل خود را وارد کنید (فقط عدد، اعشاری مجاز است).", None),
+    'location': (ResumeStates.location, "لطفاً شهر و آدرس دقیق محل سکونت خود را وارد کنید:", None),
+    'phone_main': (ResumeStates.phone_main, "لطفاً شماره تلفن همراه ۱۱ رقمی خود را وارد کنید (شروع با 09).", None),
+    'phone_emergency': (ResumeStates.phone_emergency, "لطفاً شماره تماس اضطراری ۱۱ رقمی را وارد کنید (شروع با 09).", None),
+    'english_level': (ResumeStates.english_level, "لطفاً میزان تسلط خود به زبان انگلیسی را انتخاب کنید:", get_english_level_keyboard),
+    'work_history': (ResumeStates.work_history, "آیا سابقه کار مرتبط دارید؟", partial(create_reply_keyboard, config.KEYBOARD_WORK_HISTORY_TEXTS)),
+    'job_position': (ResumeStates.job_position, "لطفاً جایگاه شغلی مدنظر خود را انتخاب کنید.", partial(create_reply_keyboard, config.KEYBOARD_JOB_POSITION_TEXTS)),
+    'other_details': (ResumeStates.other_details, "در صورت داشتن توضیحات دیگر، لطفاً وارد کنید:", None),
+    'training_request': (ResumeStates.training_request, "آیا تمایل به شرکت در دوره‌های آموزشی مرتبط دارید؟", partial(create_reply_keyboard, config.KEYBOARD_TRAINING_REQUEST_TEXTS)),
+    'has_work_license': (ResumeStates.has_work_license, "آیا پروانه اشتغال به کار سازمان نظام مهندسی ساختمان دارید؟", partial(create_reply_keyboard, ["بله", "خیر"])),
+    'work_license_city': (ResumeStates.work_license_city, "لطفاً شهر یا محل صدور پروانه را وارد کنید:", None),
+})
+
+
+@lru_cache(maxsize=None)
+def get_edit_entry(field_key: str):
+    """(state, prompt, reply_markup) for a field; the keyboard is built on first use only."""
+    entry = EDIT_DISPATCH.get(field_key)
+    if entry is None:
+        return None
+    target_state, prompt_text, build_keyboard = entry
+    return target_state, prompt_text, build_keyboard() if build_keyboard else types.ReplyKeyboardRemove()
+
 # --- هندلر کاربر: شروع و منوی اصلی ---
-@dp.message(CommandStart())
+@applicant_router.route_message(CommandStart(), prefix="/start")
 async def command_start_handler(message: types.Message, state: FSMContext) -> None:
     await state.clear()
     # هنگام استارت، متن طولانی شرایط را نمایش بده و درخواست تایید کن
@@ -215,7 +257,7 @@ async def command_start_handler(message: types.Message, state: FSMContext) -> No
     await message.answer(config.START_MESSAGE, reply_markup=get_consent_keyboard())
     db.log("INFO", f"User {message.from_user.id} started bot.")
 
-@dp.message(F.text == config.KEYBOARD_MAIN_TEXTS[0], StateFilter(None))
+@applicant_router.route_message(config.KEYBOARD_MAIN_TEXTS[0], state=None)
 async def start_resume_flow(message: types.Message, state: FSMContext) -> None:
     await state.clear()
     # ابتدا آیدی تلگرام را بپرس
@@ -228,7 +270,7 @@ async def start_resume_flow(message: types.Message, state: FSMContext) -> None:
 
 
 # --- Consent handlers ---
-@dp.callback_query(F.data == "consent_accept")
+@callback_router.route_callback("consent_accept")
 async def consent_accept(callback: types.CallbackQuery, state: FSMContext) -> None:
     """اگر کاربر شرایط را پذیرفت، دکمه‌های اصلی نمایش داده می‌شود و ادامه از سر گرفته می‌شود."""
     await callback.answer()
@@ -243,46 +285,35 @@ async def consent_accept(callback: types.CallbackQuery, state: FSMContext) -> No
     db.log("INFO", f"User {callback.from_user.id} accepted terms.")
 
 
-@dp.callback_query(F.data == "consent_decline")
+@callback_router.route_callback("consent_decline")
 async def consent_decline(callback: types.CallbackQuery, state: FSMContext) -> None:
     """اگر کاربر شرایط را نپذیرفت، فرایند متوقف شده و دکمه استارت مجدد نمایش داده می‌شود."""
     await callback.answer()
     await state.clear()
     # نمایش پیام تشکر و یک دکمه استارت مجدد (ReplyKeyboard با دستور /start)
-    restart_kb = ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text="/start")]],
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
     await bot.send_message(
         callback.from_user.id,
         "متشکریم از شما. در صورت تمایل می‌توانید بعداً دوباره اقدام به ثبت اطلاعات کنید.",
-        reply_markup=restart_kb
+        reply_markup=get_restart_keyboard()
     )
     db.log("INFO", f"User {callback.from_user.id} declined terms.")
 
 
-@dp.message(F.text == config.SUPPORT_LABEL)
+@applicant_router.route_message(config.SUPPORT_LABEL)
 async def support_button_handler(message: types.Message) -> None:
     """Send support chat link as an inline URL button when user presses the support reply-keyboard button."""
     try:
-        kb = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="رفتن به پشتیبانی", url=config.SUPPORT_CHAT_LINK)]
-        ])
-        await message.answer("برای ارتباط با پشتیبانی روی دکمه زیر بزنید:", reply_markup=kb)
+        await message.answer("برای ارتباط با پشتیبانی روی دکمه زیر بزنید:", reply_markup=get_support_link_keyboard())
         db.log("INFO", f"User {message.from_user.id} requested support link.")
     except Exception as e:
         db.log("ERROR", f"Failed to send support link to {message.from_user.id}: {e}")
         await message.answer(f"ارتباط با پشتیبانی: {config.SUPPORT_CHAT_LINK}")
 
-@dp.message(F.text == config.MOHANDES_YAR_CHANNEL_LABEL)
+@applicant_router.route_message(config.MOHANDES_YAR_CHANNEL_LABEL)
 async def channel_button_handler(message: types.Message) -> None:
     """When user presses the channel button, send a message with an inline URL button."""
     try:
-        kb = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="ورود به کانال", url=config.MOHANDES_YAR_CHANNEL_LINK)]
-        ])
-        await message.answer("برای عضویت در کانال مهندس یار روی دکمه زیر کلیک کنید:", reply_markup=kb)
+        await message.answer("برای عضویت در کانال مهندس یار روی دکمه زیر کلیک کنید:", reply_markup=get_channel_link_keyboard())
         db.log("INFO", f"User {message.from_user.id} requested channel link.")
     except Exception as e:
         db.log("ERROR", f"Failed to send channel link to {message.from_user.id}: {e}")
@@ -292,7 +323,7 @@ async def channel_button_handler(message: types.Message) -> None:
 
 # --- FSM هندلرهای رزومه (استفاده از توابع جدید کیبورد) ---
 
-@dp.message(ResumeStates.full_name)
+@applicant_router.route_message(state=ResumeStates.full_name)
 async def process_full_name(message: types.Message, state: FSMContext) -> None:
     # انتظار برای نام و نام خانوادگی (بدون آیدی)
     text = message.text.strip()
@@ -322,7 +353,7 @@ async def process_full_name(message: types.Message, state: FSMContext) -> None:
     )
 
 
-@dp.message(ResumeStates.username)
+@applicant_router.route_message(state=ResumeStates.username)
 async def process_username(message: types.Message, state: FSMContext) -> None:
     # انتظار برای آیدی تلگرام؛ ذخیره بدون علامت @
     txt = message.text.strip()
@@ -342,7 +373,7 @@ async def process_username(message: types.Message, state: FSMContext) -> None:
     if data.get('is_editing'):
         await finish_single_edit(message, state)
         return
-@dp.callback_query(F.data.startswith("study_status_"))
+@callback_router.route_callback(prefix="study_status_")
 async def process_study_status(callback: types.CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
     status = callback.data[len("study_status_"):]
@@ -367,7 +398,7 @@ async def process_study_status(callback: types.CallbackQuery, state: FSMContext)
         reply_markup=get_degree_keyboard()
     )
 
-@dp.callback_query(F.data.startswith("degree_"))
+@callback_router.route_callback(prefix="degree_")
 async def process_degree(callback: types.CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
     degree = callback.data[len("degree_"):]
@@ -395,17 +426,17 @@ async def process_degree(callback: types.CallbackQuery, state: FSMContext) -> No
     )
 
 # bot.py (بخش هندلرهای FSM)
-@dp.message(ResumeStates.degree)
+@applicant_router.route_message(state=ResumeStates.degree)
 async def process_degree_invalid(message: types.Message) -> None:
     """Handle invalid input for degree."""
     await message.answer("لطفاً از دکمه‌های شیشه‌ای برای انتخاب مقطع تحصیلی استفاده کنید.")
 
 # --- اضافه شدن هندلر گمشده: ۴. رشته تحصیلی و دانشگاه ---
-@dp.message(ResumeStates.field_university)
+@applicant_router.route_message(state=ResumeStates.field_university)
 async def process_field_university(message: types.Message, state: FSMContext) -> None:
     await state.update_data(field_university=message.text)
     user_data = await state.get_data()
-    db.save_resume_data(message.from_user.id, user_data)
+    await persist_state_to_db(message.from_user.id, state)
     # اگر در حال ویرایش هستیم، به منوی ویرایش برمی‌گردیم
     if user_data.get('is_editing'):
         await finish_single_edit(message, state)
@@ -418,7 +449,7 @@ async def process_field_university(message: types.Message, state: FSMContext) ->
     )
 
 
-@dp.callback_query(F.data.startswith("major_"))
+@callback_router.route_callback(prefix="major_")
 async def process_major_callback(callback: types.CallbackQuery, state: FSMContext) -> None:
     """پردازش انتخاب رشته از طریق Inline keyboard و سپس درخواست نام آخرین محل تحصیل."""
     await callback.answer()
@@ -450,7 +481,7 @@ async def process_major_callback(callback: types.CallbackQuery, state: FSMContex
     )
 
 # --- اضافه شدن هندلر گمشده: ۵. معدل کل ---
-@dp.message(ResumeStates.gpa)
+@applicant_router.route_message(state=ResumeStates.gpa)
 async def process_gpa(message: types.Message, state: FSMContext) -> None:
     try:
         gpa = float(message.text)
@@ -482,7 +513,7 @@ async def process_gpa(message: types.Message, state: FSMContext) -> None:
 
 # --- FSM هندلرها (شروع از مرحله ۶ که آخرین مرحله درست‌شده بود) ---
 
-@dp.message(ResumeStates.location)
+@applicant_router.route_message(state=ResumeStates.location)
 async def process_location(message: types.Message, state: FSMContext) -> None:
     await state.update_data(location=message.text)
     await persist_state_to_db(message.from_user.id, state)
@@ -499,7 +530,7 @@ async def process_location(message: types.Message, state: FSMContext) -> None:
         reply_markup=types.ReplyKeyboardRemove()
     )
 
-@dp.message(ResumeStates.phone_main)
+@applicant_router.route_message(state=ResumeStates.phone_main)
 async def process_phone_main(message: types.Message, state: FSMContext) -> None:
     if not is_valid_phone(message.text):
         await message.answer(
@@ -521,7 +552,7 @@ async def process_phone_main(message: types.Message, state: FSMContext) -> None:
         "لطفاً شماره تماس اضطراری ۱۱ رقمی را وارد کنید (شروع با 09)."
     )
 
-@dp.message(ResumeStates.phone_emergency)
+@applicant_router.route_message(state=ResumeStates.phone_emergency)
 async def process_phone_emergency(message: types.Message, state: FSMContext) -> None:
     if not is_valid_phone(message.text):
         await message.answer(
@@ -549,7 +580,7 @@ async def process_phone_emergency(message: types.Message, state: FSMContext) ->
 
 # --- لوپ مهارت‌ها (Skill Loop Handlers) ---
 
-@dp.callback_query(ResumeStates.skills_start, F.data.startswith("skill_") & ~F.data.endswith("_finish"))
+@callback_router.route_callback(~F.data.endswith("_finish"), prefix="skill_", state=ResumeStates.skills_start)
 async def process_skill_selection(callback: types.CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
     # edit the originating message to indicate the selection and remove inline buttons
@@ -568,8 +599,7 @@ async def process_skill_selection(callback: types.CallbackQuery, state: FSMConte
             pass
     # امن‌تر کردن پارس کردن callback data: بقیه رشته بعد از پیش‌وند را بگیریم
     if skill_action == "continue":
-        user_data = await state.get_data()
-        db.save_resume_data(callback.from_user.id, user_data)
+        await persist_state_to_db(callback.from_user.id, state)
         data = await state.get_data()
         # اگر در حال ویرایش هستیم، به منوی ویرایش برمی‌گردیم
         if data.get('is_editing'):
@@ -606,7 +636,7 @@ async def process_skill_selection(callback: types.CallbackQuery, state: FSMConte
         reply_markup=get_skill_level_keyboard(skill_name)
     )
 
-@dp.message(ResumeStates.skills_select_level, ~F.text.startswith("/"))
+@applicant_router.route_message(~F.text.startswith("/"), state=ResumeStates.skills_select_level)
 async def process_other_skill_name(message: types.Message, state: FSMContext) -> None:
     # ثبت نام مهارت وارد شده توسط کاربر برای "سایر مهارت‌ها"
     skill_name = message.text.strip()
@@ -617,8 +647,10 @@ async def process_other_skill_name(message: types.Message, state: FSMContext) ->
         reply_markup=get_skill_level_keyboard(skill_name)
     )
 
-@dp.callback_query(ResumeStates.skills_select_level, F.data.startswith("level_"))
+@callback_router.route_callback(prefix="level_")
 async def process_skill_level_selection(callback: types.CallbackQuery, state: FSMContext) -> None:
+    if await stale_callback(callback, state, ResumeStates.skills_select_level):
+        return
     await callback.answer()
     # edit the originating message to show selected level and remove inline buttons
     try:
@@ -678,7 +710,7 @@ async def process_skill_level_selection(callback: types.CallbackQuery, state: FS
     )
 
 
-@dp.callback_query(F.data.startswith("english_"))
+@callback_router.route_callback(prefix="english_")
 async def process_english_level(callback: types.CallbackQuery, state: FSMContext) -> None:
     """پردازش انتخاب میزان تسلط انگلیسی و ادامه به مرحله مهارت‌ها"""
     await callback.answer()
@@ -712,28 +744,38 @@ async def process_english_level(callback: types.CallbackQuery, state: FSMContext
 
 # --- مرحله ۱۰: آپلود نمونه کار ---
 
-@dp.message(ResumeStates.work_sample_upload, F.document | F.photo)
-async def process_work_sample(message: types.Message, state: FSMContext) -> None:
-    # ممکن است کاربر فایل ارسال کند یا عکس؛ برای هر دو حالت سازگار رفتار کنیم
-    file_info = message.document if message.document else (message.photo[-1] if message.photo else None)
-    if not file_info:
-        await message.answer("فایلی دریافت نشد. لطفاً فایل را به صورت Document یا Photo ارسال کنید.")
-        return
+@applicant_router.route_message(F.document | F.photo, state=ResumeStates.work_sample_upload)
+async def process_work_sample(message: types.Message, state: FSMContext, album: list = None) -> None:
+    # آلبوم (چند فایل با یک media_group_id) را user_locks جمع کرده است: یک ذخیره در دیتابیس و یک پیام وضعیت
+    album = album or [message]
+
+    # بدون سرور محلی، Bot API ابری فایل‌های بزرگ‌تر از ۲۰ مگابایت را تحویل نمی‌دهد
+    download_limit = local_api.download_limit(bot.session.api)
+    max_bytes = min(config.MAX_FILE_SIZE_BYTES, download_limit or config.MAX_FILE_SIZE_BYTES)
+    accepted = []
+    too_large = []
+    for part in album:
+        # ممکن است کاربر فایل ارسال کند یا عکس؛ برای هر دو حالت سازگار رفتار کنیم
+        file_info = part.document if part.document else (part.photo[-1] if part.photo else None)
+        if not file_info:
+            continue
+        file_size = getattr(file_info, 'file_size', None)
+        if file_size and file_size > max_bytes:
+            too_large.append(round(file_size / 1024 / 1024, 2))
+            continue
+        accepted.append((part, file_info))
 
-    file_size = getattr(file_info, 'file_size', None)
-    if file_size and file_size > config.MAX_FILE_SIZE_BYTES:
+    if too_large:
+        sizes = "، ".join(f"{size} مگابایت" for size in too_large)
         await message.answer(
-            f"❌ حجم فایل ارسالی ({round(file_info.file_size / 1024 / 1024, 2)} مگابایت) بیشتر از حداکثر مجاز (**{config.MAX_FILE_SIZE_MB} مگابایت**) است. لطفاً فایل دیگری ارسال کنید."
+            f"❌ حجم فایل ارسالی ({sizes}) بیشتر از حداکثر مجاز (**{max_bytes // 1024 // 1024} مگابایت**) است. لطفاً فایل دیگری ارسال کنید."
         )
+    if not accepted:
+        if not too_large:
+            await message.answer("فایلی دریافت نشد. لطفاً فایل را به صورت Document یا Photo ارسال کنید.")
         return
 
     timestamp = int(datetime.now().timestamp())
-    # ممکن است photo فاقد file_name باشد؛ در اینصورت پسوند پیش‌فرض .jpg استفاده می‌کنیم
-    filename = getattr(file_info, 'file_name', None)
-    if not filename:
-        file_extension = '.jpg' if message.photo else os.path.splitext(filename or 'file')[1]
-    else:
-        file_extension = os.path.splitext(filename)[1]
     # create per-user uploads folder using user_id and sanitized full name
     data = await state.get_data()
     full_name = data.get('full_name') or str(message.from_user.id)
@@ -743,20 +785,40 @@ async def process_work_sample(message: types.Message, state: FSMContext) -> None
     user_folder = f"{message.from_user.id}_{safe_name}"
     user_dir = os.path.join(config.UPLOADS_DIR, user_folder)
     os.makedirs(user_dir, exist_ok=True)
-    save_path = os.path.join(user_dir, f"resume_{message.from_user.id}_{timestamp}{file_extension}")
+    save_paths = []
+    for index, (part, file_info) in enumerate(accepted, start=1):
+        # ممکن است photo فاقد file_name باشد؛ در اینصورت پسوند پیش‌فرض .jpg استفاده می‌کنیم
+        filename = getattr(file_info, 'file_name', None)
+        file_extension = os.path.splitext(filename)[1] if filename else ('.jpg' if part.photo else '')
+        # فایل‌های یک آلبوم در یک ثانیه می‌رسند؛ شماره قسمت از هم‌نام شدن جلوگیری می‌کند
+        suffix = f"_{index}" if len(accepted) > 1 else ""
+        save_paths.append(os.path.join(user_dir, f"resume_{message.from_user.id}_{timestamp}{suffix}{file_extension}"))
+
+    # دانلود/برداشتن فایل‌های آلبوم به‌صورت هم‌زمان؛ خطای یک فایل بقیه را از بین نمی‌برد
+    results = await asyncio.gather(
+        *(local_api.save_file(bot, file_info.file_id, path) for (_, file_info), path in zip(accepted, save_paths)),
+        return_exceptions=True
+    )
+    saved = []
+    for path, result in zip(save_paths, results):
+        if isinstance(result, BaseException):
+            db.log("ERROR", f"File download failed for user {message.from_user.id}: {result}")
+            continue
+        metrics.inc("bot_file_ingest_total", method=result)
+        saved.append(path)
+    if not saved:
+        await message.answer("❌ خطایی در آپلود فایل رخ داد. لطفاً دوباره تلاش کنید.")
+        return
 
     try:
-        file = await bot.get_file(file_info.file_id)
-        await bot.download_file(file.file_path, save_path)
-
         # store in per-user uploaded_files list
         data = await state.get_data()
         uploaded = data.get('uploaded_files', []) or []
-        uploaded.append(save_path)
-        await state.update_data(uploaded_files=uploaded, file_path=save_path)
+        uploaded.extend(saved)
+        await state.update_data(uploaded_files=uploaded, file_path=saved[-1])
         feedback_message_id = data.get('feedback_message_id')
         await persist_state_to_db(message.from_user.id, state)
-        db.log("INFO", f"User {message.from_user.id} uploaded file to: {save_path}")
+        db.log("INFO", f"User {message.from_user.id} uploaded {len(saved)} file(s) to: {', '.join(saved)}")
 
         # منطق جدید: ویرایش پیام قبلی یا ارسال پیام جدید
         num_files = len(uploaded)
@@ -764,6 +826,8 @@ async def process_work_sample(message: types.Message, state: FSMContext) -> None
             f"✅ **{num_files}** فایل با موفقیت آپلود شد.\n"
             "می‌توانید فایل دیگری ارسال کنید یا روی دکمه‌های زیر بزنید."
         )
+        if len(saved) < len(accepted):
+            feedback_text = f"⚠️ {len(accepted) - len(saved)} فایل آپلود نشد؛ لطفاً دوباره ارسال کنید.\n" + feedback_text
 
         if feedback_message_id:
             try:
@@ -787,9 +851,11 @@ async def process_work_sample(message: types.Message, state: FSMContext) -> None
         await message.answer("❌ خطایی در آپلود فایل رخ داد. لطفاً دوباره تلاش کنید.")
 
 
-@dp.callback_query(F.data == "worksample_skip")
+@callback_router.route_callback("worksample_skip")
 async def worksample_skip_callback(callback: types.CallbackQuery, state: FSMContext) -> None:
     """پردازش دکمه 'مرحله بعد' در صفحه آپلود نمونه‌کار برای عبور از این مرحله."""
+    if await stale_callback(callback, state, ResumeStates.work_sample_upload):
+        return
     await callback.answer()
     # edit source message to indicate the step was skipped and remove inline buttons
     try:
@@ -809,9 +875,11 @@ async def worksample_skip_callback(callback: types.CallbackQuery, state: FSMCont
     )
 
 
-@dp.callback_query(F.data == "worksample_finish")
+@callback_router.route_callback("worksample_finish")
 async def worksample_finish_callback(callback: types.CallbackQuery, state: FSMContext) -> None:
     """User finished uploading files and wants to continue the flow."""
+    if await stale_callback(callback, state, ResumeStates.work_sample_upload):
+        return
     await callback.answer()
     data = await state.get_data()
     uploaded = data.get('uploaded_files', []) or []
@@ -833,7 +901,7 @@ async def worksample_finish_callback(callback: types.CallbackQuery, state: FSMCo
         reply_markup=create_reply_keyboard(config.KEYBOARD_WORK_HISTORY_TEXTS)
     )
 
-@dp.message(ResumeStates.work_sample_upload)
+@applicant_router.route_message(state=ResumeStates.work_sample_upload)
 async def process_work_sample_invalid(message: types.Message) -> None:
     await message.answer(
         "ورودی نامعتبر. لطفاً نمونه کار خود را به صورت **فایل** (Document/Photo) ارسال کنید."
@@ -841,7 +909,7 @@ async def process_work_sample_invalid(message: types.Message) -> None:
 
 # --- مرحله ۱۱ تا ۱۴ (سابقه کار، جایگاه شغلی، توضیحات، آموزش) ---
 
-@dp.message(ResumeStates.work_history, F.text == "دارم")
+@applicant_router.route_message("دارم", state=ResumeStates.work_history)
 async def process_work_history_yes(message: types.Message, state: FSMContext) -> None:
     await state.update_data(work_history="دارم")
     await persist_state_to_db(message.from_user.id, state)
@@ -858,7 +926,7 @@ async def process_work_history_yes(message: types.Message, state: FSMContext) ->
         reply_markup=types.ReplyKeyboardRemove()
     )
 
-@dp.message(ResumeStates.work_history, F.text == "ندارم")
+@applicant_router.route_message("ندارم", state=ResumeStates.work_history)
 async def process_work_history_no(message: types.Message, state: FSMContext) -> None:
     await state.update_data(work_history="ندارم")
     await persist_state_to_db(message.from_user.id, state)
@@ -875,7 +943,7 @@ async def process_work_history_no(message: types.Message, state: FSMContext) ->
         reply_markup=create_reply_keyboard(config.KEYBOARD_JOB_POSITION_TEXTS)
     )
 
-@dp.message(ResumeStates.job_position, ~F.text.in_(config.KEYBOARD_JOB_POSITION_TEXTS))
+@applicant_router.route_message(~F.text.in_(config.KEYBOARD_JOB_POSITION_TEXTS), state=ResumeStates.job_position)
 async def process_work_history_details(message: types.Message, state: FSMContext) -> None:
     data = await state.get_data()
     # اگر سابقه کار 'دارم' بوده، این پیام به عنوان شرح سابقه در نظر گرفته می‌شود
@@ -893,11 +961,11 @@ async def process_work_history_details(message: types.Message, state: FSMContext
         return
     await message.answer("لطفاً از دکمه‌های تعیین شده استفاده کنید.")
 
-@dp.message(ResumeStates.job_position, F.text.in_(config.KEYBOARD_JOB_POSITION_TEXTS))
+@applicant_router.route_message(text=config.KEYBOARD_JOB_POSITION_TEXTS, state=ResumeStates.job_position)
 async def process_job_position(message: types.Message, state: FSMContext) -> None:
     await state.update_data(job_position=message.text)
     user_data = await state.get_data()
-    db.save_resume_data(message.from_user.id, user_data)
+    await persist_state_to_db(message.from_user.id, state)
     # اگر در حال ویرایش هستیم، به منوی ویرایش برمی‌گردیم
     if user_data.get('is_editing'):
         await finish_single_edit(message, state)
@@ -910,13 +978,12 @@ async def process_job_position(message: types.Message, state: FSMContext) -> Non
         reply_markup=create_reply_keyboard(["رد شدن"], one_time=True)
     )
 
-@dp.message(ResumeStates.other_details)
+@applicant_router.route_message(state=ResumeStates.other_details)
 async def process_other_details(message: types.Message, state: FSMContext) -> None:
     # Allow user to skip this optional step
     if message.text.strip() == "رد شدن":
         await state.update_data(other_details=None)
-        user_data = await state.get_data()
-        db.save_resume_data(message.from_user.id, user_data)
+        await persist_state_to_db(message.from_user.id, state)
         # رفتن به مرحله جدید: پروانه اشتغال
         await state.set_state(ResumeStates.has_work_license)
         await message.answer(
@@ -928,7 +995,7 @@ async def process_other_details(message: types.Message, state: FSMContext) -> No
 
     await state.update_data(other_details=message.text)
     user_data = await state.get_data()
-    db.save_resume_data(message.from_user.id, user_data)
+    await persist_state_to_db(message.from_user.id, state)
     # اگر در حال ویرایش هستیم، به منوی ویرایش برمی‌گردیم
     if user_data.get('is_editing'):
         await finish_single_edit(message, state)
@@ -944,7 +1011,7 @@ async def process_other_details(message: types.Message, state: FSMContext) -> No
 
 # --- هندلرهای جدید برای پروانه اشتغال ---
 
-@dp.message(ResumeStates.has_work_license, F.text.in_(["بله", "خیر"]))
+@applicant_router.route_message(text=["بله", "خیر"], state=ResumeStates.has_work_license)
 async def process_has_work_license(message: types.Message, state: FSMContext) -> None:
     if message.text == "بله":
         await state.update_data(has_work_license="بله")
@@ -969,7 +1036,7 @@ async def process_has_work_license(message: types.Message, state: FSMContext) ->
         "آیا تمایل به شرکت در دوره‌های آموزشی مرتبط دارید؟",
         reply_markup=create_reply_keyboard(config.KEYBOARD_TRAINING_REQUEST_TEXTS)
     )
-@dp.message(ResumeStates.work_license_city)
+@applicant_router.route_message(state=ResumeStates.work_license_city)
 async def process_work_license_city(message: types.Message, state: FSMContext) -> None:
     await state.update_data(work_license_city=message.text)
     await persist_state_to_db(message.from_user.id, state)
@@ -988,15 +1055,6 @@ async def process_work_license_city(message: types.Message, state: FSMContext) -
         return
 
 
-def get_confirmation_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="✅ تایید و ارسال", callback_data="confirm_send"),
-            InlineKeyboardButton(text="✏️ ویرایش", callback_data="edit_resume")
-        ]
-    ])
-
-
 async def finish_single_edit(message: types.Message, state: FSMContext) -> None:
     """Helper: پس از ویرایش یک فیلد، به منوی انتخاب فیلد بازمی‌گردد."""
     try:
@@ -1008,34 +1066,7 @@ async def finish_single_edit(message: types.Message, state: FSMContext) -> None:
         db.log("ERROR", f"finish_single_edit failed: {e}")
 
 
-def get_edit_fields_keyboard() -> ReplyKeyboardMarkup:
-    # Present Persian labels to the user using config.FIELD_LABELS
-    labels = []
-    for key, label in config.FIELD_LABELS.items():
-        if key in ("register_date", "file_path"):
-            continue
-        labels.append((key, label))
-
-    keyboard_rows = []
-    cols = 2
-    row = []
-    for _, label in labels:
-        row.append(KeyboardButton(text=label))
-        if len(row) >= cols:
-            keyboard_rows.append(row)
-            row = []
-    if row:
-        keyboard_rows.append(row)
-
-    # add a confirm-edit button next to cancel so user can finish editing
-    keyboard_rows.append([
-        KeyboardButton(text="تایید ویرایش"),
-        KeyboardButton(text="انصراف")
-    ])
-    return ReplyKeyboardMarkup(keyboard=keyboard_rows, resize_keyboard=True, one_time_keyboard=True)
-
-
-@dp.message(ResumeStates.training_request, F.text.in_(config.KEYBOARD_TRAINING_REQUEST_TEXTS))
+@applicant_router.route_message(text=config.KEYBOARD_TRAINING_REQUEST_TEXTS, state=ResumeStates.training_request)
 async def process_training_request(message: types.Message, state: FSMContext) -> None:
     await state.update_data(training_request=message.text)
     await persist_state_to_db(message.from_user.id, state)
@@ -1056,8 +1087,11 @@ async def process_training_request(message: types.Message, state: FSMContext) ->
     await message.answer(text, reply_markup=get_confirmation_keyboard(), parse_mode=ParseMode.HTML)
 
 
-@dp.callback_query(F.data == "confirm_send")
+@callback_router.route_callback("confirm_send")
 async def callback_confirm_send(callback: types.CallbackQuery, state: FSMContext) -> None:
+    # بعد از state.clear() ضربه دوم رزومه را با داده خالی بازنویسی و اعلان دوباره ثبت می‌کرد
+    if await stale_callback(callback, state, ResumeStates.confirm_resume):
+        return
     await callback.answer()
     # edit source confirmation message so buttons are not ambiguous
     try:
@@ -1070,17 +1104,83 @@ async def callback_confirm_send(callback: types.CallbackQuery, state: FSMContext
     user_id = callback.from_user.id
     user_data = await state.get_data()
     user_data['user_id'] = user_id
-    await persist_state_to_db(user_id, state)
 
-    # notify admins
-    await notify_admin(user_data)
+    # بررسی احتمال تکراری بودن متقاضی (چند حساب تلگرام برای یک نفر)
+    try:
+        duplicates = db.find_duplicates(user_id, user_data)
+    except Exception as e:
+        db.log("ERROR", f"Duplicate check failed for user {user_id}: {e}")
+        duplicates = []
+
+    # اعلان ادمین‌ها و پیام موفقیت کاربر همراه با خود رزومه ثبت و از outbox ارسال می‌شوند
+    notification = {
+        'user_id': user_id,
+        'full_name': user_data.get('full_name', 'N/A'),
+        'username': user_data.get('username', 'N/A'),
+        'register_date': user_data.get('register_date', 'N/A'),
+        'duplicates': duplicates,
+    }
+    messages = [(db.ADMIN_NOTIFICATION_KIND, admin_id, notification) for admin_id in config.ADMIN_IDS]
+    messages.append((OUTBOX_RESUME_CONFIRMED, user_id, {}))
+    try:
+        db.confirm_resume(user_id, user_data, messages)
+    except Exception as e:
+        db.log("ERROR", f"Failed to confirm resume for user {user_id}: {e}")
+        await bot.send_message(
+            user_id, "❌ خطا در ثبت رزومه. لطفاً دوباره تلاش کنید.", reply_markup=get_confirmation_keyboard()
+        )
+        return
+    outbox.wake()
     db.log("SUCCESS", f"Resume confirmed and sent by User ID: {user_id}")
-
-    await bot.send_message(user_id, config.SUCCESS_MESSAGE, reply_markup=get_main_keyboard(user_id in config.ADMIN_IDS))
     await state.clear()
 
 
-@dp.callback_query(F.data == "edit_resume")
+# ترتیب مراحل فرم؛ «ادامه ساخت رزومه» از اولین فیلد خالی شروع می‌کند (مهارت‌ها و نمونه کار اختیاری‌اند)
+RESUME_STEP_FIELDS = (
+    'username', 'full_name', 'study_status', 'degree', 'major', 'gpa', 'field_university', 'location',
+    'phone_main', 'phone_emergency', 'english_level', 'work_history', 'job_position', 'other_details',
+    'has_work_license', 'training_request',
+)
+
+
+@callback_router.route_callback("resume_application")
+async def callback_resume_application(callback: types.CallbackQuery, state: FSMContext) -> None:
+    """دکمه پیام یادآوری: رزومه ذخیره‌شده را در FSM بارگذاری و مرحله بعدی را می‌پرسد."""
+    await callback.answer()
+    try:
+        await callback.message.edit_reply_markup(reply_markup=None)
+    except Exception:
+        pass
+    user_id = callback.from_user.id
+    saved = db.get_resume_data(user_id)
+    if saved and saved.get('completed_at'):
+        await bot.send_message(user_id, "رزومه شما قبلاً ارسال شده است.", reply_markup=get_main_keyboard(user_id in config.ADMIN_IDS))
+        return
+
+    # داده FSM (اگر از آخرین ذخیره باقی مانده باشد) تازه‌تر از دیتابیس است
+    data = {k: v for k, v in (saved or {}).items() if k in config.RESUME_FIELDS and v not in (None, '')}
+    if isinstance(data.get('uploaded_files'), str):
+        try:
+            data['uploaded_files'] = json.loads(data['uploaded_files'])
+        except json.JSONDecodeError:
+            data['uploaded_files'] = []
+    data.update(await state.get_data())
+    data['is_editing'] = False
+    await state.set_data(data)
+
+    missing = next((f for f in RESUME_STEP_FIELDS if data.get(f) in (None, '')), None)
+    if missing is None:
+        data['user_id'] = user_id
+        await state.set_state(ResumeStates.confirm_resume)
+        await bot.send_message(user_id, "لطفاً رزومه خود را بررسی کنید و در صورت صحت آن را ارسال یا ویرایش نمایید:")
+        await bot.send_message(user_id, format_resume_data(data), reply_markup=get_confirmation_keyboard(), parse_mode=ParseMode.HTML)
+        return
+    target_state, prompt_text, reply_markup = get_edit_entry(missing)
+    await state.set_state(target_state)
+    await bot.send_message(user_id, prompt_text, reply_markup=reply_markup)
+
+
+@callback_router.route_callback("edit_resume")
 async def callback_edit_resume(callback: types.CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
     # edit the confirmation message to indicate the user chose to edit
@@ -1097,7 +1197,7 @@ async def callback_edit_resume(callback: types.CallbackQuery, state: FSMContext)
     await bot.send_message(callback.from_user.id, "لطفاً فیلد موردنظر برای ویرایش را انتخاب کنید:", reply_markup=get_edit_fields_keyboard())
 
 
-@dp.message(ResumeStates.edit_field)
+@applicant_router.route_message(state=ResumeStates.edit_field)
 async def handle_edit_field(message: types.Message, state: FSMContext) -> None:
     text = message.text.strip()
     if text == "انصراف":
@@ -1119,13 +1219,7 @@ async def handle_edit_field(message: types.Message, state: FSMContext) -> None:
         await message.answer(format_resume_data(user_data), reply_markup=get_confirmation_keyboard(), parse_mode=ParseMode.HTML)
         return
 
-    # Map Persian label back to internal field key
-    selected_key = None
-    for key, label in config.FIELD_LABELS.items():
-        if label == text:
-            selected_key = key
-            break
-
+    selected_key = FIELD_KEY_BY_LABEL.get(text)
     if not selected_key:
         await message.answer("فیلد نامعتبر. لطفاً یکی از فیلدهای نمایش‌داده‌شده را انتخاب کنید.")
         return
@@ -1148,30 +1242,9 @@ async def handle_edit_field(message: types.Message, state: FSMContext) -> None:
     # --- پایان منطق اختصاصی مهارت‌ها ---
 
 
-    # Refactor: Use a dispatch dictionary to avoid long if/elif chains
-    # This makes the code cleaner, more maintainable, and easier to extend.
-    EDIT_DISPATCH = {
-        'full_name': (ResumeStates.full_name, "لطفاً نام و نام خانوادگی خود را وارد کنید (مثال: علی رضایی)", types.ReplyKeyboardRemove()),
-        'username': (ResumeStates.username, "لطفاً آیدی تلگرام خود را وارد کنید (مثال: @alirezaei)", types.ReplyKeyboardRemove()),
-        'study_status': (ResumeStates.study_status, "لطفاً وضعیت تحصیلی خود را انتخاب کنید.", get_study_status_keyboard()),
-        'degree': (ResumeStates.degree, "لطفاً مقطع تحصیلی خود را انتخاب کنید.", get_degree_keyboard()),
-        'major': (ResumeStates.major, "لطفاً رشته تحصیلی خود را انتخاب کنید.", get_major_keyboard()),
-        'field_university': (ResumeStates.field_university, "لطفاً نام دانشگاه یا مؤسسه آموزشی آخرین محل تحصیل خود را وارد کنید:", types.ReplyKeyboardRemove()),
-        'gpa': (ResumeStates.gpa, "لطفاً معدل کل خود را وارد کنید (فقط عدد، اعشاری مجاز است).", types.ReplyKeyboardRemove()),
-        'location': (ResumeStates.location, "لطفاً شهر و آدرس دقیق محل سکونت خود را وارد کنید:", types.ReplyKeyboardRemove()),
-        'phone_main': (ResumeStates.phone_main, "لطفاً شماره تلفن همراه ۱۱ رقمی خود را وارد کنید (شروع با 09).", types.ReplyKeyboardRemove()),
-        'phone_emergency': (ResumeStates.phone_emergency, "لطفاً شماره تماس اضطراری ۱۱ رقمی را وارد کنید (شروع با 09).", types.ReplyKeyboardRemove()),
-        'english_level': (ResumeStates.english_level, "لطفاً میزان تسلط خود به زبان انگلیسی را انتخاب کنید:", get_english_level_keyboard()),
-        'work_history': (ResumeStates.work_history, "آیا سابقه کار مرتبط دارید؟", create_reply_keyboard(config.KEYBOARD_WORK_HISTORY_TEXTS)),
-        'job_position': (ResumeStates.job_position, "لطفاً جایگاه شغلی مدنظر خود را انتخاب کنید.", create_reply_keyboard(config.KEYBOARD_JOB_POSITION_TEXTS)),
-        'other_details': (ResumeStates.other_details, "در صورت داشتن توضیحات دیگر، لطفاً وارد کنید:", types.ReplyKeyboardRemove()),
-        'training_request': (ResumeStates.training_request, "آیا تمایل به شرکت در دوره‌های آموزشی مرتبط دارید؟", create_reply_keyboard(config.KEYBOARD_TRAINING_REQUEST_TEXTS)),        
-        'has_work_license': (ResumeStates.has_work_license, "آیا پروانه اشتغال به کار سازمان نظام مهندسی ساختمان دارید؟", create_reply_keyboard(["بله", "خیر"])),
-        'work_license_city': (ResumeStates.work_license_city, "لطفاً شهر یا محل صدور پروانه را وارد کنید:", types.ReplyKeyboardRemove()),
-    }
-
-    if selected_key in EDIT_DISPATCH:
-        target_state, prompt_text, reply_markup = EDIT_DISPATCH[selected_key]
+    entry = get_edit_entry(selected_key)
+    if entry:
+        target_state, prompt_text, reply_markup = entry
         await state.set_state(target_state)
         await message.answer(prompt_text, reply_markup=reply_markup)
     else:
@@ -1180,14 +1253,14 @@ async def handle_edit_field(message: types.Message, state: FSMContext) -> None:
         await message.answer(f"لطفاً مقدار جدید برای فیلد **{text}** را وارد کنید:", reply_markup=types.ReplyKeyboardRemove())
 
 
-@dp.callback_query(F.data == "skill_edit_finish")
+@callback_router.route_callback("skill_edit_finish")
 async def callback_skill_edit_finish(callback: types.CallbackQuery, state: FSMContext) -> None:
     """هنگامی که کاربر در حالت ویرایش، دکمه اتمام ویرایش مهارت‌ها را می‌زند."""
     await callback.answer()
     await finish_single_edit(callback.message, state)
 
 
-@dp.message(ResumeStates.edit_value)
+@applicant_router.route_message(state=ResumeStates.edit_value)
 async def handle_edit_value(message: types.Message, state: FSMContext) -> None:
     data = await state.get_data()
     field = data.get('edit_field_name')
@@ -1205,7 +1278,7 @@ async def handle_edit_value(message: types.Message, state: FSMContext) -> None:
     await finish_single_edit(message, state)
 
 # ... (ادامه کد: توابع notify_admin و هندلرهای ادمین) ...
-@dp.message(F.text == "🏠 منوی اصلی")
+@applicant_router.route_message("🏠 منوی اصلی")
 async def admin_back_to_main(message: types.Message) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -1221,74 +1294,11 @@ class AdminStates(StatesGroup):
     edit_enter_value = State()
     delete_confirm = State()
     block_unblock = State()
+    top_select_position = State()
+    broadcast_filter = State()
+    broadcast_text = State()
     
-# --- توابع کمکی ساخت کیبورد ---
-
-def create_reply_keyboard(texts: list, one_time: bool = False) -> ReplyKeyboardMarkup:
-    """ساخت ReplyKeyboardMarkup با تبدیل لیست رشته‌ای به KeyboardButton"""
-    keyboard_rows = []
-    cols = 2
-    row = []
-    for t in texts:
-        row.append(KeyboardButton(text=t))
-        if len(row) >= cols:
-            keyboard_rows.append(row)
-            row = []
-    if row:
-        keyboard_rows.append(row)
-
-    return ReplyKeyboardMarkup(keyboard=keyboard_rows, resize_keyboard=True, one_time_keyboard=one_time)
-
-def get_admin_main_keyboard() -> ReplyKeyboardMarkup:
-    """منوی اصلی پنل ادمین"""
-    # toggle label based on per-admin setting if available
-    keyboard_rows = []
-    keyboard_rows.append([KeyboardButton(text="📋 لیست کاربران"), KeyboardButton(text="🔎 جستجوی کاربر")])
-    keyboard_rows.append([KeyboardButton(text="📊 آمار کلی"), KeyboardButton(text="📤 دریافت اکسل")])
-    keyboard_rows.append([KeyboardButton(text="📥 پشتیبان‌گیری"), KeyboardButton(text="📄 مشاهده لاگ")])
-    # Add toggle button placeholder; actual label is handled by a dedicated handler
-    keyboard_rows.append([KeyboardButton(text="🔁 نمایش حذف‌شده‌ها"), KeyboardButton(text="🏠 منوی اصلی")])
-    return ReplyKeyboardMarkup(keyboard=keyboard_rows, resize_keyboard=True)
-
-def get_user_actions_keyboard(user_id: int, is_blocked: bool) -> ReplyKeyboardMarkup:
-    """کیبورد اقدامات ادمین روی کاربر خاص"""
-    block_status = "✅ آنبلاک" if is_blocked else "🚫 بلاک"
-    keyboard_rows = [
-        [KeyboardButton(text="✏️ ویرایش اطلاعات"), KeyboardButton(text="🗑️ حذف کاربر"), KeyboardButton(text="📂 دریافت نمونه کار")],
-        [KeyboardButton(text=block_status)],
-        [KeyboardButton(text="🔙 بازگشت به جستجو")],
-        [KeyboardButton(text="بازگشت به صفحه اصلی")]
-    ]
-    return ReplyKeyboardMarkup(keyboard=keyboard_rows, resize_keyboard=True)
-
-def get_user_fields_keyboard():
-    """کیبورد فیلدهای قابل ویرایش"""
-    # Build an edit keyboard using Persian labels from config.FIELD_LABELS
-    labels = []
-    for key, label in config.FIELD_LABELS.items():
-        if key in ("register_date", "file_path"):
-            continue
-        labels.append((key, label))
-
-    keyboard_rows = []
-    cols = 2
-    row = []
-    for _, label in labels:
-        row.append(KeyboardButton(text=label))
-        if len(row) >= cols:
-            keyboard_rows.append(row)
-            row = []
-    if row:
-        keyboard_rows.append(row)
-
-    # add confirm and cancel buttons similar to user edit menu
-    keyboard_rows.append([KeyboardButton(text="تایید ویرایش"), KeyboardButton(text="انصراف")])
-
-    return ReplyKeyboardMarkup(keyboard=keyboard_rows, resize_keyboard=True, one_time_keyboard=True)
-
-
-def is_valid_phone(phone: str) -> bool:
-    return re.fullmatch(r"09\d{9}", phone.strip())
+# --- توابع کمکی ---
 
 def format_resume_data(data: dict) -> str:
     """فرمت‌دهی اطلاعات رزومه برای نمایش با HTML-escaping برای جلوگیری از خطاهای parse entities."""
@@ -1342,35 +1352,94 @@ def format_resume_data(data: dict) -> str:
     return "\n".join(text_lines)
 
 
+# کش کارت‌های رزومه رندرشده برای نمایش‌های ادمین؛ معتبر تا زمانی که row_version ردیف تغییر نکند
+ResumeCard = namedtuple("ResumeCard", ["text", "is_blocked"])
+resume_card_cache = VersionedLRUCache(maxsize=config.RESUME_CARD_CACHE_SIZE)
+db.add_write_listener(lambda user_id, fields: resume_card_cache.invalidate(user_id))
+
+# PDF رزومه‌ها در پروسه‌های جدا رندر و تا تغییر row_version در کش نگه داشته می‌شوند
+resume_pdfs = resume_pdf.ResumePdfRenderer(
+    db, workers=config.PDF_RENDER_WORKERS, cache_size=config.PDF_CACHE_SIZE, font_path=config.PDF_FONT_PATH
+)
+db.add_write_listener(lambda user_id, fields: resume_pdfs.cache.invalidate(user_id))
+
+
+def get_resume_card(user_id: int):
+    """Rendered admin card of a user (None if not found), served from cache while the row is unchanged."""
+    version = db.get_row_version(user_id)
+    if version is None:
+        return None
+    card = resume_card_cache.get(user_id, version)
+    if card is None:
+        user_data = db.get_resume_data(user_id)
+        if not user_data:
+            return None
+        card = ResumeCard(format_resume_data(user_data), bool(int(user_data.get('is_blocked') or 0)))
+        resume_card_cache.put(user_id, version, card)
+    return card
+
+
 # --- توابع ادمین: نوتیفیکیشن و مشاهده ---
 
-async def notify_admin(data: dict):
-    """(مورد ۷: اعلان ثبت جدید) ارسال نوتیفیکیشن به ادمین پس از تکمیل رزومه"""
+def format_duplicate_warning(duplicates: list) -> str:
+    """متن هشدار تکراری برای اعلان ادمین؛ خروجی find_duplicates را می‌گیرد."""
+    if not duplicates:
+        return ""
+    parts = []
+    for other_id, reason, score in duplicates[:5]:
+        if reason == 'phone':
+            parts.append(f"`{other_id}` (تلفن مشترک)")
+        else:
+            parts.append(f"`{other_id}` ({int(score * 100)}٪ شباهت)")
+    return "\n⚠️ **احتمال تکراری**: " + "، ".join(parts)
+
+
+def admin_notification_message(data: dict, chat_id: int) -> dict:
+    """(مورد ۷: اعلان ثبت جدید) متن و دکمه‌های نوتیفیکیشن ادمین پس از تکمیل رزومه (رندر پیام outbox)"""
+    duplicates = data.get('duplicates')
     message_text = config.ADMIN_NOTIFICATION_TEMPLATE.format(
         full_name=data.get('full_name', 'N/A'),
         username=data.get('username', 'N/A'),
         datetime=data.get('register_date', 'N/A')
-    )
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+    ) + format_duplicate_warning(duplicates)
+
+    keyboard_rows = [
         [InlineKeyboardButton(text="مشاهده رزومه کامل", callback_data=f"view_resume_{data['user_id']}")]
+    ]
+    for other_id, _, _ in (duplicates or [])[:3]:
+        keyboard_rows.append([InlineKeyboardButton(text=f"مشاهده مورد مشابه {other_id}", callback_data=f"admin_view_{other_id}")])
+    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_rows)
+    return {'text': message_text, 'reply_markup': keyboard, 'parse_mode': ParseMode.MARKDOWN}
+
+
+def resume_confirmed_message(data: dict, chat_id: int) -> dict:
+    return {'text': config.SUCCESS_MESSAGE, 'reply_markup': get_main_keyboard(chat_id in config.ADMIN_IDS)}
+
+
+def resume_reminder_message(data: dict, chat_id: int) -> dict:
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="▶️ ادامه ساخت رزومه", callback_data="resume_application")]
     ])
-    
-    try:
-        # send to all configured admins
-        for admin_id in config.ADMIN_IDS:
-            await bot.send_message(
-                admin_id,
-                message_text,
-                reply_markup=keyboard,
-                parse_mode=ParseMode.MARKDOWN
-            )
-        db.log("ADMIN", f"Admin notification sent for user {data['user_id']} to admins: {config.ADMIN_IDS}")
-    except Exception as e:
-        db.log("ERROR", f"Failed to send admin notification: {e}")
+    return {'text': config.REMINDER_MESSAGE, 'reply_markup': keyboard}
+
 
+outbox = OutboxDispatcher(
+    db, bot,
+    renderers={
+        db.ADMIN_NOTIFICATION_KIND: admin_notification_message,
+        OUTBOX_RESUME_CONFIRMED: resume_confirmed_message,
+        OUTBOX_RESUME_REMINDER: resume_reminder_message,
+    },
+    batch_size=config.OUTBOX_BATCH_SIZE, interval=config.OUTBOX_INTERVAL_SEC, max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+)
+# یادآوری رزومه‌های نیمه‌کاره از روی ستون ایندکس‌شده next_reminder_at در outbox قرار می‌گیرند
+reminders = ReminderScheduler(
+    db, OUTBOX_RESUME_REMINDER, batch_size=config.REMINDER_BATCH_SIZE, interval=config.REMINDER_INTERVAL_SEC,
+    on_queued=outbox.wake,
+)
 
-@dp.callback_query(F.data.startswith("view_resume_"))
+
+@callback_router.route_callback(prefix="view_resume_")
 async def admin_view_resume_callback(callback: types.CallbackQuery, state: FSMContext) -> None:
     """هندلر دکمه 'مشاهده رزومه کامل' در نوتیفیکیشن"""
     if callback.from_user.id not in config.ADMIN_IDS:
@@ -1388,8 +1457,8 @@ async def admin_view_resume_callback(callback: types.CallbackQuery, state: FSMCo
             pass
     user_id = int(callback.data.split('_')[-1])
     
-    user_data = db.get_resume_data(user_id)
-    if not user_data:
+    card = get_resume_card(user_id)
+    if not card:
         await bot.send_message(callback.from_user.id, "کاربر با این آیدی پیدا نشد.", reply_markup=get_admin_main_keyboard())
         return
 
@@ -1397,16 +1466,11 @@ async def admin_view_resume_callback(callback: types.CallbackQuery, state: FSMCo
     await state.set_state(AdminStates.view_user)
     await state.update_data(target_user_id=user_id)
 
-    # determine block status from DB
-    is_blocked = bool(int(user_data.get('is_blocked') or 0)) if user_data else False
-
     # (مورد ۲: نمایش اطلاعات کامل)
-    text = format_resume_data(user_data)
-
     await bot.send_message(
         callback.from_user.id,
-        text,
-        reply_markup=get_user_actions_keyboard(user_id, is_blocked),
+        card.text,
+        reply_markup=get_user_actions_keyboard(user_id, card.is_blocked),
         parse_mode=ParseMode.HTML
     )
 
@@ -1423,28 +1487,21 @@ async def admin_view_resume_callback(callback: types.CallbackQuery, state: FSMCo
 #           ADMIN PANEL HANDLERS (موارد ۱ تا ۱۰)
 # ===============================================
 
-@dp.message(F.text == config.KEYBOARD_ADMIN_TEXTS[0])
-@dp.message(F.text == "/admin")
+@admin_router.route_message(config.KEYBOARD_ADMIN_TEXTS[0])
+@admin_router.route_message("/admin")
 async def admin_panel_handler(message: types.Message, state: FSMContext) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
     await state.clear()
-    # build main keyboard and update toggle label dynamically
+    # the toggle button label reflects the current per-admin setting
     show_deleted = admin_show_deleted.get(message.from_user.id, False)
-    kb = get_admin_main_keyboard()
-    # update the toggle button text to reflect current state
-    toggle_text = "🔁 نمایش حذف‌شده‌ها: روشن" if show_deleted else "🔁 نمایش حذف‌شده‌ها: خاموش"
-    # replace second-to-last row first button
-    try:
-        kb.keyboard[-1][0] = KeyboardButton(text=toggle_text)
-    except Exception:
-        pass
+    kb = get_admin_main_keyboard(show_deleted)
     await message.answer("**⚙️ پنل مدیریت ربات**\n"
                          "لطفاً گزینه مورد نظر خود را انتخاب کنید.",
                          reply_markup=kb)
 
 
-@dp.message(F.text == "🔁 نمایش حذف‌شده‌ها")
+@admin_router.route_message(prefix=ADMIN_TOGGLE_DELETED_LABEL)
 async def admin_toggle_show_deleted(message: types.Message, state: FSMContext) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -1455,29 +1512,17 @@ async def admin_toggle_show_deleted(message: types.Message, state: FSMContext) -
     await admin_panel_handler(message, state)
 
 
-@dp.message(F.text == "📋 لیست کاربران")
-async def admin_list_users_handler(message: types.Message, state: FSMContext) -> None:
-    """Show paginated list of users (16 per page: 2 columns x 8 rows)."""
-    if message.from_user.id not in config.ADMIN_IDS:
-        return
-
-    # first page
-    limit = 16
-    offset = 0
-    # respect per-admin show_deleted toggle
-    show_deleted = admin_show_deleted.get(message.from_user.id, False)
-    rows, total = db.search_resumes(term="", limit=limit, offset=offset, filters={'_include_deleted': show_deleted})
-
-    if not rows:
-        await message.answer("هیچ کاربری برای نمایش وجود ندارد.", reply_markup=get_admin_main_keyboard())
-        return
-
-    # build inline keyboard with 2 columns
+def build_user_list_keyboard(rows, offset: int, limit: int, total: int, selected: set = None) -> InlineKeyboardMarkup:
+    """کیبورد صفحه‌ای لیست کاربران (۲ ستون)؛ با selected در حالت انتخاب گروهی است."""
     kb_rows = []
     row = []
     for uid, full_name, username, reg in rows:
         label = f"{full_name} | @{username}" if username else f"{full_name} | {uid}"
-        row.append(InlineKeyboardButton(text=label, callback_data=f"admin_view_{uid}"))
+        if selected is None:
+            row.append(InlineKeyboardButton(text=label, callback_data=f"admin_view_{uid}"))
+        else:
+            mark = "✅" if uid in selected else "⬜️"
+            row.append(InlineKeyboardButton(text=f"{mark} {label}", callback_data=f"admin_pick_{uid}"))
         if len(row) >= 2:
             kb_rows.append(row)
             row = []
@@ -1492,26 +1537,73 @@ async def admin_list_users_handler(message: types.Message, state: FSMContext) ->
     if nav_row:
         kb_rows.append(nav_row)
 
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_rows)
+    if selected is None:
+        kb_rows.append([InlineKeyboardButton(text="☑️ انتخاب گروهی", callback_data="admin_bulk_mode")])
+    else:
+        kb_rows.append([
+            InlineKeyboardButton(text=f"همه نتایج ({total})", callback_data="admin_bulk_all"),
+            InlineKeyboardButton(text=f"پاک کردن انتخاب ({len(selected)})", callback_data="admin_bulk_clear"),
+        ])
+        kb_rows.append([
+            InlineKeyboardButton(text="🚫 بلاک", callback_data="admin_bulk_do_block"),
+            InlineKeyboardButton(text="✅ آنبلاک", callback_data="admin_bulk_do_unblock"),
+        ])
+        kb_rows.append([
+            InlineKeyboardButton(text="🗑️ حذف", callback_data="admin_bulk_do_soft_delete"),
+            InlineKeyboardButton(text="♻️ بازیابی", callback_data="admin_bulk_do_restore"),
+        ])
+        kb_rows.append([
+            InlineKeyboardButton(text="📤 اکسل انتخاب‌شده‌ها", callback_data="admin_bulk_export"),
+            InlineKeyboardButton(text="📄 PDF انتخاب‌شده‌ها (ZIP)", callback_data="admin_bulk_pdf"),
+        ])
+        kb_rows.append([InlineKeyboardButton(text="↩️ پایان انتخاب", callback_data="admin_bulk_exit")])
+    return InlineKeyboardMarkup(inline_keyboard=kb_rows)
+
+
+def _bulk_selection(data: dict):
+    # None یعنی حالت انتخاب گروهی خاموش است
+    selected = data.get('admin_bulk_selected')
+    return None if selected is None else set(selected)
+
+
+@admin_router.route_message("📋 لیست کاربران")
+async def admin_list_users_handler(message: types.Message, state: FSMContext) -> None:
+    """Show paginated list of users (16 per page: 2 columns x 8 rows)."""
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
+
+    # first page
+    limit = 16
+    offset = 0
+    # respect per-admin show_deleted toggle
+    show_deleted = admin_show_deleted.get(message.from_user.id, False)
+    rows, total = db.search_resumes(term="", limit=limit, offset=offset, filters={'_include_deleted': show_deleted})
+
+    if not rows:
+        await message.answer("هیچ کاربری برای نمایش وجود ندارد.", reply_markup=get_admin_main_keyboard())
+        return
+
+    keyboard = build_user_list_keyboard(rows, offset, limit, total)
 
     # store pagination state
     await state.set_state(AdminStates.list_users)
-    await state.update_data(admin_list_offset=offset, admin_list_limit=limit, admin_list_total=total)
+    await state.update_data(admin_list_offset=offset, admin_list_limit=limit, admin_list_total=total,
+                            admin_bulk_selected=None)
 
     await message.answer(f"نمایش کاربران ({min(offset+1, total)} - {min(offset+limit, total)} از {total}):", reply_markup=None)
     await message.answer("لطفاً روی یک کاربر کلیک کنید تا مشخصات وی نمایش داده شود.", reply_markup=keyboard)
 
 # --- بازگشت به منوی اصلی ---
-@dp.message(F.text == "🏠 منوی اصلی")
+@admin_router.route_message("🏠 منوی اصلی")
 async def admin_back_to_main_user(message: types.Message, state: FSMContext) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
     await state.clear()
     await message.answer("بازگشت به منوی اصلی کاربر.", reply_markup=get_main_keyboard(True))
 
-@dp.message(F.text == "🔙 بازگشت به جستجو", AdminStates.view_user)
-@dp.message(F.text == "🔙 بازگشت به کاربر", AdminStates.edit_select_field)
-@dp.message(F.text == "🔙 بازگشت به کاربر", AdminStates.edit_enter_value)
+@admin_router.route_message("🔙 بازگشت به جستجو", state=AdminStates.view_user)
+@admin_router.route_message("🔙 بازگشت به کاربر", state=AdminStates.edit_select_field)
+@admin_router.route_message("🔙 بازگشت به کاربر", state=AdminStates.edit_enter_value)
 async def admin_back_to_search(message: types.Message, state: FSMContext) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -1519,7 +1611,7 @@ async def admin_back_to_search(message: types.Message, state: FSMContext) -> Non
     await message.answer("لطفاً عبارت جستجوی جدید را وارد کنید.", reply_markup=types.ReplyKeyboardRemove())
 
 
-@dp.message(F.text == "بازگشت", AdminStates.search_user)
+@admin_router.route_message("بازگشت", state=AdminStates.search_user)
 async def admin_cancel_search(message: types.Message, state: FSMContext) -> None:
     """Handler for admin pressing 'بازگشت' while in search state: return to admin main menu."""
     if message.from_user.id not in config.ADMIN_IDS:
@@ -1528,7 +1620,7 @@ async def admin_cancel_search(message: types.Message, state: FSMContext) -> None
     await message.answer("بازگشت به منوی مدیریت.", reply_markup=get_admin_main_keyboard())
 
 
-@dp.message(F.text == "بازگشت به صفحه اصلی", AdminStates.view_user)
+@admin_router.route_message("بازگشت به صفحه اصلی", state=AdminStates.view_user)
 async def admin_return_main_from_view(message: types.Message, state: FSMContext) -> None:
     """Allow admin to return to admin main keyboard from a user view."""
     if message.from_user.id not in config.ADMIN_IDS:
@@ -1538,17 +1630,16 @@ async def admin_return_main_from_view(message: types.Message, state: FSMContext)
 
 
 # --- 1. جستجوی کاربر ---
-@dp.message(F.text == "🔎 جستجوی کاربر")
+@admin_router.route_message("🔎 جستجوی کاربر")
 async def admin_start_search(message: types.Message, state: FSMContext) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
     await state.clear()
     await state.set_state(AdminStates.search_user)
     # Provide a simple reply keyboard with a cancel/back option so admin can abort search
-    back_kb = ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="بازگشت")]], resize_keyboard=True, one_time_keyboard=True)
-    await message.answer("لطفاً نام کامل، بخشی از نام یا یوزرنیم کاربر را وارد کنید:", reply_markup=back_kb)
+    await message.answer("لطفاً نام کامل، بخشی از نام یا یوزرنیم کاربر را وارد کنید:", reply_markup=get_search_back_keyboard())
 
-@dp.message(AdminStates.search_user)
+@admin_router.route_message(state=AdminStates.search_user)
 async def admin_process_search(message: types.Message, state: FSMContext) -> None:
     term = message.text
     results = db.get_user_by_search_term(term) # نیاز به پیاده‌سازی در database.py
@@ -1560,14 +1651,14 @@ async def admin_process_search(message: types.Message, state: FSMContext) -> Non
     if len(results) == 1:
         # اگر فقط یک نتیجه باشد، مستقیم به نمایش اطلاعات می‌رویم
         user_id = results[0][0]
-        user_data = db.get_resume_data(user_id)
+        card = get_resume_card(user_id)
         
         await state.set_state(AdminStates.view_user)
         await state.update_data(target_user_id=user_id)
         
         await message.answer(
-            format_resume_data(user_data),
-            reply_markup=get_user_actions_keyboard(user_id, False), # فرض بر آنبلاک بودن
+            card.text,
+            reply_markup=get_user_actions_keyboard(user_id, card.is_blocked),
             parse_mode=ParseMode.HTML
         )
     else:
@@ -1582,7 +1673,7 @@ async def admin_process_search(message: types.Message, state: FSMContext) -> Non
 # bot.py (فقط هندلر ادمین مربوط به اکسل)
 
 # --- 3. دریافت اکسل ---
-@dp.message(F.text == "📤 دریافت اکسل")
+@admin_router.route_message("📤 دریافت اکسل")
 async def admin_export_excel(message: types.Message) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -1590,7 +1681,11 @@ async def admin_export_excel(message: types.Message) -> None:
     await message.answer("درحال ساخت فایل اکسل. لطفاً منتظر بمانید...")
     
     success, file_path = db.export_to_excel() # فراخوانی تابع اصلاح شده در database.py
-    
+    await send_excel_export(message.from_user.id, success, file_path, "✅ فایل اکسل بروز شده‌ی رزومه‌ها")
+
+
+async def send_excel_export(chat_id: int, success: bool, file_path: str, caption: str) -> None:
+    """ارسال خروجی export_to_excel به ادمین و پاک کردن فایل موقت."""
     if success:
         # First attempt to send the file. Only treat this as a send-failure
         # if the send itself raises an exception. Cleanup (file removal)
@@ -1598,16 +1693,16 @@ async def admin_export_excel(message: types.Message) -> None:
         # mistakenly report a send error to the admin.
         try:
             await bot.send_document(
-                message.from_user.id,
-                FSInputFile(file_path),
-                caption="✅ فایل اکسل بروز شده‌ی رزومه‌ها"
+                chat_id,
+                local_api.input_file(bot, file_path),
+                caption=caption
             )
             db.log("ADMIN", f"Admin exported Excel file and send succeeded.")
         except Exception as e:
             db.log("ERROR", f"Failed to send Excel file: {e}")
             # Provide the admin a helpful message but include the path so they
             # can retrieve it manually if needed.
-            await message.answer(f"❌ فایل اکسل ساخته شد، اما ارسال آن با خطا مواجه شد. مسیر فایل: {file_path}")
+            await bot.send_message(chat_id, f"❌ فایل اکسل ساخته شد، اما ارسال آن با خطا مواجه شد. مسیر فایل: {file_path}")
         else:
             # Try to remove the temporary file; log but do not surface
             # filesystem errors to the admin as send was successful.
@@ -1618,9 +1713,9 @@ async def admin_export_excel(message: types.Message) -> None:
             except Exception as e:
                 db.log("ERROR", f"Failed to remove temporary excel file {file_path}: {e}")
     else:
-        await message.answer(f"❌ خطای اکسپورت: {file_path}")
+        await bot.send_message(chat_id, f"❌ خطای اکسپورت: {file_path}")
 
-@dp.message(F.text == "📥 پشتیبان‌گیری")
+@admin_router.route_message("📥 پشتیبان‌گیری")
 async def admin_backup(message: types.Message) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -1631,7 +1726,7 @@ async def admin_backup(message: types.Message) -> None:
     try:
         await bot.send_document(
             message.from_user.id,
-            FSInputFile(config.DATABASE_NAME),
+            local_api.input_file(bot, config.DATABASE_NAME),
             caption="بکاپ فایل دیتابیس"
         )
         db.log("ADMIN", f"Admin requested database backup.")
@@ -1642,7 +1737,7 @@ async def admin_backup(message: types.Message) -> None:
     try:
         await bot.send_document(
             message.from_user.id,
-            FSInputFile(config.LOG_FILE),
+            local_api.input_file(bot, config.LOG_FILE),
             caption="بکاپ فایل لاگ"
         )
         db.log("ADMIN", f"Admin requested log file backup.")
@@ -1654,7 +1749,7 @@ async def admin_backup(message: types.Message) -> None:
 
 
 # --- 4. آمار کلی ---
-@dp.message(F.text == "📊 آمار کلی")
+@admin_router.route_message("📊 آمار کلی")
 async def admin_get_stats(message: types.Message) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -1668,10 +1763,80 @@ async def admin_get_stats(message: types.Message) -> None:
         f"**تعداد کل رزومه‌ها**: {total_users}\n"
         f"**تعداد رزومه‌های امروز**: {today_users}\n"
         f"---"
+        f"**آپدیت‌های ردشده**: کاربر بلاک {anti_abuse.dropped['blocked']}، "
+        f"ارسال پشت‌سرهم {anti_abuse.dropped['flood']}، آپلود پشت‌سرهم {anti_abuse.dropped['upload_flood']}\n"
     )
 
+# --- رتبه‌بندی: برترین متقاضیان هر جایگاه ---
+TOP_ALL_POSITIONS_LABEL = "همه جایگاه‌ها"
+
+
+@admin_router.route_message("🏆 برترین متقاضیان")
+async def admin_top_candidates_start(message: types.Message, state: FSMContext) -> None:
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
+    await state.set_state(AdminStates.top_select_position)
+    kb = create_reply_keyboard(config.KEYBOARD_JOB_POSITION_TEXTS + [TOP_ALL_POSITIONS_LABEL, "بازگشت"], one_time=True)
+    await message.answer("جایگاه شغلی موردنظر را برای نمایش برترین متقاضیان انتخاب کنید:", reply_markup=kb)
+
+
+@admin_router.route_message(state=AdminStates.top_select_position)
+async def admin_top_candidates_show(message: types.Message, state: FSMContext) -> None:
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
+    text = (message.text or "").strip()
+    if text == "بازگشت":
+        await state.clear()
+        await message.answer("بازگشت به منوی مدیریت.", reply_markup=get_admin_main_keyboard())
+        return
+    if text != TOP_ALL_POSITIONS_LABEL and text not in config.KEYBOARD_JOB_POSITION_TEXTS:
+        await message.answer("لطفاً یکی از جایگاه‌های نمایش‌داده‌شده را انتخاب کنید.")
+        return
+
+    position = None if text == TOP_ALL_POSITIONS_LABEL else text
+    rows = db.get_top_candidates(position, limit=config.TOP_CANDIDATES_LIMIT)
+    await state.clear()
+    if not rows:
+        await message.answer("متقاضی‌ای برای این جایگاه ثبت نشده است.", reply_markup=get_admin_main_keyboard())
+        return
+
+    kb_rows = []
+    for rank, (uid, full_name, username, job_position, score) in enumerate(rows, start=1):
+        label = f"{rank}. {full_name or uid} | {score or 0:g}"
+        kb_rows.append([InlineKeyboardButton(text=label, callback_data=f"admin_view_{uid}")])
+    await message.answer(f"🏆 برترین متقاضیان ({text}):", reply_markup=get_admin_main_keyboard())
+    await message.answer("برای مشاهده رزومه روی نام متقاضی بزنید.", reply_markup=InlineKeyboardMarkup(inline_keyboard=kb_rows))
+
+
+# --- بررسی دسته‌ای متقاضیان تکراری ---
+@admin_router.route_message("👥 بررسی تکراری‌ها")
+async def admin_duplicate_sweep(message: types.Message) -> None:
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
+
+    clusters = db.sweep_duplicates()
+    if not clusters:
+        await message.answer("✅ مورد تکراری محتملی پیدا نشد.")
+        return
+
+    lines = []
+    for i, cluster in enumerate(clusters, start=1):
+        lines.append(f"{i}. " + "، ".join(str(uid) for uid in cluster))
+    report = "گروه‌های متقاضیان احتمالاً تکراری (آیدی‌های عددی):\n\n" + "\n".join(lines)
+
+    if len(report) <= 3500:
+        await message.answer(report, parse_mode=None)
+    else:
+        report_path = "temp_duplicates.txt"
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(report)
+        await bot.send_document(message.from_user.id, FSInputFile(report_path), caption=f"👥 {len(clusters)} گروه تکراری محتمل")
+        os.remove(report_path)
+    db.log("ADMIN", f"Admin {message.from_user.id} ran duplicate sweep: {len(clusters)} clusters.")
+
+
 # --- 10. لاگ فعالیت‌ها ---
-@dp.message(F.text == "📄 مشاهده لاگ")
+@admin_router.route_message("📄 مشاهده لاگ")
 async def admin_view_logs(message: types.Message) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -1698,8 +1863,83 @@ async def admin_view_logs(message: types.Message) -> None:
     db.log("ADMIN", f"Admin viewed logs.")
 
 
+# --- پایش عملکرد ---
+def format_metrics_report(limit: int = 5) -> str:
+    """خلاصه فشرده متریک‌ها برای پنل ادمین (HTML)"""
+    metrics.collect()
+
+    def rows(name, label):
+        lines = []
+        for labels, count, p50, p95, p99 in metrics.summary_rows(name)[:limit]:
+            lines.append(
+                f"<code>{html.escape(str(labels.get(label)))}</code>: "
+                f"{p50 * 1000:.1f}/{p95 * 1000:.1f}/{p99 * 1000:.1f} ms ({count})"
+            )
+        return "\n".join(lines) or "—"
+
+    lag = metrics.gauges.get(("bot_event_loop_lag_last_seconds", ()), 0.0)
+    dropped = anti_abuse.dropped
+    return (
+        "<b>📈 عملکرد ربات</b> (p50/p95/p99، تعداد)\n\n"
+        f"<b>⏱ کندترین هندلرها:</b>\n{rows('bot_handler_seconds', 'handler')}\n\n"
+        f"<b>🗄 کندترین متدهای دیتابیس:</b>\n{rows('bot_db_seconds', 'method')}\n\n"
+        f"<b>📡 API تلگرام:</b>\n{rows('bot_api_seconds', 'method')}\n"
+        f"خطاهای API: {int(metrics.counter_total('bot_api_errors_total'))}، "
+        f"خطاهای هندلر: {int(metrics.counter_total('bot_handler_errors_total'))}\n\n"
+        f"<b>🔀 تغییر وضعیت FSM:</b> {int(metrics.counter_total('bot_fsm_transitions_total'))}\n"
+        f"<b>🌀 تأخیر event loop:</b> {lag * 1000:.1f} ms\n"
+        f"<b>🚫 آپدیت‌های ردشده:</b> بلاک {dropped['blocked']}، پشت‌سرهم {dropped['flood']}، آپلود {dropped['upload_flood']}"
+    )
+
+
+@admin_router.route_message("📈 عملکرد")
+async def admin_performance(message: types.Message) -> None:
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
+    await message.answer(format_metrics_report(), parse_mode=ParseMode.HTML)
+
+
+async def send_profile(chat_id: int, seconds: int) -> None:
+    """پروفایل نمونه‌برداری به مدت seconds ثانیه و ارسال خروجی collapsed-stack به‌صورت فایل"""
+    try:
+        stacks = await asyncio.to_thread(profiler.run, seconds)
+    except RuntimeError:
+        await bot.send_message(chat_id, "پروفایلر در حال حاضر در حال اجراست.")
+        return
+    profile_path = f"temp_profile_{chat_id}.txt"
+    with open(profile_path, "w", encoding="utf-8") as f:
+        f.write(format_collapsed(stacks))
+    try:
+        await bot.send_document(
+            chat_id,
+            FSInputFile(profile_path, filename="profile.collapsed.txt"),
+            caption=f"پروفایل {seconds} ثانیه‌ای ربات (فرمت collapsed-stack؛ قابل نمایش با speedscope یا flamegraph.pl)",
+            parse_mode=None,
+        )
+    finally:
+        os.remove(profile_path) # حذف فایل موقت
+    db.log("ADMIN", f"Sampling profile ({seconds}s) sent to {chat_id}.")
+
+
+@admin_router.route_message(prefix="/profile")
+async def admin_profile(message: types.Message) -> None:
+    """/profile [ثانیه]: اجرای پروفایلر نمونه‌برداری و ارسال نتیجه"""
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
+    parts = message.text.split()
+    seconds = config.PROFILE_DEFAULT_SECONDS
+    if len(parts) > 1 and parts[1].isdigit():
+        seconds = max(1, min(int(parts[1]), config.PROFILE_MAX_SECONDS))
+    if profiler.running:
+        await message.answer("پروفایلر در حال حاضر در حال اجراست.")
+        return
+    await message.answer(f"⏳ پروفایل {seconds} ثانیه‌ای شروع شد؛ نتیجه به‌صورت فایل ارسال می‌شود.")
+    # در پس‌زمینه اجرا می‌شود تا هندلر (و watchdog کندی) منتظر آن نماند
+    run_in_background(send_profile(message.from_user.id, seconds))
+
+
 # --- 6. ویرایش اطلاعات ---
-@dp.message(F.text == "✏️ ویرایش اطلاعات", AdminStates.view_user)
+@admin_router.route_message("✏️ ویرایش اطلاعات", state=AdminStates.view_user)
 async def admin_start_edit(message: types.Message, state: FSMContext) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -1710,7 +1950,7 @@ async def admin_start_edit(message: types.Message, state: FSMContext) -> None:
         reply_markup=get_user_fields_keyboard()
     )
 
-@dp.message(AdminStates.edit_select_field)
+@admin_router.route_message(state=AdminStates.edit_select_field)
 async def admin_select_field_to_edit(message: types.Message, state: FSMContext) -> None:
     """Handle admin selection in the edit-fields menu.
 
@@ -1741,13 +1981,7 @@ async def admin_select_field_to_edit(message: types.Message, state: FSMContext)
         await message.answer("تغییرات ذخیره شد.", reply_markup=get_user_actions_keyboard(user_id, is_blocked))
         return
 
-    # Map Persian label back to internal field key
-    selected_key = None
-    for key, label in config.FIELD_LABELS.items():
-        if label == text:
-            selected_key = key
-            break
-
+    selected_key = FIELD_KEY_BY_LABEL.get(text)
     if not selected_key:
         await message.answer("فیلد نامعتبر. لطفاً یکی از فیلدهای نمایش‌داده‌شده را انتخاب کنید.")
         return
@@ -1760,7 +1994,7 @@ async def admin_select_field_to_edit(message: types.Message, state: FSMContext)
     )
 
 
-@dp.message(AdminStates.edit_enter_value)
+@admin_router.route_message(state=AdminStates.edit_enter_value)
 async def admin_enter_new_value(message: types.Message, state: FSMContext) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -1795,14 +2029,14 @@ async def admin_enter_new_value(message: types.Message, state: FSMContext) -> No
     else:
         await message.answer("❌ خطا در به‌روزرسانی دیتابیس.")
         # on failure, go back to view
-        user_data = db.get_resume_data(user_id)
-        is_blocked = bool(int(user_data.get('is_blocked') or 0)) if user_data else False
+        card = get_resume_card(user_id)
         await state.set_state(AdminStates.view_user)
         await state.update_data(target_user_id=user_id)
-        await message.answer(format_resume_data(user_data), reply_markup=get_user_actions_keyboard(user_id, is_blocked), parse_mode=ParseMode.HTML)
+        if card:
+            await message.answer(card.text, reply_markup=get_user_actions_keyboard(user_id, card.is_blocked), parse_mode=ParseMode.HTML)
 
 
-@dp.message(F.text == "📂 دریافت نمونه کار", AdminStates.view_user)
+@admin_router.route_message("📂 دریافت نمونه کار", state=AdminStates.view_user)
 async def admin_get_work_samples(message: types.Message, state: FSMContext) -> None:
     """هندلر برای ارسال نمونه کارهای کاربر به ادمین."""
     if message.from_user.id not in config.ADMIN_IDS:
@@ -1833,7 +2067,7 @@ async def admin_get_work_samples(message: types.Message, state: FSMContext) -> N
         for path in file_paths:
             if os.path.exists(path):
                 try:
-                    await bot.send_document(message.from_user.id, FSInputFile(path))
+                    await bot.send_document(message.from_user.id, local_api.input_file(bot, path))
                     sent_count += 1
                 except Exception as e:
                     await message.answer(f"خطا در ارسال فایل: `{path}`\n`{e}`")
@@ -1844,25 +2078,50 @@ async def admin_get_work_samples(message: types.Message, state: FSMContext) -> N
 
     await message.answer("برای بازگشت، دکمه زیر را بزنید.", reply_markup=get_user_actions_keyboard(user_id, bool(user_data.get('is_blocked', 0))))
 
-@dp.callback_query(F.data.startswith("admin_view_"))
+@admin_router.route_message("📄 PDF", state=AdminStates.view_user)
+async def admin_get_resume_pdf(message: types.Message, state: FSMContext) -> None:
+    """ارسال رزومه کاربر به صورت PDF برای ادمین (از کش تا وقتی رزومه تغییر نکرده)."""
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
+    user_id = (await state.get_data()).get('target_user_id')
+    if not user_id:
+        await message.answer("خطای سیستمی: آیدی کاربر یافت نشد. لطفاً دوباره جستجو کنید.", reply_markup=get_admin_main_keyboard())
+        await state.clear()
+        return
+    problem = resume_pdf.missing_dependency()
+    if problem:
+        await message.answer(f"❌ ساخت PDF ممکن نیست: {problem}", parse_mode=None)
+        return
+    try:
+        pdf = await resume_pdfs.render(user_id)
+    except Exception as e:
+        db.log("ERROR", f"Resume PDF render failed for user {user_id}: {e}")
+        await message.answer(f"❌ خطا در ساخت PDF: {e}", parse_mode=None)
+        return
+    if pdf is None:
+        await message.answer("کاربر پیدا نشد.")
+        return
+    await bot.send_document(message.from_user.id, BufferedInputFile(pdf, filename=f"resume_{user_id}.pdf"))
+
+
+@callback_router.route_callback(prefix="admin_view_")
 async def admin_search_view_callback(callback: types.CallbackQuery, state: FSMContext) -> None:
     if callback.from_user.id not in config.ADMIN_IDS:
         await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
         return
     await callback.answer()
     user_id = int(callback.data.split('_')[-1])
-    user_data = db.get_resume_data(user_id)
-    if not user_data:
+    card = get_resume_card(user_id)
+    if not card:
         await callback.message.answer("کاربر با این آیدی پیدا نشد.")
         return
 
     await state.set_state(AdminStates.view_user)
     await state.update_data(target_user_id=user_id)
-    is_blocked = bool(int(user_data.get('is_blocked') or 0)) if user_data else False
-    await callback.message.answer(format_resume_data(user_data), reply_markup=get_user_actions_keyboard(user_id, is_blocked), parse_mode=ParseMode.HTML)
+    await callback.message.answer(card.text, reply_markup=get_user_actions_keyboard(user_id, card.is_blocked), parse_mode=ParseMode.HTML)
 
 
-@dp.callback_query(F.data == "admin_search_next" )
+@callback_router.route_callback("admin_search_next")
 async def admin_search_next(callback: types.CallbackQuery, state: FSMContext) -> None:
     if callback.from_user.id not in config.ADMIN_IDS:
         await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
@@ -1899,7 +2158,7 @@ async def admin_search_next(callback: types.CallbackQuery, state: FSMContext) ->
         await callback.message.answer(f"نتایج جستجو ({new_offset+1}-{min(new_offset+limit, total)} از {total}):", reply_markup=keyboard)
 
 
-@dp.callback_query(F.data == "admin_list_next")
+@callback_router.route_callback("admin_list_next")
 async def admin_list_next(callback: types.CallbackQuery, state: FSMContext) -> None:
     if callback.from_user.id not in config.ADMIN_IDS:
         await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
@@ -1915,26 +2174,7 @@ async def admin_list_next(callback: types.CallbackQuery, state: FSMContext) -> N
     # update state
     await state.update_data(admin_list_offset=new_offset, admin_list_total=total)
 
-    kb_rows = []
-    row = []
-    for uid, full_name, username, reg in rows:
-        label = f"{full_name} | @{username}" if username else f"{full_name} | {uid}"
-        row.append(InlineKeyboardButton(text=label, callback_data=f"admin_view_{uid}"))
-        if len(row) >= 2:
-            kb_rows.append(row)
-            row = []
-    if row:
-        kb_rows.append(row)
-
-    nav_row = []
-    if new_offset > 0:
-        nav_row.append(InlineKeyboardButton(text="⟨ قبلی", callback_data="admin_list_prev"))
-    if new_offset + limit < total:
-        nav_row.append(InlineKeyboardButton(text="بعدی ⟩", callback_data="admin_list_next"))
-    if nav_row:
-        kb_rows.append(nav_row)
-
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_rows)
+    keyboard = build_user_list_keyboard(rows, new_offset, limit, total, _bulk_selection(data))
     try:
         await callback.message.edit_text(f"نمایش کاربران ({new_offset+1}-{min(new_offset+limit, total)} از {total}):")
         await callback.message.edit_reply_markup(reply_markup=keyboard)
@@ -1942,7 +2182,7 @@ async def admin_list_next(callback: types.CallbackQuery, state: FSMContext) -> N
         await callback.message.answer(f"نمایش کاربران ({new_offset+1}-{min(new_offset+limit, total)} از {total}):", reply_markup=keyboard)
 
 
-@dp.callback_query(F.data == "admin_list_prev")
+@callback_router.route_callback("admin_list_prev")
 async def admin_list_prev(callback: types.CallbackQuery, state: FSMContext) -> None:
     if callback.from_user.id not in config.ADMIN_IDS:
         await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
@@ -1957,26 +2197,7 @@ async def admin_list_prev(callback: types.CallbackQuery, state: FSMContext) -> N
     rows, total = db.search_resumes(term="", limit=limit, offset=new_offset, filters={'_include_deleted': show_deleted})
     await state.update_data(admin_list_offset=new_offset, admin_list_total=total)
 
-    kb_rows = []
-    row = []
-    for uid, full_name, username, reg in rows:
-        label = f"{full_name} | @{username}" if username else f"{full_name} | {uid}"
-        row.append(InlineKeyboardButton(text=label, callback_data=f"admin_view_{uid}"))
-        if len(row) >= 2:
-            kb_rows.append(row)
-            row = []
-    if row:
-        kb_rows.append(row)
-
-    nav_row = []
-    if new_offset > 0:
-        nav_row.append(InlineKeyboardButton(text="⟨ قبلی", callback_data="admin_list_prev"))
-    if new_offset + limit < total:
-        nav_row.append(InlineKeyboardButton(text="بعدی ⟩", callback_data="admin_list_next"))
-    if nav_row:
-        kb_rows.append(nav_row)
-
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_rows)
+    keyboard = build_user_list_keyboard(rows, new_offset, limit, total, _bulk_selection(data))
     try:
         await callback.message.edit_text(f"نمایش کاربران ({new_offset+1}-{min(new_offset+limit, total)} از {total}):")
         await callback.message.edit_reply_markup(reply_markup=keyboard)
@@ -1984,7 +2205,165 @@ async def admin_list_prev(callback: types.CallbackQuery, state: FSMContext) -> N
         await callback.message.answer(f"نمایش کاربران ({new_offset+1}-{min(new_offset+limit, total)} از {total}):", reply_markup=keyboard)
 
 
-@dp.callback_query(F.data == "admin_search_prev" )
+# --- عملیات گروهی روی لیست کاربران ---
+BULK_ACTION_LABELS = MappingProxyType({
+    'block': "بلاک",
+    'unblock': "آنبلاک",
+    'soft_delete': "حذف (soft-delete)",
+    'restore': "بازیابی",
+})
+
+
+async def refresh_user_list(callback: types.CallbackQuery, state: FSMContext) -> None:
+    """Redraw the current page of the user list after the selection changed."""
+    data = await state.get_data()
+    offset = data.get('admin_list_offset', 0)
+    limit = data.get('admin_list_limit', 16)
+    show_deleted = admin_show_deleted.get(callback.from_user.id, False)
+    rows, total = db.search_resumes(term="", limit=limit, offset=offset, filters={'_include_deleted': show_deleted})
+    keyboard = build_user_list_keyboard(rows, offset, limit, total, _bulk_selection(data))
+    try:
+        await callback.message.edit_reply_markup(reply_markup=keyboard)
+    except Exception:
+        await callback.message.answer("لیست کاربران:", reply_markup=keyboard)
+
+
+@callback_router.route_callback(data=["admin_bulk_mode", "admin_bulk_clear", "admin_bulk_exit", "admin_bulk_all"])
+async def admin_bulk_selection(callback: types.CallbackQuery, state: FSMContext) -> None:
+    if callback.from_user.id not in config.ADMIN_IDS:
+        await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
+        return
+    if callback.data == "admin_bulk_exit":
+        selected = None
+    elif callback.data == "admin_bulk_all":
+        # همه کاربران فیلتر فعلی، نه فقط صفحه جاری
+        show_deleted = admin_show_deleted.get(callback.from_user.id, False)
+        selected = db.search_user_ids("", filters={'_include_deleted': show_deleted})
+    else:
+        selected = []
+    await callback.answer(f"{len(selected)} کاربر انتخاب شد." if callback.data == "admin_bulk_all" else None)
+    await state.update_data(admin_bulk_selected=selected)
+    await refresh_user_list(callback, state)
+
+
+@callback_router.route_callback(prefix="admin_pick_")
+async def admin_bulk_pick(callback: types.CallbackQuery, state: FSMContext) -> None:
+    if callback.from_user.id not in config.ADMIN_IDS:
+        await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
+        return
+    await callback.answer()
+    user_id = int(callback.data[len("admin_pick_"):])
+    selected = _bulk_selection(await state.get_data())
+    if selected is None:
+        selected = set()
+    selected ^= {user_id}
+    await state.update_data(admin_bulk_selected=sorted(selected))
+    await refresh_user_list(callback, state)
+
+
+@callback_router.route_callback(prefix="admin_bulk_do_")
+async def admin_bulk_ask(callback: types.CallbackQuery, state: FSMContext) -> None:
+    if callback.from_user.id not in config.ADMIN_IDS:
+        await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
+        return
+    action = callback.data[len("admin_bulk_do_"):]
+    selected = _bulk_selection(await state.get_data())
+    if action not in BULK_ACTION_LABELS:
+        await callback.answer()
+        return
+    if not selected:
+        await callback.answer("هیچ کاربری انتخاب نشده است.", show_alert=True)
+        return
+    await callback.answer()
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="✅ تایید", callback_data=f"admin_bulk_yes_{action}"),
+        InlineKeyboardButton(text="لغو", callback_data="admin_bulk_no"),
+    ]])
+    await callback.message.answer(
+        f"⚠️ عملیات «{BULK_ACTION_LABELS[action]}» روی {len(selected)} کاربر انجام شود؟",
+        reply_markup=keyboard
+    )
+
+
+@callback_router.route_callback("admin_bulk_no")
+async def admin_bulk_cancel(callback: types.CallbackQuery, state: FSMContext) -> None:
+    await callback.answer()
+    try:
+        await callback.message.edit_text("عملیات گروهی لغو شد.")
+    except Exception:
+        pass
+
+
+@callback_router.route_callback(prefix="admin_bulk_yes_")
+async def admin_bulk_apply(callback: types.CallbackQuery, state: FSMContext) -> None:
+    if callback.from_user.id not in config.ADMIN_IDS:
+        await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
+        return
+    await callback.answer()
+    action = callback.data[len("admin_bulk_yes_"):]
+    selected = _bulk_selection(await state.get_data())
+    if action not in BULK_ACTION_LABELS or not selected:
+        return
+    # یک تراکنش برای همه کاربران؛ ردیف‌هایی که از قبل در همان وضعیت بوده‌اند تغییر نمی‌کنند
+    changed = db.bulk_update_users(sorted(selected), action, callback.from_user.id)
+    if changed is None:
+        text = f"❌ خطا در انجام عملیات «{BULK_ACTION_LABELS[action]}». هیچ تغییری اعمال نشد."
+    else:
+        text = (f"✅ عملیات «{BULK_ACTION_LABELS[action]}» روی {len(changed)} کاربر انجام شد"
+                f" ({len(selected) - len(changed)} کاربر از قبل در همین وضعیت بودند).")
+        await state.update_data(admin_bulk_selected=[])
+    try:
+        await callback.message.edit_text(text)
+    except Exception:
+        await callback.message.answer(text)
+
+
+@callback_router.route_callback("admin_bulk_export")
+async def admin_bulk_export(callback: types.CallbackQuery, state: FSMContext) -> None:
+    if callback.from_user.id not in config.ADMIN_IDS:
+        await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
+        return
+    selected = _bulk_selection(await state.get_data())
+    if not selected:
+        await callback.answer("هیچ کاربری انتخاب نشده است.", show_alert=True)
+        return
+    await callback.answer()
+    await callback.message.answer(f"درحال ساخت فایل اکسل {len(selected)} کاربر انتخاب‌شده...")
+    success, file_path = db.export_to_excel(user_ids=sorted(selected))
+    await send_excel_export(callback.from_user.id, success, file_path, f"✅ فایل اکسل {len(selected)} کاربر انتخاب‌شده")
+
+
+@callback_router.route_callback("admin_bulk_pdf")
+async def admin_bulk_pdf(callback: types.CallbackQuery, state: FSMContext) -> None:
+    if callback.from_user.id not in config.ADMIN_IDS:
+        await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
+        return
+    selected = _bulk_selection(await state.get_data())
+    if not selected:
+        await callback.answer("هیچ کاربری انتخاب نشده است.", show_alert=True)
+        return
+    problem = resume_pdf.missing_dependency()
+    if problem:
+        await callback.answer(problem, show_alert=True)
+        return
+    await callback.answer()
+    await callback.message.answer(f"درحال ساخت PDF رزومه {len(selected)} کاربر انتخاب‌شده...")
+    file_path = config.PDF_ZIP_OUTPUT.format(admin_id=callback.from_user.id)
+    try:
+        count = await resume_pdfs.export_zip(sorted(selected), file_path)
+        await bot.send_document(
+            callback.from_user.id, local_api.input_file(bot, file_path), caption=f"✅ PDF رزومه {count} کاربر"
+        )
+        db.log("ADMIN", f"Admin {callback.from_user.id} exported {count} resume PDFs.")
+    except Exception as e:
+        db.log("ERROR", f"Resume PDF export failed: {e}")
+        await callback.message.answer(f"❌ خطا در ساخت یا ارسال فایل PDF: {e}", parse_mode=None)
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+@callback_router.route_callback("admin_search_prev")
 async def admin_search_prev(callback: types.CallbackQuery, state: FSMContext) -> None:
     if callback.from_user.id not in config.ADMIN_IDS:
         await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
@@ -2020,7 +2399,7 @@ async def admin_search_prev(callback: types.CallbackQuery, state: FSMContext) ->
 
 
 # --- 5. حذف کاربر ---
-@dp.message(F.text == "🗑️ حذف کاربر", AdminStates.view_user)
+@admin_router.route_message("🗑️ حذف کاربر", state=AdminStates.view_user)
 async def admin_start_delete(message: types.Message, state: FSMContext) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -2031,10 +2410,7 @@ async def admin_start_delete(message: types.Message, state: FSMContext) -> None:
     
     await state.set_state(AdminStates.delete_confirm)
     
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text=f"حذف کاربر {user_id}"), KeyboardButton(text="لغو")]],
-        resize_keyboard=True, one_time_keyboard=True
-    )
+    keyboard = get_delete_confirm_keyboard(user_id)
     
     await message.answer(
         f"⚠️ **اخطار حذف!**\n"
@@ -2042,7 +2418,7 @@ async def admin_start_delete(message: types.Message, state: FSMContext) -> None:
         reply_markup=keyboard
     )
 
-@dp.message(AdminStates.delete_confirm)
+@admin_router.route_message(state=AdminStates.delete_confirm)
 async def admin_confirm_delete(message: types.Message, state: FSMContext) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -2065,8 +2441,166 @@ async def admin_confirm_delete(message: types.Message, state: FSMContext) -> Non
         await message.answer("ورودی نامعتبر. لطفاً یکی از دکمه‌های بالا را انتخاب کنید.")
 
 
+# --- ارسال همگانی به متقاضیان ---
+
+BROADCAST_STATUS_LABELS = MappingProxyType({
+    'running': "⏳ در حال ارسال",
+    'paused': "⏸ متوقف",
+    'done': "✅ تمام شد",
+    'cancelled': "✖️ لغو شد",
+})
+BROADCAST_FILTER_HELP = (
+    "گیرندگان را مشخص کنید؛ هر شرط در یک خط به شکل «کلید: مقدار»:\n"
+    "مهارت: AutoCAD پیشرفته\n"
+    "شهر: تهران\n"
+    f"کلیدها: {'، '.join(broadcast.FILTER_KEYS)}\n"
+    f"برای ارسال به همه متقاضیان بنویسید «{broadcast.ALL_RECIPIENTS}»."
+)
+
+
+def broadcast_progress(b: dict):
+    """(text, keyboard) of a broadcast's live progress message in the admin chat."""
+    handled = b['sent'] + b['failed'] + b['blocked']
+    percent = int(handled * 100 / b['total']) if b['total'] else 100
+    text = (
+        f"📣 ارسال همگانی #{b['id']} — {BROADCAST_STATUS_LABELS.get(b['status'], b['status'])}\n"
+        f"گیرندگان: {broadcast.describe_filters(b['filters'])}\n"
+        f"پیشرفت: {handled} از {b['total']} ({percent}٪)\n"
+        f"ارسال‌شده: {b['sent']} | ناموفق: {b['failed']} | ربات را بلاک کرده‌اند: {b['blocked']}"
+    )
+    buttons = []
+    if b['status'] == 'running':
+        buttons.append(InlineKeyboardButton(text="⏸ توقف", callback_data=f"broadcast_pause_{b['id']}"))
+    elif b['status'] == 'paused':
+        buttons.append(InlineKeyboardButton(text="▶️ ادامه", callback_data=f"broadcast_resume_{b['id']}"))
+    if b['status'] in ('running', 'paused'):
+        buttons.append(InlineKeyboardButton(text="✖️ لغو", callback_data=f"broadcast_cancel_{b['id']}"))
+    return text, InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+
+async def show_broadcast_progress(b: dict) -> None:
+    if not b or not b['progress_message_id']:
+        return
+    text, keyboard = broadcast_progress(b)
+    try:
+        await bot.edit_message_text(
+            text, chat_id=b['progress_chat_id'], message_id=b['progress_message_id'],
+            reply_markup=keyboard, parse_mode=None
+        )
+    except TelegramBadRequest as e:
+        # «message is not modified» وقتی از آخرین به‌روزرسانی چیزی تغییر نکرده
+        if "not modified" not in str(e):
+            raise
+
+
+broadcasts = broadcast.BroadcastEngine(
+    db, bot, rate=config.BROADCAST_RATE_PER_SEC, concurrency=config.BROADCAST_CONCURRENCY,
+    progress_interval=config.BROADCAST_PROGRESS_INTERVAL_SEC, on_progress=show_broadcast_progress,
+)
+
+
+@admin_router.route_message("📣 ارسال همگانی")
+async def admin_broadcast_start(message: types.Message, state: FSMContext) -> None:
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
+    await state.set_state(AdminStates.broadcast_filter)
+    recent = db.get_recent_broadcasts()
+    if recent:
+        lines = [
+            f"#{b['id']} {BROADCAST_STATUS_LABELS.get(b['status'], b['status'])}: {b['sent']} از {b['total']}"
+            for b in recent
+        ]
+        await message.answer("ارسال‌های اخیر:\n" + "\n".join(lines), parse_mode=None)
+    await message.answer(BROADCAST_FILTER_HELP, reply_markup=create_reply_keyboard(["بازگشت"]), parse_mode=None)
+
+
+@admin_router.route_message(state=AdminStates.broadcast_filter)
+async def admin_broadcast_filter(message: types.Message, state: FSMContext) -> None:
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
+    if message.text == "بازگشت":
+        await state.clear()
+        await message.answer("بازگشت به منوی مدیریت.", reply_markup=get_admin_main_keyboard())
+        return
+    try:
+        filters = broadcast.parse_filters(message.text)
+    except ValueError as e:
+        await message.answer(f"شرط نامعتبر: {e}\n\n{BROADCAST_FILTER_HELP}", parse_mode=None)
+        return
+    total = db.count_broadcast_recipients(filters)
+    if not total:
+        await message.answer("هیچ متقاضی‌ای با این شرط‌ها پیدا نشد. شرط‌های دیگری وارد کنید.")
+        return
+    await state.update_data(broadcast_filters=filters, broadcast_total=total)
+    await state.set_state(AdminStates.broadcast_text)
+    await message.answer(
+        f"{total} گیرنده ({broadcast.describe_filters(filters)}).\nاکنون متن پیام را بفرستید (قالب‌بندی حفظ می‌شود).",
+        parse_mode=None
+    )
+
+
+@admin_router.route_message(state=AdminStates.broadcast_text)
+async def admin_broadcast_text(message: types.Message, state: FSMContext) -> None:
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
+    if message.text == "بازگشت":
+        await state.clear()
+        await message.answer("بازگشت به منوی مدیریت.", reply_markup=get_admin_main_keyboard())
+        return
+    if not message.text:
+        await message.answer("فقط پیام متنی قابل ارسال همگانی است.")
+        return
+    data = await state.get_data()
+    await state.update_data(broadcast_text=message.html_text)
+    await message.answer("پیش‌نمایش پیام:", reply_markup=types.ReplyKeyboardRemove())
+    await message.answer(message.html_text, parse_mode=ParseMode.HTML)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="✅ ارسال", callback_data="broadcast_send"),
+        InlineKeyboardButton(text="❌ انصراف", callback_data="broadcast_abort"),
+    ]])
+    await message.answer(f"این پیام برای {data['broadcast_total']} متقاضی ارسال شود؟", reply_markup=keyboard)
+
+
+@callback_router.route_callback(data=["broadcast_send", "broadcast_abort"])
+async def admin_broadcast_confirm(callback: types.CallbackQuery, state: FSMContext) -> None:
+    if callback.from_user.id not in config.ADMIN_IDS:
+        await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
+        return
+    await callback.answer()
+    data = await state.get_data()
+    await state.clear()
+    if callback.data == "broadcast_abort" or 'broadcast_text' not in data:
+        await callback.message.edit_text("ارسال همگانی لغو شد.")
+        await bot.send_message(callback.from_user.id, "بازگشت به منوی مدیریت.", reply_markup=get_admin_main_keyboard())
+        return
+    filters = data['broadcast_filters']
+    # تعداد دوباره شمرده می‌شود؛ ممکن است از زمان انتخاب شرط‌ها تغییر کرده باشد
+    broadcast_id = db.create_broadcast(
+        callback.from_user.id, filters, data['broadcast_text'], db.count_broadcast_recipients(filters)
+    )
+    text, keyboard = broadcast_progress(db.get_broadcast(broadcast_id))
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode=None)
+    db.set_broadcast_progress_message(broadcast_id, callback.message.chat.id, callback.message.message_id)
+    broadcasts.start(broadcast_id)
+    await bot.send_message(callback.from_user.id, "ارسال شروع شد؛ پیشرفت در پیام بالا نمایش داده می‌شود.", reply_markup=get_admin_main_keyboard())
+
+
+@callback_router.route_callback(prefix="broadcast_")
+async def admin_broadcast_control(callback: types.CallbackQuery) -> None:
+    if callback.from_user.id not in config.ADMIN_IDS:
+        await callback.answer("شما دسترسی ادمین ندارید.", show_alert=True)
+        return
+    action, _, broadcast_id = callback.data[len("broadcast_"):].partition("_")
+    if action == "resume":
+        changed = broadcasts.resume(int(broadcast_id))
+    else:
+        changed = broadcasts.stop(int(broadcast_id), 'paused' if action == "pause" else 'cancelled')
+    await callback.answer("انجام شد." if changed else "وضعیت این ارسال تغییر کرده است.")
+    await show_broadcast_progress(db.get_broadcast(int(broadcast_id)))
+
+
 # --- 9. بلاک/آنبلاک کاربر ---
-@dp.message(F.text.in_(["🚫 بلاک", "✅ آنبلاک"]), AdminStates.view_user)
+@admin_router.route_message(text=["🚫 بلاک", "✅ آنبلاک"], state=AdminStates.view_user)
 async def admin_block_unblock(message: types.Message, state: FSMContext) -> None:
     if message.from_user.id not in config.ADMIN_IDS:
         return
@@ -2086,11 +2620,10 @@ async def admin_block_unblock(message: types.Message, state: FSMContext) -> None
     await message.answer(f"✅ کاربر با آیدی `{user_id}` با موفقیت **{status_text}** شد.")
     db.log("ADMIN", f"User {user_id} was {status_text}ed by admin.")
     
-    # بازگشت به نمایش کاربر
-    user_data = db.get_resume_data(user_id)
-    # آپدیت کیبورد با وضعیت جدید (اینجا فرض می‌شود وضعیت بلاک از دیتابیس خوانده شود)
+    # بازگشت به نمایش کاربر (کارت از کش؛ با تغییر row_version دوباره رندر می‌شود)
+    card = get_resume_card(user_id)
     await message.answer(
-        format_resume_data(user_data),
+        card.text,
         reply_markup=get_user_actions_keyboard(user_id, is_blocked), 
         parse_mode=ParseMode.HTML
     )
@@ -2098,7 +2631,40 @@ async def admin_block_unblock(message: types.Message, state: FSMContext) -> None
 # --- اجرای ربات ---
 
 async def main() -> None:
-    await dp.start_polling(bot)
+    # کارگرهای PDF پیش از هر thread (aiohttp، to_thread، watchdog) fork می‌شوند
+    resume_pdfs.start()
+    os.makedirs(config.UPLOADS_DIR, exist_ok=True)
+    keyboard_registry.build_all()
+    metrics_runner = None
+    if config.METRICS_PORT:
+        metrics_runner = await start_metrics_server(metrics, config.METRICS_HOST, config.METRICS_PORT)
+    changes_runner = None
+    if config.CHANGES_PORT and config.CHANGES_TOKEN:
+        changes_runner = await changes.start_changes_server(
+            db, config.CHANGES_HOST, config.CHANGES_PORT, config.CHANGES_TOKEN, config.CHANGES_PAGE_LIMIT
+        )
+    elif config.CHANGES_PORT:
+        db.log("ERROR", "CHANGES_PORT is set without CHANGES_TOKEN; change feed disabled.")
+    compaction_task = asyncio.create_task(changes.compact_changelog(db, config.CHANGELOG_KEEP_DAYS))
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag(metrics))
+    outbox_task = asyncio.create_task(outbox.run())
+    reminder_task = asyncio.create_task(reminders.run())
+    broadcasts.resume_all()
+    if config.PROFILE_ON_START:
+        run_in_background(send_profile(config.ADMIN_ID, config.PROFILE_ON_START))
+    try:
+        await dp.start_polling(bot, tasks_concurrency_limit=config.MAX_PENDING_UPDATES)
+    finally:
+        lag_monitor.cancel()
+        outbox_task.cancel()
+        reminder_task.cancel()
+        compaction_task.cancel()
+        resume_pdfs.close()
+        slow_watchdog.stop()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        if changes_runner:
+            await changes_runner.cleanup()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,42 @@
+# media_group.py
+"""Collect the messages of an album (one ``media_group_id``) into one batch.
+
+Telegram delivers an album of N photos/documents as N separate updates.
+The first part becomes the leader: it waits until no new part has arrived
+for ``window`` seconds and then gets the whole album; the other parts get
+``None`` and return at once. This relies on the parts being handled
+concurrently, so it must run before anything that serialises a user's
+updates (``PerUserLockMiddleware`` calls it before taking the lock);
+handled one by one, every part is simply its own album of one.
+
+    album = await collector.collect(message)
+    if album is None:
+        return
+"""
+import asyncio
+
+
+class MediaGroupCollector:
+    def __init__(self, window: float = 0.5):
+        self.window = window
+        self._groups = {}
+
+    async def collect(self, message) -> list:
+        """All parts of ``message``'s album in order (for the leader), else None."""
+        key = message.media_group_id
+        if key is None:
+            return [message]
+        group = self._groups.get(key)
+        if group is not None:
+            group.append(message)
+            return None
+        group = self._groups[key] = [message]
+        try:
+            # تا وقتی در یک بازه کامل قسمت جدیدی نرسیده صبر می‌کنیم
+            seen = 0
+            while seen != len(group):
+                seen = len(group)
+                await asyncio.sleep(self.window)
+        finally:
+            del self._groups[key]
+        return sorted(group, key=lambda m: m.message_id)
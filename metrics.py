@@ -0,0 +1,268 @@
+# metrics.py
+"""In-process latency/throughput metrics with a Prometheus text endpoint.
+
+``Metrics`` keeps counters, gauges and summaries (count, sum and
+p50/p95/p99 over a sliding window of recent samples) keyed by metric name
+and labels. The instrumentation pieces feed it:
+
+* ``HandlerMetricsMiddleware`` — per-handler latency and errors
+  (the route picked by ``FastRouter`` is read from ``current_handler``).
+* ``instrument_database`` — wraps the public ``DatabaseManager`` methods.
+* ``RequestMetricsMiddleware`` — Telegram Bot API call latency and errors.
+* ``InstrumentedStorage`` — FSM state transitions and storage latency.
+* ``monitor_event_loop_lag`` — background task measuring event-loop lag.
+
+``start_metrics_server`` serves everything on ``/metrics``.
+"""
+import asyncio
+import functools
+import time
+from collections import Counter, deque
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+from aiohttp import web
+
+from fast_router import current_handler
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Summary:
+    """Count/sum over all observations, quantiles over the last ``window`` ones."""
+
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantiles(self) -> tuple:
+        if not self.samples:
+            return tuple(0.0 for _ in QUANTILES)
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return tuple(ordered[min(last, int(q * len(ordered)))] for q in QUANTILES)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    items = key + extra
+    if not items:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in items
+    )
+    return "{" + body + "}"
+
+
+class Metrics:
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self.summaries = {}
+        self.counters = Counter()
+        self.gauges = {}
+        self._collectors = []
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _label_key(labels))
+        summary = self.summaries.get(key)
+        if summary is None:
+            summary = self.summaries[key] = Summary(self.window)
+        summary.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        self.counters[(name, _label_key(labels))] += value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        self.gauges[(name, _label_key(labels))] = value
+
+    def set_counter(self, name: str, value: float, **labels) -> None:
+        """Publish a counter maintained elsewhere (e.g. by a middleware)."""
+        self.counters[(name, _label_key(labels))] = value
+
+    def add_collector(self, collector) -> None:
+        """Register ``collector(metrics)``, called to refresh values right before they are read."""
+        self._collectors.append(collector)
+
+    def collect(self) -> None:
+        for collector in self._collectors:
+            collector(self)
+
+    def summary_rows(self, name: str) -> list:
+        """[(labels dict, count, p50, p95, p99)] for one summary, slowest p95 first."""
+        rows = [
+            (dict(key), summary.count, *summary.quantiles())
+            for (metric, key), summary in self.summaries.items() if metric == name
+        ]
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+
+    def counter_total(self, name: str) -> float:
+        return sum(value for (metric, _), value in self.counters.items() if metric == name)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        self.collect()
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, key), value in sorted(self.counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        for (name, key), value in sorted(self.gauges.items()):
+            header(name, "gauge")
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        for (name, key), summary in sorted(self.summaries.items(), key=lambda item: item[0]):
+            header(name, "summary")
+            for q, value in zip(QUANTILES, summary.quantiles()):
+                lines.append(f"{name}{_format_labels(key, (('quantile', q),))} {value:.6f}")
+            lines.append(f"{name}_sum{_format_labels(key)} {summary.total:.6f}")
+            lines.append(f"{name}_count{_format_labels(key)} {summary.count}")
+        return "\n".join(lines) + "\n"
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: latency and error count of the handler that processed the event."""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(self, handler, event, data: dict):
+        token = current_handler.set(None)
+        start = time.perf_counter()
+        error = None
+        try:
+            return await handler(event, data)
+        except SkipHandler:
+            # این روتر آپدیت را رد کرد و روتر بعدی بررسی می‌کند؛ اندازه‌گیری نمی‌شود
+            error = SkipHandler
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            # FastRouter گزارش می‌دهد کدام هندلر واقعاً اجرا شد
+            chosen = current_handler.get() or data.get("handler")
+            current_handler.reset(token)
+            if error is not SkipHandler:
+                name = chosen.callback.__name__ if chosen else "unknown"
+                self.metrics.observe("bot_handler_seconds", elapsed, handler=name)
+                if error is not None:
+                    self.metrics.inc("bot_handler_errors_total", handler=name, error=type(error).__name__)
+
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    """Bot API request middleware: latency per API method and error counts."""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(self, make_request, bot, method):
+        api_method = getattr(method, "__api_method__", type(method).__name__)
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            self.metrics.inc("bot_api_errors_total", method=api_method, error=type(e).__name__)
+            raise
+        finally:
+            self.metrics.observe("bot_api_seconds", time.perf_counter() - start, method=api_method)
+
+
+class InstrumentedStorage(BaseStorage):
+    """FSM storage wrapper counting state transitions and timing storage calls."""
+
+    def __init__(self, storage: BaseStorage, metrics: Metrics):
+        self.storage = storage
+        self.metrics = metrics
+
+    async def _timed(self, op, call):
+        start = time.perf_counter()
+        try:
+            return await call
+        finally:
+            self.metrics.observe("bot_fsm_storage_seconds", time.perf_counter() - start, op=op)
+
+    async def set_state(self, key, state=None) -> None:
+        target = state.state if isinstance(state, State) else state
+        self.metrics.inc("bot_fsm_transitions_total", state=str(target))
+        return await self._timed("set_state", self.storage.set_state(key, state))
+
+    async def get_state(self, key):
+        return await self._timed("get_state", self.storage.get_state(key))
+
+    async def set_data(self, key, data) -> None:
+        return await self._timed("set_data", self.storage.set_data(key, data))
+
+    async def get_data(self, key):
+        return await self._timed("get_data", self.storage.get_data(key))
+
+    async def close(self) -> None:
+        await self.storage.close()
+
+
+def instrument_database(db, metrics: Metrics, exclude=("add_write_listener", "close")):
+    """Replace the public methods of ``db`` with wrappers recording their latency."""
+    for name in dir(type(db)):
+        if name.startswith("_") or name in exclude:
+            continue
+        method = getattr(db, name)
+        if not callable(method):
+            continue
+
+        def wrap(method=method, name=name):
+            @functools.wraps(method)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    metrics.observe("bot_db_seconds", time.perf_counter() - start, method=name)
+            return timed
+
+        setattr(db, name, wrap())
+    return db
+
+
+async def monitor_event_loop_lag(metrics: Metrics, interval: float = 0.5) -> None:
+    """Sleep ``interval`` in a loop; any oversleep is time the loop was blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        metrics.observe("bot_event_loop_lag_seconds", lag)
+        metrics.set_gauge("bot_event_loop_lag_last_seconds", lag)
+
+
+async def start_metrics_server(metrics: Metrics, host: str, port: int) -> web.AppRunner:
+    async def handle_metrics(request):
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,422 @@
+# middlewares.py
+"""aiogram middlewares shared by the bot's routers."""
+import asyncio
+import json
+import time
+from collections import Counter, OrderedDict, deque
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.types import Update
+
+# انواع پیامی که آپلود فایل حساب می‌شوند
+UPLOAD_CONTENT_FIELDS = ("document", "photo", "video", "audio", "voice", "video_note", "animation")
+
+
+def install_outer_middleware(dp: Dispatcher, middleware) -> None:
+    """Register an update outer middleware right before the FSM middleware.
+
+    Middlewares installed this way see ``event_from_user`` (set by aiogram's
+    user-context middleware) but run before any FSM storage read.
+    """
+    dp.update.outer_middleware.unregister(dp.fsm)
+    dp.update.outer_middleware.register(middleware)
+    dp.update.outer_middleware.register(dp.fsm)
+
+
+class TokenBucket:
+    """Per-key token buckets: ``rate`` tokens per second, at most ``burst`` stored."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._prune_at = max_keys
+
+    def consume(self, key, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        tokens, last = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        if len(self._buckets) > self._prune_at:
+            self._prune(now)
+        return allowed
+
+    def _prune(self, now: float) -> None:
+        # سطل‌هایی که دوباره پر شده‌اند با حالت پیش‌فرض فرقی ندارند و حذف می‌شوند
+        full = [key for key, (tokens, last) in self._buckets.items()
+                if tokens + (now - last) * self.rate >= self.burst]
+        for key in full:
+            del self._buckets[key]
+        self._prune_at = max(self.max_keys, len(self._buckets) * 2)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AntiAbuseMiddleware(BaseMiddleware):
+    """Drop updates from blocked users and throttle floods, before FSM/DB access.
+
+    Blocked ids live in memory: warmed from the database by ``attach`` and
+    kept current through a ``DatabaseManager`` write listener. Messages and
+    callback queries share one token bucket per user; uploads additionally
+    consume a (stricter) upload bucket. An album is one action: only its
+    first part takes an action token (its ``media_group_id`` is remembered
+    for ``album_ttl`` seconds), every part takes an upload token. Admins are
+    never throttled. Dropped updates are counted per reason in ``dropped``.
+    """
+
+    def __init__(self, admin_ids=(), rate: float = 1.0, burst: int = 8,
+                 upload_rate: float = 0.2, upload_burst: int = 10, album_ttl: float = 30.0):
+        self.admin_ids = frozenset(admin_ids)
+        self.blocked_ids = set()
+        self.actions = TokenBucket(rate, burst)
+        self.uploads = TokenBucket(upload_rate, upload_burst)
+        self.album_ttl = album_ttl
+        self.dropped = Counter()
+        self._albums = OrderedDict()  # (user_id, media_group_id) -> time its action token was taken
+
+    def attach(self, db) -> None:
+        """Load blocked ids from ``db`` and follow later block/unblock/delete writes."""
+        self.blocked_ids = set(db.get_blocked_user_ids())
+
+        def on_write(user_id, fields):
+            # ذخیره معمولی رزومه وضعیت بلاک را تغییر نمی‌دهد؛ فقط بلاک/آنبلاک یا حذف کامل کاربر
+            if fields is None and user_id not in self.blocked_ids:
+                return
+            if fields is not None and 'is_blocked' not in fields:
+                return
+            self.set_blocked(user_id, db.is_user_blocked(user_id))
+
+        db.add_write_listener(on_write)
+
+    def set_blocked(self, user_id: int, blocked: bool) -> None:
+        if blocked:
+            self.blocked_ids.add(user_id)
+        else:
+            self.blocked_ids.discard(user_id)
+
+    async def __call__(self, handler, event: Update, data: dict):
+        user = data.get("event_from_user")
+        if user is None or user.id in self.admin_ids:
+            return await handler(event, data)
+
+        if user.id in self.blocked_ids:
+            self.dropped["blocked"] += 1
+            return None
+
+        message = event.message or event.edited_message
+        if message is None and event.callback_query is None:
+            return await handler(event, data)
+
+        album = (user.id, message.media_group_id) if message is not None and message.media_group_id else None
+        if album is None or album not in self._albums:
+            if not self.actions.consume(user.id):
+                self.dropped["flood"] += 1
+                return None
+            if album is not None:
+                self._remember_album(album)
+        if message is not None and any(getattr(message, f) for f in UPLOAD_CONTENT_FIELDS):
+            if not self.uploads.consume(user.id):
+                self.dropped["upload_flood"] += 1
+                return None
+        return await handler(event, data)
+
+    def _remember_album(self, album) -> None:
+        now = time.monotonic()
+        # آلبوم‌های قدیمی از ابتدای صف (قدیمی‌ترین) حذف می‌شوند
+        while self._albums and now - next(iter(self._albums.values())) >= self.album_ttl:
+            self._albums.popitem(last=False)
+        self._albums[album] = now
+
+
+class PerUserLockMiddleware(BaseMiddleware):
+    """Run the updates of one user one at a time, in arrival order; other users stay concurrent.
+
+    Install it with ``install_outer_middleware`` so the FSM state is read
+    inside the lock. A lock exists only while some update of that user is
+    running or waiting, so memory is bounded by the number of users active
+    right now. A callback query repeating the same button of the same
+    message within ``callback_ttl`` seconds (a double tap) is answered and
+    dropped before it waits for the lock; drops are counted in
+    ``duplicates``.
+
+    With a ``collector`` (``MediaGroupCollector``) the parts of an album are
+    gathered before taking the lock: the leader passes the whole album to
+    the handler as ``data["album"]`` and the other parts end here. Collected
+    behind the lock instead, every part would wait for the leader and the
+    album would fall apart into single files.
+    """
+
+    def __init__(self, callback_ttl: float = 1.0, collector=None, max_callbacks: int = 10000):
+        self.callback_ttl = callback_ttl
+        self.collector = collector
+        self.max_callbacks = max_callbacks
+        self.duplicates = 0
+        self.waited = 0
+        self._locks = {}  # user_id -> [lock, updates running or waiting]
+        self._callbacks = OrderedDict()  # (user_id, message_id, data) -> time seen
+
+    def _is_duplicate(self, user_id: int, query) -> bool:
+        now = time.monotonic()
+        # کلیدهای قدیمی از ابتدای صف (قدیمی‌ترین) حذف می‌شوند
+        while self._callbacks:
+            key, seen = next(iter(self._callbacks.items()))
+            if now - seen < self.callback_ttl and len(self._callbacks) < self.max_callbacks:
+                break
+            del self._callbacks[key]
+        message_id = query.message.message_id if query.message else query.inline_message_id
+        key = (user_id, message_id, query.data)
+        if key in self._callbacks:
+            return True
+        self._callbacks[key] = now
+        return False
+
+    async def __call__(self, handler, event: Update, data: dict):
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+        if event.callback_query is not None and self._is_duplicate(user.id, event.callback_query):
+            self.duplicates += 1
+            # بدون پاسخ، چرخک بارگذاری دکمه در کلاینت کاربر می‌ماند
+            try:
+                await event.callback_query.answer()
+            except Exception:
+                pass
+            return None
+        if self.collector is not None and event.message is not None and event.message.media_group_id:
+            album = await self.collector.collect(event.message)
+            if album is None:
+                return None
+            data["album"] = album
+
+        entry = self._locks.get(user.id)
+        if entry is None:
+            entry = self._locks[user.id] = [asyncio.Lock(), 0]
+        lock = entry[0]
+        entry[1] += 1
+        if lock.locked():
+            self.waited += 1
+        try:
+            async with lock:
+                return await handler(event, data)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user.id]
+
+    def __len__(self):
+        return len(self._locks)
+
+
+class PriorityGate(BaseMiddleware):
+    """Cap the number of updates being handled at once and admit waiting ones by priority.
+
+    At most ``limit`` updates run their handlers at the same time; the rest
+    wait in three lanes: admins first, then everything else, then
+    repeated low-value taps (a ``low_value_texts`` button, e.g. support or
+    channel, pressed again by the same user within ``repeat_ttl``
+    seconds), FIFO within a lane. A user's first tap waits in the normal
+    lane and always gets its answer. While ``shed_depth`` or more updates
+    are waiting, new repeated taps are dropped (counted in ``shed``)
+    instead of queued. ``observe(lane, seconds)`` receives the time every
+    queued update waited.
+
+    Install it after ``PerUserLockMiddleware``, so only the update at the
+    head of each user's queue holds or waits for a slot. The number of
+    updates received but not finished (and so memory) is capped separately
+    by ``tasks_concurrency_limit`` of ``start_polling``.
+    """
+
+    LANES = ("admin", "normal", "low")
+
+    def __init__(self, limit: int, admin_ids=(), low_value_texts=(), shed_depth: int = 200,
+                 repeat_ttl: float = 60.0, observe=None):
+        self.limit = limit
+        self.admin_ids = frozenset(admin_ids)
+        self.low_value_texts = frozenset(low_value_texts)
+        self.shed_depth = shed_depth
+        self.repeat_ttl = repeat_ttl
+        self.observe = observe
+        self.running = 0
+        self.shed = 0
+        self._waiting = tuple(deque() for _ in self.LANES)
+        self._taps = OrderedDict()  # (user_id, text) -> زمان آخرین کلیک
+
+    def lane(self, event: Update, data: dict) -> int:
+        user = data.get("event_from_user")
+        if user is not None and user.id in self.admin_ids:
+            return 0
+        if user is not None and event.message is not None and event.message.text in self.low_value_texts:
+            return 2 if self._repeated((user.id, event.message.text)) else 1
+        return 1
+
+    def _repeated(self, tap) -> bool:
+        now = time.monotonic()
+        # کلیک‌های قدیمی از ابتدای صف (قدیمی‌ترین) حذف می‌شوند
+        while self._taps and now - next(iter(self._taps.values())) >= self.repeat_ttl:
+            self._taps.popitem(last=False)
+        repeated = tap in self._taps
+        self._taps[tap] = now
+        self._taps.move_to_end(tap)
+        return repeated
+
+    def depth(self, lane: int = None) -> int:
+        if lane is None:
+            return sum(len(waiting) for waiting in self._waiting)
+        return len(self._waiting[lane])
+
+    async def __call__(self, handler, event: Update, data: dict):
+        lane = self.lane(event, data)
+        if self.running < self.limit and not self.depth():
+            self.running += 1
+        else:
+            if lane == 2 and self.depth() >= self.shed_depth:
+                self.shed += 1
+                return None
+            await self._wait(lane)
+        try:
+            return await handler(event, data)
+        finally:
+            self._release()
+
+    async def _wait(self, lane: int) -> None:
+        start = time.monotonic()
+        slot = asyncio.get_running_loop().create_future()
+        self._waiting[lane].append(slot)
+        try:
+            await slot
+        except asyncio.CancelledError:
+            if slot.done() and not slot.cancelled():
+                # جایگاه همین حالا تحویل شده بود؛ به نفر بعدی می‌رسد
+                self._release()
+            else:
+                self._waiting[lane].remove(slot)
+            raise
+        if self.observe is not None:
+            self.observe(self.LANES[lane], time.monotonic() - start)
+
+    def _release(self) -> None:
+        # جایگاه مستقیماً به اولین منتظر با بالاترین اولویت داده می‌شود؛ running تغییر نمی‌کند
+        for waiting in self._waiting:
+            while waiting:
+                slot = waiting.popleft()
+                if not slot.done():
+                    slot.set_result(None)
+                    return
+        self.running -= 1
+
+
+class BufferedFSMContext(FSMContext):
+    """FSMContext that reads FSM data at most once per update and writes it back once.
+
+    ``get_data`` / ``update_data`` work on an in-memory copy loaded on first
+    use; the state comes from the FSM middleware's ``raw_state``. Nothing
+    reaches the storage until ``flush``, which writes the state and the data
+    only if they were changed. ``request_persist`` records a snapshot for
+    the end-of-update resume save (see ``FSMUnitOfWorkMiddleware``).
+    """
+
+    def __init__(self, storage, key, raw_state=None):
+        super().__init__(storage, key)
+        self._state = raw_state
+        self._data = None
+        self._state_changed = False
+        self._data_changed = False
+        self.persist_request = None
+
+    async def _load(self) -> dict:
+        if self._data is None:
+            self._data = dict(await self.storage.get_data(key=self.key))
+        return self._data
+
+    async def set_state(self, state=None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+        self._state_changed = True
+
+    async def get_state(self):
+        return self._state
+
+    async def set_data(self, data) -> None:
+        self._data = dict(data)
+        self._data_changed = True
+
+    async def get_data(self) -> dict:
+        # مثل storage یک کپی برمی‌گردد؛ هندلرها دیکشنری برگشتی را تغییر می‌دهند
+        return dict(await self._load())
+
+    async def get_value(self, key: str, default=None):
+        return (await self._load()).get(key, default)
+
+    async def update_data(self, data=None, **kwargs) -> dict:
+        current = await self._load()
+        if data:
+            kwargs.update(data)
+        current.update(kwargs)
+        self._data_changed = True
+        return dict(current)
+
+    async def request_persist(self, user_id: int) -> None:
+        self.persist_request = (user_id, dict(await self._load()))
+
+    async def flush(self) -> None:
+        if self._state_changed:
+            await self.storage.set_state(key=self.key, state=self._state)
+            self._state_changed = False
+        if self._data_changed:
+            await self.storage.set_data(key=self.key, data=self._data)
+            self._data_changed = False
+
+
+class FSMUnitOfWorkMiddleware(BaseMiddleware):
+    """Update middleware giving handlers a ``BufferedFSMContext`` and flushing it at the end.
+
+    Register it as an inner update middleware (after aiogram's FSM
+    middleware has resolved ``state``). When the handler asked for a resume
+    save (``request_persist``), ``persist(user_id, data)`` runs once after
+    the update, and only if one of ``fields`` differs from what was last
+    saved for that user; any other write to the user's row (admin edit,
+    delete) forgets the remembered version so the next save goes through.
+    The state is flushed even when the handler raises, as the immediate
+    writes it replaces would have been.
+    """
+
+    def __init__(self, persist, fields, max_users: int = 10000):
+        self.persist = persist
+        self.fields = tuple(fields)
+        self.max_users = max_users
+        self.skipped = 0
+        self._saved = OrderedDict()
+
+    def attach(self, db) -> None:
+        db.add_write_listener(lambda user_id, fields: self._saved.pop(user_id, None))
+
+    def _digest(self, data: dict) -> int:
+        return hash(json.dumps([data.get(f) for f in self.fields], ensure_ascii=False, default=str))
+
+    async def __call__(self, handler, event: Update, data: dict):
+        state = data.get("state")
+        if state is None:
+            return await handler(event, data)
+        buffered = data["state"] = BufferedFSMContext(state.storage, state.key, data.get("raw_state"))
+        try:
+            return await handler(event, data)
+        finally:
+            await buffered.flush()
+            if buffered.persist_request is not None:
+                self._persist(*buffered.persist_request)
+
+    def _persist(self, user_id: int, data: dict) -> None:
+        digest = self._digest(data)
+        if self._saved.get(user_id) == digest:
+            self.skipped += 1
+            return
+        self.persist(user_id, data)
+        # پس از persist ثبت می‌شود؛ listener نوشتن همین ذخیره مقدار قبلی را پاک کرده است
+        self._saved[user_id] = digest
+        self._saved.move_to_end(user_id)
+        if len(self._saved) > self.max_users:
+            self._saved.popitem(last=False)
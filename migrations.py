@@ -0,0 +1,438 @@
+# migrations.py
+"""Versioned schema migrations for the SQLite database.
+
+Every schema change is a function registered with ``@migration(version,
+description)``; versions are applied in order and recorded in the
+``schema_version`` table. ``migrate(conn)`` is called by
+``DatabaseManager`` at startup, before the bot starts polling:
+
+* when the stored version is the latest, it costs one ``SELECT`` and
+  nothing else runs;
+* each pending migration runs in its own ``BEGIN IMMEDIATE`` transaction
+  together with its version row, so a failure rolls it back completely and
+  raises ``MigrationError`` (the bot refuses to start on a half-migrated
+  database instead of silently continuing);
+* table rewrites (``rebuild_table``) create the new table, copy every row
+  and swap it in within a single transaction, so an interrupted rewrite
+  leaves the old table as it was. Indexes are created one per transaction
+  with ``IF NOT EXISTS``, so re-running after a failure is harmless.
+
+Migrations run offline: nothing else writes to the database while they
+run, and a long rewrite simply delays startup.
+
+Adding a column to ``config.RESUME_FIELDS`` (or any other schema change)
+needs a new migration at the end of the list; existing ones never change.
+"""
+import datetime
+import sqlite3
+from contextlib import contextmanager
+
+import codec
+
+MIGRATIONS = []
+
+
+class MigrationError(Exception):
+    pass
+
+
+def migration(version: int, description: str, batched: bool = False):
+    """Register a migration ``func(conn, log)``.
+
+    A plain migration runs inside one transaction with its version row. A
+    ``batched`` one manages its own transactions (``rebuild_table``,
+    ``create_index``) and must be safe to re-run after an interruption;
+    its version row is written once it has finished.
+    """
+    def register(func):
+        if MIGRATIONS and version != MIGRATIONS[-1][0] + 1:
+            raise ValueError(f"migration {version} is out of order")
+        MIGRATIONS.append((version, description, batched, func))
+        return func
+    return register
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> dict:
+    """{column name: declared type} in table order."""
+    return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def create_index(conn: sqlite3.Connection, name: str, table: str, columns: str, where: str = None) -> None:
+    """Create one index in its own short transaction (no-op when it already exists)."""
+    sql = f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+    if where:
+        sql += f" WHERE {where}"
+    with transaction(conn):
+        conn.execute(sql)
+
+
+def rebuild_table(conn: sqlite3.Connection, table: str, create_sql: str, select_exprs: dict, log=None) -> int:
+    """Rewrite ``table`` with a new definition in one transaction.
+
+    ``create_sql`` is the CREATE TABLE statement with ``{table}`` as the
+    name placeholder; ``select_exprs`` maps each new column to the SQL
+    expression computing it from the old row. The rows are copied into a
+    ``__new`` shadow that then replaces ``table``. Returns the number of
+    rows copied.
+    """
+    shadow = f"{table}__new"
+    columns = ", ".join(select_exprs)
+    exprs = ", ".join(select_exprs.values())
+    with transaction(conn):
+        # سایه‌ای که از نسخه‌های قبلی (کپی چندمرحله‌ای) مانده باشد از نو ساخته می‌شود
+        conn.execute(f"DROP TABLE IF EXISTS {shadow}")
+        conn.execute(create_sql.format(table=shadow))
+        copied = conn.execute(f"INSERT INTO {shadow} ({columns}) SELECT {exprs} FROM {table}").rowcount
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+    if log:
+        log(f"{table}: rewrote {copied} rows")
+    return copied
+
+
+def _ensure_version_table(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    existing = table_columns(conn, "schema_version")
+    for column in ("description", "applied_at"):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE schema_version ADD COLUMN {column} TEXT")
+    conn.commit()
+
+
+def migrate(conn: sqlite3.Connection, log=None) -> list:
+    """Apply pending migrations; returns the applied versions (empty when the schema is current)."""
+    version = current_version(conn)
+    if version >= latest_version():
+        return []
+    _ensure_version_table(conn)
+    applied = []
+    for number, description, batched, func in MIGRATIONS:
+        if number <= version:
+            continue
+        if log:
+            log(f"applying migration {number}: {description}")
+        try:
+            if batched:
+                func(conn, log)
+            with transaction(conn):
+                if not batched:
+                    func(conn, log)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (number, description, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                )
+        except Exception as e:
+            raise MigrationError(f"migration {number} ({description}) failed: {e}") from e
+        applied.append(number)
+    return applied
+
+
+# ===============================================
+#                  مهاجرت‌ها
+# ===============================================
+
+# فهرست ستون‌ها در زمان نوشتن این مهاجرت‌ها ثابت شده است؛ فیلد جدید = مهاجرت جدید
+BASELINE_RESUME_FIELDS = (
+    "full_name", "username", "study_status", "degree", "major", "field_university", "gpa",
+    "location", "phone_main", "phone_emergency", "english_level", "skills", "work_history",
+    "job_position", "other_details", "training_request", "has_work_license", "work_license_city",
+    "file_path", "register_date", "uploaded_files",
+)
+RESUME_FLAG_COLUMNS = ("is_admin_notified", "is_blocked", "is_deleted")
+
+
+@migration(1, "baseline schema")
+def _baseline(conn, log):
+    # دیتابیس‌های قدیمی ممکن است بخشی از این جدول‌ها/ستون‌ها را داشته باشند
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS resumes (
+            user_id INTEGER PRIMARY KEY,
+            {', '.join(f'{field} TEXT' for field in BASELINE_RESUME_FIELDS)},
+            is_admin_notified INTEGER DEFAULT 0,
+            is_blocked INTEGER DEFAULT 0,
+            is_deleted INTEGER DEFAULT 0,
+            deleted_at TEXT,
+            deleted_by INTEGER,
+            score REAL,
+            row_version INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            level TEXT,
+            message TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admin_actions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            admin_id INTEGER,
+            target_user_id INTEGER,
+            action_type TEXT,
+            field_name TEXT,
+            old_value TEXT,
+            new_value TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dedup_keys (
+            dedup_key TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (dedup_key, user_id)
+        ) WITHOUT ROWID
+    """)
+    existing = table_columns(conn, "resumes")
+    missing = [(field, "TEXT") for field in BASELINE_RESUME_FIELDS if field not in existing]
+    missing += [(c, "INTEGER DEFAULT 0") for c in RESUME_FLAG_COLUMNS if c not in existing]
+    missing += [(c, t) for c, t in (("deleted_at", "TEXT"), ("deleted_by", "INTEGER"), ("score", "REAL"),
+                                    ("row_version", "INTEGER DEFAULT 0")) if c not in existing]
+    for column, column_type in missing:
+        conn.execute(f"ALTER TABLE resumes ADD COLUMN {column} {column_type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_keys_user ON dedup_keys (user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_resumes_position_score ON resumes (job_position, score DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_resumes_score ON resumes (score DESC)")
+
+
+TYPED_RESUME_COLUMNS = (
+    ("user_id", "INTEGER PRIMARY KEY"),
+    *((field, "TEXT") for field in BASELINE_RESUME_FIELDS),
+    ("is_admin_notified", "INTEGER NOT NULL DEFAULT 0"),
+    ("is_blocked", "INTEGER NOT NULL DEFAULT 0"),
+    ("is_deleted", "INTEGER NOT NULL DEFAULT 0"),
+    ("deleted_at", "TEXT"),
+    ("deleted_by", "INTEGER"),
+    ("score", "REAL"),
+    ("row_version", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+
+@migration(2, "typed resume flag columns", batched=True)
+def _typed_flags(conn, log):
+    # ستون‌های پرچم در دیتابیس‌های قدیمی با ALTER به‌صورت TEXT اضافه شده بودند ('0'/'1'/NULL)
+    columns = list(TYPED_RESUME_COLUMNS)
+    exprs = {name: name for name, _ in columns}
+    exprs.update({c: f"CAST(COALESCE({c}, 0) AS INTEGER)" for c in RESUME_FLAG_COLUMNS})
+    exprs.update(deleted_by="CAST(deleted_by AS INTEGER)", row_version="COALESCE(row_version, 0)")
+    # ستون‌های دیگری که در دیتابیس‌های قدیمی مانده‌اند با همان نوع حفظ می‌شوند
+    for name, declared in table_columns(conn, "resumes").items():
+        if name not in exprs:
+            columns.append((name, declared))
+            exprs[name] = name
+    create_sql = "CREATE TABLE {table} (" + ", ".join(f"{n} {t}".strip() for n, t in columns) + ")"
+    rebuild_table(conn, "resumes", create_sql, exprs, log=log)
+    create_index(conn, "idx_resumes_position_score", "resumes", "job_position, score DESC")
+    create_index(conn, "idx_resumes_score", "resumes", "score DESC")
+
+
+@migration(3, "indexes for blocked users and recent logs", batched=True)
+def _query_indexes(conn, log):
+    # فقط ردیف‌های بلاک‌شده در ایندکس می‌آیند (گرم کردن کش ضد سوءاستفاده)
+    create_index(conn, "idx_resumes_blocked", "resumes", "user_id", where="is_blocked = 1")
+    create_index(conn, "idx_logs_timestamp", "logs", "timestamp DESC")
+
+
+ENUM_RESUME_FIELDS = (
+    "study_status", "degree", "major", "english_level", "job_position", "training_request", "has_work_license",
+)
+TYPED_VALUE_COLUMNS = {
+    **{field: "INTEGER" for field in ENUM_RESUME_FIELDS},
+    "gpa": "REAL",
+    "register_date": "INTEGER",
+    "deleted_at": "INTEGER",
+}
+
+
+def _local_time_to_epoch(column: str) -> str:
+    # رشته‌های تاریخ به وقت محلی ذخیره شده بودند؛ مقدار غیرقابل تبدیل دست‌نخورده می‌ماند
+    return f"COALESCE(CAST(strftime('%s', {column}, 'utc') AS INTEGER), {column})"
+
+
+@migration(4, "typed resume values and enum codes", batched=True)
+def _typed_values(conn, log):
+    # gpa به REAL، تاریخ‌ها به unix timestamp و فیلدهای شمارشی به کدهای جدول enum_labels (codec.py)
+    with transaction(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS enum_labels (
+                field TEXT NOT NULL,
+                code INTEGER NOT NULL,
+                label TEXT NOT NULL,
+                PRIMARY KEY (field, code),
+                UNIQUE (field, label)
+            )
+        """)
+    if table_columns(conn, "resumes").get("gpa") != "REAL":
+        with transaction(conn):
+            for field in ENUM_RESUME_FIELDS:
+                known = dict(conn.execute("SELECT label, code FROM enum_labels WHERE field = ?", (field,)))
+                labels = list(codec.ENUM_FIELDS[field])
+                labels += [row[0] for row in conn.execute(
+                    f"SELECT DISTINCT {field} FROM resumes WHERE typeof({field}) = 'text' ORDER BY {field}")]
+                next_code = max(known.values(), default=0) + 1
+                for label in labels:
+                    if label in known:
+                        continue
+                    conn.execute("INSERT INTO enum_labels (field, code, label) VALUES (?, ?, ?)", (field, next_code, label))
+                    known[label] = next_code
+                    next_code += 1
+        columns = [(name, TYPED_VALUE_COLUMNS.get(name, declared)) for name, declared in TYPED_RESUME_COLUMNS]
+        exprs = {name: name for name, _ in columns}
+        exprs.update({
+            field: f"(SELECT code FROM enum_labels WHERE field = '{field}' AND label = {field})"
+            for field in ENUM_RESUME_FIELDS
+        })
+        exprs.update(register_date=_local_time_to_epoch("register_date"), deleted_at=_local_time_to_epoch("deleted_at"))
+        for name, declared in table_columns(conn, "resumes").items():
+            if name not in exprs:
+                columns.append((name, declared))
+                exprs[name] = name
+        create_sql = "CREATE TABLE {table} (" + ", ".join(f"{n} {t}".strip() for n, t in columns) + ")"
+        rebuild_table(conn, "resumes", create_sql, exprs, log=log)
+    create_index(conn, "idx_resumes_position_score", "resumes", "job_position, score DESC")
+    create_index(conn, "idx_resumes_score", "resumes", "score DESC")
+    create_index(conn, "idx_resumes_blocked", "resumes", "user_id", where="is_blocked = 1")
+    create_index(conn, "idx_resumes_register_date", "resumes", "register_date")
+
+
+@migration(5, "outbox for admin notifications and user confirmations")
+def _outbox(conn, log):
+    # پیام‌ها در همان تراکنش تایید رزومه ثبت و بعداً توسط OutboxDispatcher ارسال می‌شوند
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER,
+            payload TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at INTEGER NOT NULL,
+            sent_at INTEGER,
+            failed_at INTEGER,
+            last_error TEXT
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (next_attempt_at) "
+        "WHERE sent_at IS NULL AND failed_at IS NULL"
+    )
+
+
+ACTIVITY_COLUMNS = (
+    ("last_activity_at", "INTEGER"),
+    ("completed_at", "INTEGER"),
+    ("reminder_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("next_reminder_at", "INTEGER"),
+)
+
+
+@migration(6, "applicant activity and reminder schedule", batched=True)
+def _reminder_schedule(conn, log):
+    existing = table_columns(conn, "resumes")
+    with transaction(conn):
+        for column, column_type in ACTIVITY_COLUMNS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE resumes ADD COLUMN {column} {column_type}")
+        # رزومه‌های تاییدشده تمام‌شده حساب می‌شوند؛ برای ردیف‌های قدیمی یادآوری زمان‌بندی نمی‌شود
+        conn.execute(
+            "UPDATE resumes SET last_activity_at = COALESCE(last_activity_at, register_date), "
+            "completed_at = CASE WHEN is_admin_notified = 1 THEN COALESCE(completed_at, register_date) END "
+            "WHERE last_activity_at IS NULL"
+        )
+    # فقط ردیف‌هایی که یادآوری در انتظار دارند در ایندکس می‌آیند
+    create_index(conn, "idx_resumes_next_reminder", "resumes", "next_reminder_at", where="next_reminder_at IS NOT NULL")
+
+
+@migration(7, "broadcasts and unreachable chats")
+def _broadcasts(conn, log):
+    if "chat_blocked_at" not in table_columns(conn, "resumes"):
+        # زمانی که تلگرام گفت کاربر ربات را بلاک کرده؛ با فعالیت بعدی کاربر پاک می‌شود
+        conn.execute("ALTER TABLE resumes ADD COLUMN chat_blocked_at INTEGER")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_by INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            filters TEXT NOT NULL,
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            cursor INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            progress_chat_id INTEGER,
+            progress_message_id INTEGER,
+            finished_at INTEGER
+        )
+    """)
+
+
+@migration(8, "changelog of resume mutations")
+def _changelog(conn, log):
+    # AUTOINCREMENT: شماره‌ها حتی پس از فشرده‌سازی changelog دوباره استفاده نمی‌شوند
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            fields TEXT,
+            row_version INTEGER,
+            changed_at INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_changelog_user ON changelog (user_id, seq)")
+    # یک ردیف برای هر رزومه موجود تا خواندن از seq صفر وضعیت کامل را بدهد
+    conn.execute(
+        "INSERT INTO changelog (user_id, op, row_version, changed_at) "
+        "SELECT user_id, 'snapshot', row_version, ? FROM resumes ORDER BY user_id",
+        (int(datetime.datetime.now().timestamp()),)
+    )
+
+
+@migration(9, "completion of legacy resumes")
+def _legacy_completion(conn, log):
+    # مهاجرت ۶ زمان‌ها را از register_date متنی («YYYY-MM-DD HH:MM:SS» به وقت محلی) کپی کرده بود
+    for column in ("last_activity_at", "completed_at"):
+        conn.execute(
+            f"UPDATE resumes SET {column} = CAST(strftime('%s', {column}, 'utc') AS INTEGER) "
+            f"WHERE typeof({column}) = 'text'"
+        )
+    # نسخه قدیمی is_admin_notified را هیچ‌وقت ۱ نمی‌کرد؛ رزومه‌ای که به آخرین سؤال فرم
+    # (training_request) رسیده تمام‌شده حساب می‌شود و یادآوری نمی‌گیرد
+    conn.execute(
+        "UPDATE resumes SET completed_at = last_activity_at, next_reminder_at = NULL "
+        "WHERE completed_at IS NULL AND training_request IS NOT NULL AND training_request != ''"
+    )
+
+
+@migration(10, "separate dedup keys for emergency phones")
+def _emergency_dedup_keys(conn, log):
+    # تلفن اضطراری کلید p: می‌گرفت و با تلفن اصلی تکراری قطعی حساب می‌شد؛ کلیدها با پیشوند e: از نو ساخته می‌شوند.
+    # جدول خالی شود تا DatabaseManager پس از مهاجرت rebuild_dedup_index را اجرا کند
+    conn.execute("DELETE FROM dedup_keys")
@@ -0,0 +1,107 @@
+# outbox.py
+"""Deliver the messages queued in the ``outbox`` table.
+
+``DatabaseManager.confirm_resume`` writes a confirmed resume and the
+messages it triggers (the admin notifications, the applicant's
+confirmation) in one transaction, so a crash or a Telegram error can no
+longer lose them. ``OutboxDispatcher.run`` drains the table in batches:
+due rows are read with one query, sent concurrently, and marked with one
+``mark_outbox_sent`` / ``mark_outbox_failed`` call per batch. Failed
+sends are retried with exponential backoff (or after Telegram's
+``retry_after``) until ``max_attempts``; a chat that can never be reached
+(bot blocked, chat not found) is given up on at once.
+
+Marking happens right after the send, so a crash in between delivers
+that message again after the restart; it is never lost and never marked
+twice. Payloads are rendered by ``renderers[kind](payload, chat_id)``,
+which returns the ``send_message`` arguments.
+"""
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+
+class OutboxDispatcher:
+    def __init__(self, db, bot, renderers: dict, batch_size: int = 50, concurrency: int = 5,
+                 interval: float = 5.0, max_attempts: int = 8, retry_base: float = 5.0, retry_max: float = 3600.0,
+                 keep_days: int = 7):
+        self.db = db
+        self.bot = bot
+        self.renderers = renderers
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.keep_days = keep_days
+        self.sent = 0
+        self.failed = 0
+        self._send_slots = asyncio.Semaphore(concurrency)
+        self._wake = asyncio.Event()
+        self._pruned_at = 0.0
+
+    def wake(self) -> None:
+        """Start draining now instead of at the next ``interval`` tick (call after queueing)."""
+        self._wake.set()
+
+    async def run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                while await self.drain() == self.batch_size:
+                    pass
+                self._prune()
+            except Exception as e:
+                self.db.log("ERROR", f"Outbox dispatch failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain(self) -> int:
+        """Send one batch of due messages; returns how many rows were due."""
+        rows = self.db.get_due_outbox(self.batch_size)
+        if not rows:
+            return 0
+        results = await asyncio.gather(*(self._send(row) for row in rows))
+        sent = [row[0] for row, error in zip(rows, results) if error is None]
+        failures = [error for error in results if error is not None]
+        # اول شکست‌ها: اعلانی که کنار گذاشته شد مانع ثبت is_admin_notified برای بقیه نمی‌شود
+        if failures:
+            self.db.mark_outbox_failed(failures)
+            given_up = [f for f in failures if f[2] is None]
+            self.failed += len(given_up)
+            for id_, error, _ in given_up:
+                self.db.log("ERROR", f"Outbox message {id_} dropped: {error}")
+        if sent:
+            self.db.mark_outbox_sent(sent)
+            self.sent += len(sent)
+        return len(rows)
+
+    async def _send(self, row):
+        """None when delivered, else (id, error text, next attempt timestamp or None to give up)."""
+        id_, kind, chat_id, user_id, payload, attempts = row
+        try:
+            render = self.renderers[kind]
+            async with self._send_slots:
+                await self.bot.send_message(chat_id, **render(payload, chat_id))
+            return None
+        except TelegramRetryAfter as e:
+            return id_, str(e), int(time.time() + e.retry_after)
+        except (TelegramForbiddenError, TelegramBadRequest, KeyError) as e:
+            # دوباره فرستادن نتیجه‌ای جز همین خطا ندارد
+            return id_, f"{type(e).__name__}: {e}", None
+        except Exception as e:
+            if attempts + 1 >= self.max_attempts:
+                return id_, f"{type(e).__name__}: {e}", None
+            delay = min(self.retry_max, self.retry_base * 2 ** attempts)
+            return id_, f"{type(e).__name__}: {e}", int(time.time() + delay)
+
+    def _prune(self) -> None:
+        # پیام‌های تحویل‌شده حداکثر ساعتی یک بار پاک می‌شوند
+        now = time.monotonic()
+        if now - self._pruned_at < 3600:
+            return
+        self._pruned_at = now
+        self.db.prune_outbox(self.keep_days)
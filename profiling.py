@@ -0,0 +1,226 @@
+# profiling.py
+"""Production diagnostics: sampling profiler, slow-handler watchdog, slow-SQL log.
+
+* ``SamplingProfiler`` samples the stacks of all threads with
+  ``sys._current_frames()`` for a time window and returns them in the
+  collapsed-stack format used by flamegraph.pl / speedscope
+  (``frame;frame;frame count`` per line).
+* ``SlowHandlerWatchdog`` is an update middleware plus a background thread.
+  When an update has been processing for longer than the threshold, it
+  captures the event-loop thread's stack (what is blocking the loop:
+  SQLite, pandas, openpyxl...) and the handler's coroutine chain (what it
+  is awaiting: Telegram I/O...).
+* ``TimedCursor`` wraps the sqlite3 cursor of ``DatabaseManager`` and
+  reports statements slower than a threshold, with their parameters
+  redacted.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+from aiogram import BaseMiddleware
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def collapse_stack(frame, root: str) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame).replace(";", ":"))
+        frame = frame.f_back
+    labels.append(root)
+    return ";".join(reversed(labels))
+
+
+def format_collapsed(stacks: Counter) -> str:
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+class SamplingProfiler:
+    """Samples every thread's stack each ``interval`` seconds; one run at a time."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, duration: float) -> Counter:
+        """Blocking; call from a worker thread (``asyncio.to_thread``)."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("profiler is already running")
+        try:
+            me = threading.get_ident()
+            stacks = Counter()
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != me:
+                        stacks[collapse_stack(frame, names.get(thread_id, str(thread_id)))] += 1
+                time.sleep(self.interval)
+            return stacks
+        finally:
+            self._lock.release()
+
+
+def _coroutine_frames(coro, limit: int = 64) -> list:
+    frames = []
+    while coro is not None and len(frames) < limit:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+def describe_update(update) -> str:
+    """Update type plus button/callback key, without free-text user input."""
+    if update.callback_query is not None:
+        return f"callback_query data={update.callback_query.data!r}"
+    message = update.message or update.edited_message
+    if message is not None:
+        content_type = getattr(message.content_type, "value", message.content_type)
+        return f"message content_type={content_type}"
+    return update.event_type
+
+
+class SlowHandlerWatchdog(BaseMiddleware):
+    """Update outer middleware reporting updates that run longer than ``threshold`` seconds.
+
+    ``report(text)`` is called on the event loop (via ``call_soon_threadsafe``)
+    once per slow update; the stacks themselves are captured by the watchdog
+    thread at the moment the threshold is crossed, even if the loop is blocked.
+    """
+
+    def __init__(self, threshold: float, report, check_interval: float = None):
+        self.threshold = threshold
+        self.report = report
+        self.check_interval = check_interval or max(threshold / 4, 0.05)
+        self.slow_count = 0
+        self._inflight = {}
+        self._next_id = 0
+        self._loop = None
+        self._loop_thread_id = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._watch, name="slow-handler-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def __call__(self, handler, event, data: dict):
+        if self._thread is None:
+            self._start()
+        self._next_id += 1
+        key = self._next_id
+        # [شروع، تسک، توضیح آپدیت، گزارش‌شده؟]
+        self._inflight[key] = [time.monotonic(), asyncio.current_task(), describe_update(event), False]
+        try:
+            return await handler(event, data)
+        finally:
+            started, _, description, reported = self._inflight.pop(key)
+            if reported:
+                self.report(f"Slow update finished after {time.monotonic() - started:.2f}s: {description}")
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            now = time.monotonic()
+            for entry in list(self._inflight.values()):
+                if entry[3] or now - entry[0] < self.threshold:
+                    continue
+                entry[3] = True
+                self.slow_count += 1
+                text = self._capture(entry, now)
+                self._loop.call_soon_threadsafe(self.report, text)
+
+    def _capture(self, entry, now: float) -> str:
+        started, task, description, _ = entry
+        loop_frame = sys._current_frames().get(self._loop_thread_id)
+        loop_stack = "".join(traceback.format_stack(loop_frame)) if loop_frame else "(unavailable)\n"
+        coro_frames = _coroutine_frames(task.get_coro()) if task is not None else []
+        coro_stack = "".join(
+            f'  File "{f.f_code.co_filename}", line {f.f_lineno}, in {f.f_code.co_name}\n' for f in coro_frames
+        ) or "(unavailable)\n"
+        return (
+            f"Slow update ({now - started:.2f}s > {self.threshold}s): {description}\n"
+            f"Event loop thread stack:\n{loop_stack}"
+            f"Handler coroutine chain:\n{coro_stack}"
+        )
+
+
+def redact_params(params):
+    """Keep only the type/size of query parameters so personal data never reaches the log."""
+    def redact(value):
+        if value is None:
+            return None
+        if isinstance(value, (str, bytes)):
+            return f"<{type(value).__name__}:{len(value)}>"
+        return f"<{type(value).__name__}>"
+
+    if isinstance(params, dict):
+        return {k: redact(v) for k, v in params.items()}
+    return tuple(redact(v) for v in params)
+
+
+class TimedCursor:
+    """sqlite3 cursor proxy calling ``on_slow(sql, redacted_params, seconds)`` for slow statements."""
+
+    def __init__(self, cursor, threshold: float, on_slow):
+        self._cursor = cursor
+        self.threshold = threshold
+        self.on_slow = on_slow
+        self._reporting = False
+
+    def _finish(self, sql, params, start):
+        """Report the statement if it was slow; ``params`` are redacted only then (a str is a summary)."""
+        elapsed = time.perf_counter() - start
+        # گزارش کندی خودش ممکن است کوئری اجرا کند؛ از بازگشت بی‌پایان جلوگیری می‌شود
+        if elapsed >= self.threshold and not self._reporting:
+            self._reporting = True
+            try:
+                if not isinstance(params, str):
+                    params = redact_params(params)
+                self.on_slow(" ".join(sql.split()), params, elapsed)
+            finally:
+                self._reporting = False
+
+    def execute(self, sql, params=()):
+        start = time.perf_counter()
+        self._cursor.execute(sql, params)
+        self._finish(sql, params, start)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        start = time.perf_counter()
+        self._cursor.executemany(sql, seq_of_params)
+        self._finish(sql, f"<{len(seq_of_params)} rows>", start)
+        return self
+
+    def executescript(self, script):
+        start = time.perf_counter()
+        self._cursor.executescript(script)
+        self._finish(script, (), start)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
@@ -0,0 +1,43 @@
+# reminders.py
+"""Remind applicants who stopped half-way through their resume.
+
+Every resume save records the user's last activity and schedules the
+first reminder ``REMINDER_INTERVALS_HOURS[0]`` later in the indexed
+``next_reminder_at`` column; confirming the resume takes the user off
+the schedule. The schedule lives in the database, so it survives
+restarts, and a pending reminder costs one index entry instead of a
+task or timer in memory.
+
+``ReminderScheduler.run`` wakes every ``interval`` seconds, moves at
+most ``batch_size`` due users to their next reminder time and queues
+their messages in the outbox in the same transaction. The outbox
+dispatcher delivers them; ``batch_size / interval`` is the highest
+reminder rate.
+"""
+import asyncio
+
+
+class ReminderScheduler:
+    def __init__(self, db, kind: str, batch_size: int = 20, interval: float = 10.0, on_queued=None):
+        self.db = db
+        self.kind = kind
+        self.batch_size = batch_size
+        self.interval = interval
+        self.on_queued = on_queued
+        self.queued = 0
+
+    def tick(self) -> int:
+        """Queue the reminders that are due now (at most ``batch_size``); returns how many."""
+        count = self.db.queue_due_reminders(self.kind, self.batch_size)
+        self.queued += count
+        if count and self.on_queued is not None:
+            self.on_queued()
+        return count
+
+    async def run(self) -> None:
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                self.db.log("ERROR", f"Reminder scheduling failed: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,219 @@
+# resume_pdf.py
+"""Render resumes as PDF files for admins to forward.
+
+``render_pdf`` lays out the (label, value) rows of one resume on A4 pages,
+right-aligned, with the Persian text shaped (``arabic_reshaper``) and put
+in visual order (``python-bidi``) so it reads correctly in any PDF viewer.
+It runs in a process pool: reportlab layout is pure CPU work and would
+otherwise block the event loop for every PDF.
+
+``ResumePdfRenderer`` caches the bytes per (user_id, row_version), so an
+unchanged resume is rendered once however often it is requested; write
+listeners drop the entry as soon as the row changes. reportlab and the
+shaping packages are imported lazily, inside the worker processes only.
+The workers are forked by ``start()``, which ``main()`` calls before any
+thread exists. A Persian TTF font is needed at ``PDF_FONT_PATH`` (for
+example Vazirmatn).
+
+    pdf = await renderer.render(user_id)
+"""
+import asyncio
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from cache import VersionedLRUCache
+
+REQUIRED_MODULES = ("reportlab", "arabic_reshaper", "bidi")
+FONT_NAME = "ResumeFont"
+PAGE_MARGIN = 50
+FONT_SIZE = 11
+TITLE_FONT_SIZE = 16
+LINE_HEIGHT = 18
+
+# فونت در هر پروسه کارگر فقط یک بار ثبت می‌شود
+_registered_font = None
+
+
+def missing_dependency():
+    """Why PDFs can't be rendered here (a message for the admin), or None when they can."""
+    missing = [name for name in REQUIRED_MODULES if importlib.util.find_spec(name) is None]
+    if missing:
+        return f"پکیج‌های {', '.join(missing)} نصب نیستند (pip install reportlab arabic-reshaper python-bidi)."
+    if not os.path.exists(config.PDF_FONT_PATH):
+        return f"فایل فونت فارسی در مسیر {config.PDF_FONT_PATH} پیدا نشد (PDF_FONT_PATH)."
+    return None
+
+
+def resume_rows(data: dict) -> list:
+    """(label, value) rows of a resume in ``RESUME_FIELDS`` order, like the admin card."""
+    rows = [
+        ("آیدی عددی", str(data.get('user_id', ''))),
+        ("یوزرنیم", f"@{data.get('username') or ''}"),
+        ("تاریخ ثبت", str(data.get('register_date') or '')),
+    ]
+    for field in config.RESUME_FIELDS:
+        value = data.get(field)
+        if field == 'skills':
+            skills = value
+            if isinstance(skills, str):
+                try:
+                    skills = json.loads(skills)
+                except ValueError:
+                    skills = []
+            value = "\n".join(
+                f"{s.get('name', '')}: {s.get('level', '')}" if isinstance(s, dict) else str(s)
+                for s in skills or []
+            )
+        elif field == 'uploaded_files' and value:
+            try:
+                value = "\n".join(os.path.basename(path) for path in json.loads(value))
+            except (ValueError, TypeError):
+                pass
+        rows.append((config.FIELD_LABELS.get(field, field), str(value) if value not in (None, '') else "ندارد"))
+    return rows
+
+
+def render_pdf(title: str, rows: list, font_path: str) -> bytes:
+    """PDF bytes of one resume; runs in a worker process."""
+    global _registered_font
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    if _registered_font != font_path:
+        pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+        _registered_font = font_path
+
+    def visual(text):
+        return get_display(arabic_reshaper.reshape(text))
+
+    def wrap(text, width):
+        # شکستن خط روی متن منطقی؛ عرض هر خط پس از شکل‌دهی اندازه گرفته می‌شود
+        lines = []
+        for paragraph in text.split("\n"):
+            line = ""
+            for word in paragraph.split():
+                candidate = f"{line} {word}" if line else word
+                if line and pdfmetrics.stringWidth(visual(candidate), FONT_NAME, FONT_SIZE) > width:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = candidate
+            lines.append(line)
+        return lines
+
+    buffer = io.BytesIO()
+    page_width, page_height = A4
+    right = page_width - PAGE_MARGIN
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setTitle(title)
+    pdf.setFont(FONT_NAME, TITLE_FONT_SIZE)
+    pdf.drawRightString(right, page_height - PAGE_MARGIN, visual(title))
+    y = page_height - PAGE_MARGIN - 2 * LINE_HEIGHT
+    for label, value in rows:
+        for number, line in enumerate(wrap(f"{label}: {value}", right - PAGE_MARGIN)):
+            if y < PAGE_MARGIN:
+                pdf.showPage()
+                y = page_height - PAGE_MARGIN
+            pdf.setFont(FONT_NAME, FONT_SIZE)
+            # سطرهای ادامه یک مقدار کمی تورفتگی دارند
+            pdf.drawRightString(right - (12 if number else 0), y, visual(line))
+            y -= LINE_HEIGHT
+        y -= LINE_HEIGHT / 3
+    pdf.save()
+    return buffer.getvalue()
+
+
+def zip_name(user_id: int, data: dict) -> str:
+    name = re.sub(r'[\\/:*?"<>|\s]+', "_", str(data.get('full_name') or "").strip())
+    return f"{user_id}_{name}.pdf" if name else f"{user_id}.pdf"
+
+
+class ResumePdfRenderer:
+    def __init__(self, db, workers: int = 2, cache_size: int = 64, font_path: str = None):
+        self.db = db
+        self.workers = workers
+        self.font_path = font_path or config.PDF_FONT_PATH
+        self.cache = VersionedLRUCache(maxsize=cache_size)
+        self.rendered = 0
+        self._pool = None
+        self._pending = {}
+
+    def start(self) -> None:
+        """Fork the worker processes; call it before the process starts any thread."""
+        if self._pool is not None:
+            return
+        # fork: با spawn/forkserver هر کارگر main.py (ربات و دیتابیس) را دوباره import می‌کرد.
+        # fork پس از شروع threadها (watchdog، to_thread) قفلِ گرفته‌شده را در کارگر کپی می‌کند و ممکن است گیر کند؛
+        # برای همین main() پیش از هر thread این را صدا می‌زند
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("fork"))
+        # با fork همه کارگرها در اولین submit ساخته می‌شوند
+        self._pool.submit(os.getpid).result()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # اسکریپت‌هایی که main() را اجرا نمی‌کنند
+            self.start()
+        return self._pool
+
+    async def render(self, user_id: int, cache: bool = True):
+        """PDF bytes of a user's resume (None if the user does not exist)."""
+        version = self.db.get_row_version(user_id)
+        if version is None:
+            return None
+        pdf = self.cache.get(user_id, version)
+        if pdf is not None:
+            return pdf
+        key = (user_id, version)
+        future = self._pending.get(key)
+        if future is None:
+            # درخواست‌های همزمان برای یک نسخه یک بار رندر می‌شوند
+            future = self._pending[key] = asyncio.ensure_future(self._render(user_id, version, cache))
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _render(self, user_id: int, version: int, cache: bool):
+        data = self.db.get_resume_data(user_id)
+        if not data:
+            return None
+        title = f"رزومه {data.get('full_name') or user_id}"
+        loop = asyncio.get_running_loop()
+        pdf = await loop.run_in_executor(self._executor(), render_pdf, title, resume_rows(data), self.font_path)
+        self.rendered += 1
+        if cache:
+            self.cache.put(user_id, version, pdf)
+        return pdf
+
+    async def export_zip(self, user_ids, path: str) -> int:
+        """Write the PDFs of ``user_ids`` into a ZIP at ``path``; returns how many were written.
+
+        Renders ``workers * 2`` resumes at a time so every worker stays busy
+        without holding all PDFs in memory; bulk renders don't fill the cache.
+        """
+        user_ids = list(user_ids)
+        chunk_size = self.workers * 2
+        written = 0
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for start in range(0, len(user_ids), chunk_size):
+                chunk = user_ids[start:start + chunk_size]
+                pdfs = await asyncio.gather(*(self.render(user_id, cache=False) for user_id in chunk))
+                names = {user_id: zip_name(user_id, self.db.get_resume_data(user_id) or {}) for user_id in chunk}
+                files = [(names[user_id], pdf) for user_id, pdf in zip(chunk, pdfs) if pdf is not None]
+                await asyncio.to_thread(lambda: [archive.writestr(name, pdf) for name, pdf in files])
+                written += len(files)
+        return written
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,68 @@
+# scoring.py
+"""Candidate scoring model used to rank resumes in the admin panel.
+
+The score is a weighted sum over a handful of resume fields. All weights and
+point tables live in ``config`` so the model can be tuned without touching
+the code. Scores are precomputed by ``DatabaseManager`` and stored in the
+indexed ``score`` column; nothing here talks to the database.
+"""
+import json
+
+import config
+
+# فیلدهایی که در محاسبه امتیاز نقش دارند؛ تغییر هر کدام یعنی امتیاز باید دوباره محاسبه شود
+SCORE_INPUT_FIELDS = frozenset({
+    "degree", "gpa", "major", "skills", "english_level",
+    "work_history", "has_work_license",
+})
+
+_PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩٫", "01234567890123456789.")
+
+
+def _parse_gpa(value) -> float:
+    if value is None:
+        return 0.0
+    try:
+        gpa = float(str(value).strip().translate(_PERSIAN_DIGITS))
+    except ValueError:
+        return 0.0
+    return max(0.0, min(gpa, config.SCORE_GPA_MAX))
+
+
+def _parse_skills(value) -> list:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return []
+    return value if isinstance(value, list) else []
+
+
+def score_breakdown(data: dict) -> dict:
+    """Return the weighted points contributed by each scoring component."""
+    weights = config.SCORE_WEIGHTS
+    levels = config.SCORE_LEVEL_POINTS
+    max_level = max(levels.values()) if levels else 1
+
+    skill_points = 0
+    for s in _parse_skills(data.get("skills")):
+        if isinstance(s, dict):
+            skill_points += levels.get(s.get("level"), 0)
+    skill_points = min(skill_points, config.SCORE_SKILLS_CAP)
+
+    work_history = str(data.get("work_history") or "")
+
+    return {
+        "degree": weights["degree"] * config.SCORE_DEGREE_POINTS.get(data.get("degree"), 0),
+        "gpa": weights["gpa"] * _parse_gpa(data.get("gpa")) / config.SCORE_GPA_MAX,
+        "major_match": weights["major_match"] if data.get("major") in config.SCORE_PREFERRED_MAJORS else 0,
+        "skills": weights["skills"] * skill_points,
+        "english_level": weights["english_level"] * levels.get(data.get("english_level"), 0) / max_level,
+        "work_history": weights["work_history"] if work_history.startswith("دارم") else 0,
+        "license": weights["license"] if data.get("has_work_license") == "بله" else 0,
+    }
+
+
+def compute_score(data: dict) -> float:
+    """امتیاز نهایی یک رزومه (هرچه بیشتر، متقاضی مناسب‌تر)"""
+    return round(sum(score_breakdown(data).values()), 2)